@@ -0,0 +1,29 @@
+import argparse
+
+from base import data_aggregation, participant_registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Объединение данных всех испытуемых в один файл")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--output-dir", default="data/aggregated")
+    parser.add_argument("--registry", default=participant_registry.REGISTRY_FP)
+    parser.add_argument("--participants-info", default=participant_registry.LEGACY_CSV_FP)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    aggregator = data_aggregation.DatasetAggregator(data_dir=args.data_dir,
+                                                    output_dir=args.output_dir,
+                                                    registry_fp=args.registry,
+                                                    legacy_csv_fp=args.participants_info,
+                                                    workers=args.workers)
+    report = aggregator.run()
+
+    print(f"Прочитано файлов: {report.parsed}, взято из кэша: {report.reused}, строк: {report.rows}")
+    for path in report.missing:
+        print(f"Нет файла: {path}")
+
+
+# процессы пула импортируют этот модуль, поэтому запуск только под main
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Tuple
+import wave
+
+import numpy as np
+
+# PCM samples of different width are converted to float range [-1, 1]
+_SAMPLE_TYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+
+def decode_wav(fp: str) -> Tuple[np.ndarray, int]:
+    """
+    :param fp: path to wav file
+    :return: contiguous float32 samples with shape (frames,) or (frames, channels) and sample rate
+    """
+    with wave.open(fp, mode="rb") as wav_file:
+        sample_width = wav_file.getsampwidth()
+        channels = wav_file.getnchannels()
+        sample_rate = wav_file.getframerate()
+        frames = wav_file.readframes(wav_file.getnframes())
+
+    if sample_width not in _SAMPLE_TYPES:
+        raise ValueError(f"Sample width {sample_width} of {fp} is not supported")
+
+    samples = np.frombuffer(frames, dtype=_SAMPLE_TYPES[sample_width]).astype(np.float32)
+    if sample_width == 1:
+        # 8 bit wav is unsigned
+        samples -= 128
+    samples /= float(2 ** (8 * sample_width - 1))
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels)
+
+    return np.ascontiguousarray(samples), sample_rate
+
+
+class AudioBank:
+    """
+    All sounds of the directory decoded once at start, so change of sound does not read files
+    """
+
+    def __init__(self, sounds_fp: str, extension: str = ".wav", workers: int = 4):
+        paths = {sound_fp.stem: str(sound_fp) for sound_fp in Path(sounds_fp).glob(pattern=f"*{extension}")}
+
+        if not paths:
+            raise ValueError(f"AudioBank did not find files in the directory {sounds_fp} with extension {extension}")
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="audio_bank") as executor:
+            decoded = dict(zip(paths, executor.map(decode_wav, paths.values())))
+
+        sample_rates = {sample_rate for _, sample_rate in decoded.values()}
+        if len(sample_rates) != 1:
+            raise ValueError(f"All sounds in {sounds_fp} must have the same sample rate, but got {sample_rates}")
+
+        self.sample_rate: int = sample_rates.pop()
+        self._sounds: Dict[str, np.ndarray] = {name: samples for name, (samples, _) in decoded.items()}
+
+    def __contains__(self, sound_name: str) -> bool:
+        return sound_name in self._sounds
+
+    def __getitem__(self, sound_name: str) -> np.ndarray:
+        return self._sounds[sound_name]
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(samples.nbytes for samples in self._sounds.values())
@@ -0,0 +1,32 @@
+"""
+Library used to show stimuli and to get responses of participant.
+PROBS_BACKEND environment variable equal to "headless" replaces PsychoPy with base.headless,
+so experiment can run without display
+"""
+import os
+
+BACKEND = os.environ.get("PROBS_BACKEND", "psychopy")
+
+if BACKEND == "psychopy":
+    from psychopy import core, data, event, gui, visual
+    from psychopy.hardware import keyboard
+elif BACKEND == "headless":
+    from base.headless import core, data, event, gui, keyboard, visual
+else:
+    raise ValueError(f'PROBS_BACKEND must be "psychopy" or "headless", but got "{BACKEND}"')
+
+
+def load_sound():
+    """
+    PsychoPy sound module must be imported after choice of audio library
+    :return: sound module of chosen backend
+    """
+    if BACKEND == "headless":
+        from base.headless import sound
+        return sound
+
+    # noinspection PyProtectedMember
+    from psychopy import prefs
+    prefs.hardware['audioLib'] = ['ptb']
+    from psychopy import sound
+    return sound
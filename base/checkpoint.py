@@ -0,0 +1,67 @@
+import os
+import pickle
+from typing import Any, Dict
+
+# components keep state of their own random streams since version 2,
+# probe of probe training is kept since version 3
+CHECKPOINT_VERSION = 3
+
+State = Dict[str, Any]
+
+
+def collect_state(components: Dict[str, Any]) -> State:
+    """
+    :param components: objects with get_state and set_state by their names
+    """
+    return {name: component.get_state() for name, component in components.items()}
+
+
+def restore_state(components: Dict[str, Any], state: State) -> None:
+    missing = [name for name in components if name not in state]
+    if missing:
+        raise ValueError(f"Checkpoint does not have state of {missing}")
+
+    for name, component in components.items():
+        component.set_state(state[name])
+
+
+class SessionCheckpoint:
+    """
+    State of the session saved after every finished combination of task and probe, so crashed session
+    is continued from the next combination. File is replaced at once, thus crash during saving keeps previous state
+    """
+
+    def __init__(self, fp: str):
+        self.fp = fp
+        self.saves: int = 0
+
+    def exists(self) -> bool:
+        return os.path.exists(self.fp)
+
+    def save(self, state: State) -> None:
+        temporary_fp = f"{self.fp}.tmp"
+        with open(temporary_fp, mode="wb") as checkpoint_file:
+            pickle.dump(dict(version=CHECKPOINT_VERSION, state=state), checkpoint_file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+
+        os.replace(temporary_fp, self.fp)
+        self.saves += 1
+
+    def load(self) -> State:
+        with open(self.fp, mode="rb") as checkpoint_file:
+            checkpoint = pickle.load(checkpoint_file)
+
+        if checkpoint.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"Checkpoint {self.fp} has version {checkpoint.get('version')}, "
+                             f"but only version {CHECKPOINT_VERSION} can be loaded")
+
+        return checkpoint["state"]
+
+    def remove(self) -> None:
+        """
+        Remove checkpoint of finished session, so it is not continued by mistake
+        """
+        if self.exists():
+            os.remove(self.fp)
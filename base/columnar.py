@@ -0,0 +1,184 @@
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from base import data_records, data_writers
+
+# missing values of integer columns and of dictionary encoded strings
+MISSING_CODE = -1
+
+_KIND_DTYPES = {
+    data_records.FLOAT: np.float64,
+    data_records.INT: np.int32,
+    data_records.FLAG: np.int8,
+    # codes of the dictionary of column strings
+    data_records.STR: np.int16,
+}
+
+META_FILE = "meta.json"
+
+
+def _column_fp(directory: str, name: str) -> str:
+    return os.path.join(directory, f"{name}.npy")
+
+
+def _categories_fp(directory: str, name: str) -> str:
+    return os.path.join(directory, f"{name}.categories.npy")
+
+
+class ColumnarWriter(data_writers.DataWriter):
+    """
+    Participant data as a directory with typed column per .npy file, so analysis loads it without parsing.
+    Strings are saved as codes of the dictionary of column values.
+    Columns are kept in preallocated arrays growing in chunks and are saved on close,
+    rows which must survive crash are saved by StreamingCsvWriter
+    """
+
+    def __init__(self,
+                 directory: str,
+                 schema: data_records.RecordSchema,
+                 extra_info: Dict[str, str],
+                 chunk_size: int = 1024):
+        self._directory = directory
+        self._schema = schema
+        self._extra_info = dict(extra_info)
+        self._chunk_size = chunk_size
+
+        self._columns: Dict[str, np.ndarray] = {column.name: self._empty(column.kind, chunk_size)
+                                                for column in schema.columns}
+        self._categories: Dict[str, Dict[str, int]] = {column.name: {}
+                                                       for column in schema.columns
+                                                       if column.kind == data_records.STR}
+        self._closed = False
+
+        self.rows: int = 0
+
+    @staticmethod
+    def _empty(kind: str, size: int) -> np.ndarray:
+        missing = np.nan if kind == data_records.FLOAT else MISSING_CODE
+        return np.full(size, missing, dtype=_KIND_DTYPES[kind])
+
+    def _grow(self) -> None:
+        for column in self._schema.columns:
+            chunk = self._empty(column.kind, self._chunk_size)
+            self._columns[column.name] = np.concatenate((self._columns[column.name], chunk))
+
+    def _encode(self, name: str, value: str) -> int:
+        categories = self._categories[name]
+        if value not in categories:
+            categories[value] = len(categories)
+
+        return categories[value]
+
+    def write_entry(self, entry: data_writers.Entry) -> None:
+        if self.rows == len(self._columns[self._schema.names[0]]):
+            self._grow()
+
+        for column, value in zip(self._schema.columns, entry):
+            if value is None:
+                continue
+
+            if column.kind == data_records.STR:
+                value = self._encode(column.name, value)
+
+            self._columns[column.name][self.rows] = value
+
+        self.rows += 1
+
+    def get_state(self) -> dict:
+        return dict(rows=self.rows,
+                    columns={name: values[:self.rows].copy() for name, values in self._columns.items()},
+                    categories={name: dict(categories) for name, categories in self._categories.items()})
+
+    def set_state(self, state: dict) -> None:
+        self.rows = state["rows"]
+        self._categories = {name: dict(categories) for name, categories in state["categories"].items()}
+        for column in self._schema.columns:
+            values = self._empty(column.kind, self.rows + self._chunk_size)
+            values[:self.rows] = state["columns"][column.name]
+            self._columns[column.name] = values
+
+    def close(self) -> None:
+        if self._closed:
+            return
+
+        self._closed = True
+        os.makedirs(self._directory, exist_ok=True)
+        for name, values in self._columns.items():
+            np.save(_column_fp(self._directory, name), values[:self.rows])
+
+        for name, categories in self._categories.items():
+            np.save(_categories_fp(self._directory, name), np.array(list(categories), dtype=str))
+
+        meta = dict(experiment_part=self._schema.experiment_part,
+                    rows=self.rows,
+                    columns=[column._asdict() for column in self._schema.columns],
+                    extra_info=self._extra_info)
+        with open(os.path.join(self._directory, META_FILE), mode="w", encoding="UTF-8") as meta_file:
+            json.dump(meta, meta_file, ensure_ascii=False, indent=2)
+
+
+class ColumnarData:
+    """
+    Participant data saved by ColumnarWriter. Columns are memory mapped, so only used columns are read
+    """
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, META_FILE), mode="r", encoding="UTF-8") as meta_file:
+            meta = json.load(meta_file)
+
+        self._directory = directory
+        self.experiment_part: str = meta["experiment_part"]
+        self.rows: int = meta["rows"]
+        self.columns: List[data_records.Column] = [data_records.Column(**column) for column in meta["columns"]]
+        self.extra_info: Dict[str, str] = meta["extra_info"]
+
+        self._kinds = {column.name: column.kind for column in self.columns}
+        self._categories: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._kinds
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """
+        :return: memory mapped values of the column, codes for string columns
+        """
+        if name not in self._kinds:
+            raise KeyError(f"{self._directory} does not have column {name}")
+
+        # empty arrays can not be memory mapped
+        mmap_mode: Optional[str] = "r" if self.rows else None
+        return np.load(_column_fp(self._directory, name), mmap_mode=mmap_mode, allow_pickle=False)
+
+    def categories(self, name: str) -> np.ndarray:
+        """
+        :return: strings of the column, code of the string is its index
+        """
+        if self._kinds.get(name) != data_records.STR:
+            raise ValueError(f"Column {name} is not a string column")
+
+        if name not in self._categories:
+            self._categories[name] = np.load(_categories_fp(self._directory, name), allow_pickle=False)
+
+        return self._categories[name]
+
+    def code_of(self, name: str, value: str) -> int:
+        """
+        :return: code of the string in the column or MISSING_CODE, so rows are selected without decoding
+        """
+        matches = np.flatnonzero(self.categories(name) == value)
+        return int(matches[0]) if matches.size else MISSING_CODE
+
+    def decoded(self, name: str) -> np.ndarray:
+        """
+        :return: strings of the column, missing values are empty strings
+        """
+        codes = self[name]
+        categories = np.append(self.categories(name), "")
+        # missing code -1 takes the last, empty, category
+        return categories[codes]
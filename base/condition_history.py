@@ -0,0 +1,150 @@
+import csv
+import json
+import os
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+HISTORY_FP = "data/insight/condition_history.json"
+DATA_DIR = "data/insight"
+# csv files saved next to the data file of the session
+NOT_SESSION_SUFFIXES = ("_frames.csv", "_probe_blocks.csv")
+
+Counts = Dict[str, Dict[str, int]]
+
+
+def read_session_conditions(fp: str) -> Counts:
+    """
+    :return: for every task of Insight data file how many times it was given in every condition
+    """
+    given = set()
+    with open(fp, mode="r", encoding="utf-8-sig", newline="") as csv_file:
+        for row in csv.DictReader(csv_file):
+            if row.get("stage") == "experimental" and row.get("task") and row.get("task_type"):
+                given.add((row["task"], row["task_type"]))
+
+    counts: Counts = {}
+    for task, condition in given:
+        counts.setdefault(task, {}).setdefault(condition, 0)
+        counts[task][condition] += 1
+
+    return counts
+
+
+def _dump(fp: str, content: dict) -> None:
+    directory = os.path.dirname(fp)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    temporary_fp = f"{fp}.tmp"
+    with open(temporary_fp, mode="w", encoding="UTF-8") as json_file:
+        json.dump(content, json_file, ensure_ascii=False)
+    os.replace(temporary_fp, fp)
+
+
+class ConditionHistory:
+    """
+    How many times every insight task was given in every condition in previous sessions.
+    Totals are kept apart from the index with counts of every data file with its size and modification time,
+    so startup reads only totals, session adds only its own file and update parses only new and changed files
+    """
+
+    def __init__(self, fp: str = HISTORY_FP, data_dir: str = DATA_DIR, index_fp: Optional[str] = None):
+        """
+        :param fp: totals of tasks
+        :param index_fp: counts of every data file, file next to totals by default
+        """
+        self._fp = fp
+        self._index_fp = index_fp if index_fp is not None else f"{os.path.splitext(fp)[0]}_files.json"
+        self._data_dir = data_dir
+        # index is read only by update
+        self._files: Optional[Dict[str, dict]] = None
+        self._totals: Counts = {}
+
+        if os.path.exists(fp):
+            with open(fp, mode="r", encoding="UTF-8") as history_file:
+                self._totals = json.load(history_file)["totals"]
+
+        self.parsed_files: int = 0
+
+    def _load_index(self) -> Dict[str, dict]:
+        if not os.path.exists(self._index_fp):
+            # every data file is counted again
+            self._totals = {}
+            return {}
+
+        with open(self._index_fp, mode="r", encoding="UTF-8") as index_file:
+            return json.load(index_file)
+
+    def _session_files(self) -> Dict[str, os.stat_result]:
+        if not os.path.isdir(self._data_dir):
+            return {}
+
+        return {entry.name: entry.stat() for entry in os.scandir(self._data_dir)
+                if entry.is_file() and entry.name.endswith(".csv") and not entry.name.endswith(NOT_SESSION_SUFFIXES)}
+
+    def _add(self, counts: Counts, sign: int) -> None:
+        for task, conditions in counts.items():
+            task_totals = self._totals.setdefault(task, {})
+            for condition, given in conditions.items():
+                task_totals[condition] = task_totals.get(condition, 0) + sign * given
+
+    def update(self) -> None:
+        """
+        Count conditions of new and changed data files and remove counts of deleted ones
+        """
+        if self._files is None:
+            self._files = self._load_index()
+        session_files = self._session_files()
+
+        for name in [name for name in self._files if name not in session_files]:
+            self._add(self._files.pop(name)["counts"], sign=-1)
+
+        for name, stat in session_files.items():
+            self._count_file(name, stat)
+
+    def _count_file(self, name: str, stat: os.stat_result) -> None:
+        indexed = self._files.get(name)
+        if indexed is not None and indexed["size"] == stat.st_size and indexed["mtime"] == stat.st_mtime:
+            return
+
+        if indexed is not None:
+            self._add(indexed["counts"], sign=-1)
+
+        counts = read_session_conditions(os.path.join(self._data_dir, name))
+        self._add(counts, sign=1)
+        self._files[name] = dict(size=stat.st_size, mtime=stat.st_mtime, counts=counts)
+        self.parsed_files += 1
+
+    def add_session(self, fp: str) -> None:
+        """
+        Count conditions of the data file written by the session without scanning other files of data directory.
+        Without the index every data file is counted by update
+
+        :param fp: data file of the session in data directory
+        """
+        if self._files is None and not os.path.exists(self._index_fp):
+            self.update()
+            return
+
+        if self._files is None:
+            self._files = self._load_index()
+        self._count_file(os.path.basename(fp), os.stat(fp))
+
+    def save(self) -> None:
+        if self._files is not None:
+            _dump(self._index_fp, self._files)
+        _dump(self._fp, dict(totals=self._totals))
+
+    def counts(self, task: str) -> Dict[str, int]:
+        return dict(self._totals.get(task, {}))
+
+    def weights(self, tasks: Sequence[str], conditions: Sequence[str]) -> np.ndarray:
+        """
+        :return: (tasks, conditions) weights of giving task in condition. Condition which was given less often
+            than other conditions of the task gets larger weight, equal counts give equal weights
+        """
+        counts = np.array([[self._totals.get(task, {}).get(condition, 0) for condition in conditions]
+                           for task in tasks], dtype=np.float64).reshape(len(tasks), len(conditions))
+        deficit = counts.max(axis=1, keepdims=True) - counts + 1
+        return deficit / deficit.sum(axis=1, keepdims=True)
@@ -0,0 +1,140 @@
+import os
+import sqlite3
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from base import participant_registry
+
+
+def williams_design(items: int) -> np.ndarray:
+    """
+    Latin square balanced for first order carryover: every item is once at every position
+    and every item follows every other item equally often. Odd number of items needs the square and its mirror
+    :return: (rows, items) orders of items
+    """
+    if items < 1:
+        raise ValueError(f"Design must have at least one item, but got {items}")
+
+    # 0, 1, n - 1, 2, n - 2, ...
+    first_row = [0]
+    low, high = 1, items - 1
+    while len(first_row) < items:
+        first_row.append(low)
+        low += 1
+        if len(first_row) < items:
+            first_row.append(high)
+            high -= 1
+
+    rows = (np.array(first_row) + np.arange(items)[:, np.newaxis]) % items
+    if items % 2:
+        rows = np.concatenate((rows, rows[:, ::-1]))
+
+    return rows
+
+
+def is_balanced(rows: np.ndarray) -> bool:
+    """
+    :return: whether every item is equally often at every position and after every other item
+    """
+    items = rows.shape[1]
+    if items < 2:
+        # one item has no other items to follow
+        return True
+
+    positions = np.zeros((items, items), dtype=np.int64)
+    np.add.at(positions, (rows, np.arange(items)), 1)
+
+    carryover = np.zeros((items, items), dtype=np.int64)
+    np.add.at(carryover, (rows[:, :-1], rows[:, 1:]), 1)
+    off_diagonal = carryover[~np.eye(items, dtype=bool)]
+
+    return bool((positions == positions[0, 0]).all()
+                and (off_diagonal == off_diagonal[0]).all()
+                and not np.diag(carryover).any())
+
+
+def design_key(combinations: Sequence[Tuple[str, str]]) -> str:
+    """
+    :return: name of the design over task and probe combinations in their order
+    """
+    return "|".join(f"{task} {probe}" for task, probe in combinations)
+
+
+class CounterbalancingAllocator:
+    """
+    Rows of the design given to sessions in order, so every row is used equally often in the cohort.
+    Allocations are kept in SQLite database and every allocation is a transaction,
+    thus several stations can allocate at once
+    """
+
+    def __init__(self,
+                 design_key: str,
+                 rows: np.ndarray,
+                 fp: str = participant_registry.REGISTRY_FP,
+                 timeout: float = 30.0):
+        """
+        :param design_key: name of the design, e.g. its combinations, rows of other designs are counted separately
+        :param rows: (rows, items) orders of the design
+        :param fp: path to database file, by default the file of participant registry
+        """
+        self._design_key = design_key
+        self.rows: np.ndarray = rows
+
+        directory = os.path.dirname(fp)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(fp, timeout=timeout, isolation_level=None)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS counterbalancing (
+                id INTEGER PRIMARY KEY,
+                design TEXT NOT NULL,
+                session TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                UNIQUE (design, session)
+            );
+        """)
+
+    def allocate(self, session: str) -> List[int]:
+        """
+        :param session: name of the session, e.g. its data file. Restarted session gets the same row
+        :return: order of items for the session
+        """
+        # IMMEDIATE takes write lock at once, so two stations do not choose the same row
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            allocated = self._connection.execute("SELECT row FROM counterbalancing WHERE design = ? AND session = ?",
+                                                 (self._design_key, session)).fetchone()
+            if allocated is not None:
+                row = allocated[0]
+            else:
+                row = self._least_used_row()
+                self._connection.execute("INSERT INTO counterbalancing (design, session, row) VALUES (?, ?, ?)",
+                                         (self._design_key, session, row))
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+
+        self._connection.execute("COMMIT")
+        return self.rows[row].tolist()
+
+    def _least_used_row(self) -> int:
+        uses = np.zeros(len(self.rows), dtype=np.int64)
+        for row, used in self._connection.execute("SELECT row, COUNT(*) FROM counterbalancing "
+                                                  "WHERE design = ? GROUP BY row", (self._design_key,)):
+            if row < len(uses):
+                uses[row] = used
+
+        return int(uses.argmin())
+
+    def allocations(self) -> List[int]:
+        """
+        :return: row of every session in order of allocation
+        """
+        rows = self._connection.execute("SELECT row FROM counterbalancing WHERE design = ? ORDER BY id",
+                                        (self._design_key,))
+        return [row for row, in rows]
+
+    def close(self) -> None:
+        self._connection.close()
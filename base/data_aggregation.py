@@ -0,0 +1,201 @@
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import hashlib
+import json
+import os
+import pickle
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from base import participant_registry
+
+Row = Dict[str, str]
+
+MANIFEST_FILE = "manifest.json"
+CACHE_DIR = "parsed"
+COMBINED_FILE = "combined.csv"
+LINK_COLUMNS = ["participant", "WM_name", "Insight_name", "session_file"]
+
+
+def file_sha256(fp: str, block_size: int = 1024 ** 2) -> str:
+    sha256 = hashlib.sha256()
+    with open(fp, mode="rb") as fin:
+        for block in iter(lambda: fin.read(block_size), b""):
+            sha256.update(block)
+
+    return sha256.hexdigest()
+
+
+def parse_session_file(fp: str) -> List[Row]:
+    """
+    Read rows of participant data file. It is run by worker processes, so it is a module level function
+    """
+    with open(fp, mode="r", encoding="utf-8-sig", newline="") as csv_file:
+        return list(csv.DictReader(csv_file))
+
+
+class ManifestEntry(NamedTuple):
+    size: int
+    mtime: float
+    sha256: str
+    # path of parsed rows relative to output directory
+    cache: str
+
+
+class SessionFile(NamedTuple):
+    participant: participant_registry.ParticipantEntry
+    # path relative to data directory
+    path: str
+
+
+class AggregationReport(NamedTuple):
+    parsed: int
+    reused: int
+    missing: List[str]
+    rows: int
+
+
+class DatasetAggregator:
+    """
+    Combine data files of all participants into one csv. Files of a participant are linked by participant registry.
+    Parsed files are kept with manifest of their size, modification time and hash,
+    so the next run parses only new and changed files
+    """
+
+    def __init__(self,
+                 data_dir: str = "data",
+                 output_dir: str = "data/aggregated",
+                 registry_fp: str = participant_registry.REGISTRY_FP,
+                 legacy_csv_fp: Optional[str] = participant_registry.LEGACY_CSV_FP,
+                 workers: Optional[int] = None):
+        self._data_dir = data_dir
+        self._output_dir = output_dir
+        self._registry_fp = registry_fp
+        self._legacy_csv_fp = legacy_csv_fp
+        self._workers = workers
+
+        self._manifest_fp = os.path.join(output_dir, MANIFEST_FILE)
+        self._manifest: Dict[str, ManifestEntry] = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, ManifestEntry]:
+        if not os.path.exists(self._manifest_fp):
+            return {}
+
+        with open(self._manifest_fp, mode="r", encoding="UTF-8") as manifest_file:
+            return {path: ManifestEntry(**entry) for path, entry in json.load(manifest_file).items()}
+
+    def _save_manifest(self) -> None:
+        # manifest is replaced at once, so interrupted run does not leave broken manifest
+        temporary_fp = f"{self._manifest_fp}.tmp"
+        with open(temporary_fp, mode="w", encoding="UTF-8") as manifest_file:
+            json.dump({path: entry._asdict() for path, entry in self._manifest.items()},
+                      manifest_file, ensure_ascii=False, indent=2)
+        os.replace(temporary_fp, self._manifest_fp)
+
+    def session_files(self) -> List[SessionFile]:
+        registry = participant_registry.ParticipantRegistry(fp=self._registry_fp, legacy_csv_fp=self._legacy_csv_fp)
+        try:
+            participants = registry.all()
+        finally:
+            registry.close()
+
+        session_files = []
+        for participant in participants:
+            session_files.append(SessionFile(participant, os.path.join("WM", participant.wm_name)))
+            if participant.insight_name:
+                session_files.append(SessionFile(participant, os.path.join("insight", participant.insight_name)))
+
+        return session_files
+
+    def _is_changed(self, path: str) -> Tuple[bool, Optional[ManifestEntry]]:
+        """
+        :return: whether file must be parsed again and its manifest entry if it was not changed
+        """
+        fp = os.path.join(self._data_dir, path)
+        stat = os.stat(fp)
+        entry = self._manifest.get(path)
+
+        if entry is None or not os.path.exists(os.path.join(self._output_dir, entry.cache)):
+            return True, None
+
+        if entry.size == stat.st_size and entry.mtime == stat.st_mtime:
+            return False, entry
+
+        # file was touched, but its content may be the same
+        if entry.size == stat.st_size and entry.sha256 == file_sha256(fp):
+            return False, entry._replace(mtime=stat.st_mtime)
+
+        return True, None
+
+    def _cache_path(self, path: str) -> str:
+        name = hashlib.sha256(path.encode("UTF-8")).hexdigest()
+        return os.path.join(CACHE_DIR, f"{name}.pickle")
+
+    def run(self) -> AggregationReport:
+        os.makedirs(os.path.join(self._output_dir, CACHE_DIR), exist_ok=True)
+
+        session_files = self.session_files()
+        missing = [session.path for session in session_files
+                   if not os.path.exists(os.path.join(self._data_dir, session.path))]
+        present = [session for session in session_files if session.path not in missing]
+
+        to_parse = []
+        for session in present:
+            is_changed, entry = self._is_changed(session.path)
+            if is_changed:
+                to_parse.append(session.path)
+            else:
+                self._manifest[session.path] = entry
+
+        if to_parse:
+            fps = [os.path.join(self._data_dir, path) for path in to_parse]
+            with ProcessPoolExecutor(max_workers=self._workers) as executor:
+                for path, fp, rows in zip(to_parse, fps, executor.map(parse_session_file, fps, chunksize=8)):
+                    self._store_parsed(path, fp, rows)
+
+        self._save_manifest()
+        rows = self._write_combined(present)
+
+        return AggregationReport(parsed=len(to_parse),
+                                 reused=len(present) - len(to_parse),
+                                 missing=missing,
+                                 rows=rows)
+
+    def _store_parsed(self, path: str, fp: str, rows: List[Row]) -> None:
+        stat = os.stat(fp)
+        cache = self._cache_path(path)
+        with open(os.path.join(self._output_dir, cache), mode="wb") as cache_file:
+            pickle.dump(rows, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self._manifest[path] = ManifestEntry(size=stat.st_size,
+                                             mtime=stat.st_mtime,
+                                             sha256=file_sha256(fp),
+                                             cache=cache)
+
+    def _load_parsed(self, path: str) -> List[Row]:
+        with open(os.path.join(self._output_dir, self._manifest[path].cache), mode="rb") as cache_file:
+            return pickle.load(cache_file)
+
+    def _write_combined(self, session_files: List[SessionFile]) -> int:
+        parsed = [(session, self._load_parsed(session.path)) for session in session_files]
+
+        data_columns = []
+        for _, rows in parsed:
+            for column in (rows[0] if rows else ()):
+                if column not in data_columns and column not in LINK_COLUMNS:
+                    data_columns.append(column)
+
+        combined_rows = 0
+        with open(os.path.join(self._output_dir, COMBINED_FILE), mode="w", encoding="utf-8-sig", newline="") as fout:
+            csv_writer = csv.DictWriter(fout, fieldnames=LINK_COLUMNS + data_columns, extrasaction="ignore")
+            csv_writer.writeheader()
+
+            for session, rows in parsed:
+                link = dict(participant=session.participant.participant,
+                            WM_name=session.participant.wm_name,
+                            Insight_name=session.participant.insight_name,
+                            session_file=session.path)
+                for row in rows:
+                    csv_writer.writerow({**row, **link})
+                combined_rows += len(rows)
+
+        return combined_rows
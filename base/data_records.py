@@ -0,0 +1,92 @@
+from functools import lru_cache
+from typing import Any, Iterator, NamedTuple, Tuple
+
+# kinds of values saved in the columns of participant data
+STR = "str"
+INT = "int"
+FLAG = "flag"
+FLOAT = "float"
+
+
+class Column(NamedTuple):
+    name: str
+    kind: str
+
+
+class TrialRecord:
+    """
+    Single row of participant data. Fields are slots of the record type of the experiment part,
+    fields which were not set are None
+    """
+
+    __slots__ = ()
+    columns: Tuple[str, ...] = ()
+
+    def __init__(self):
+        for name in self.columns:
+            setattr(self, name, None)
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        :return: values in the order of schema columns
+        """
+        return (getattr(self, name) for name in self.columns)
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={value!r}" for name, value in zip(self.columns, self) if value is not None)
+        return f"{type(self).__name__}({values})"
+
+
+class RecordSchema:
+    def __init__(self, experiment_part: str, columns: Tuple[Column, ...]):
+        self.experiment_part = experiment_part
+        self.columns = columns
+        self.names: Tuple[str, ...] = tuple(column.name for column in columns)
+        self.record_type = type(f"{experiment_part}TrialRecord",
+                                (TrialRecord,),
+                                dict(__slots__=self.names, columns=self.names))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.names
+
+    def new_record(self) -> TrialRecord:
+        return self.record_type()
+
+
+_COMMON_COLUMNS = (
+    Column("experiment_part", STR),
+    Column("stage", STR),
+    Column("task", STR),
+    Column("task_solution_time", FLOAT),
+    # time of the frame when click was noticed, to measure its difference from time of click
+    Column("task_solution_polled_time", FLOAT),
+    Column("probe_trial", INT),
+    Column("probe", STR),
+    Column("RT", FLOAT),
+    Column("is_correct", FLAG),
+    Column("time_from_experiment_start", FLOAT),
+)
+
+# columns inserted into common ones for the experiment part: position and column
+_PART_COLUMNS = {
+    # TODO: add info about subtasks
+    "WM": ((2, Column("combination_number", INT)),
+           (4, Column("task_trial", INT))),
+    "Insight": ((3, Column("task_type", STR)),),
+}
+
+
+@lru_cache(maxsize=None)
+def compile_schema(experiment_part: str) -> RecordSchema:
+    """
+    :param experiment_part: value of data_save.ExperimentPart
+    :return: columns and record type of participant data, the same object for every call with the part
+    """
+    if experiment_part not in _PART_COLUMNS:
+        raise ValueError(f"experiment_part must be one of {list(_PART_COLUMNS)}, but got {experiment_part}")
+
+    columns = list(_COMMON_COLUMNS)
+    for position, column in _PART_COLUMNS[experiment_part]:
+        columns.insert(position, column)
+
+    return RecordSchema(experiment_part=experiment_part, columns=tuple(columns))
@@ -1,9 +1,9 @@
-import csv
 from enum import Enum
 import os
-from typing import List, Optional, Dict
+from typing import Optional, Dict
 
-from psychopy import data
+from base import columnar, data_records, data_writers, participant_registry
+from base.backend import data
 
 
 class ExperimentPart(Enum):
@@ -14,112 +14,104 @@ class ExperimentPart(Enum):
 class ExperimentFirstPartParticipantInfoSaver:
     def __init__(self,
                  participant_data_filename: str,
-                 participants_info_fp: str,
+                 registry_fp: str,
                  participant_name: str,
                  participant_age: str,
                  participant_gender: str):
         self._participant_data_filename = os.path.basename(participant_data_filename) + ".csv"
-        self._participants_info_fp = participants_info_fp
+        self._registry_fp = registry_fp
 
         self._participant_id = f"{participant_name} {participant_age} {participant_gender}"
 
     def save(self):
-        is_info_file_exist = os.path.exists(self._participants_info_fp)
-        with open(self._participants_info_fp, mode="a", encoding="UTF-8", newline="") as csv_file:
-            csv_writer = csv.DictWriter(csv_file, fieldnames=["participant", "WM_name", "Insight_name"])
-
-            if not is_info_file_exist:
-                csv_writer.writeheader()
-            row_info = dict(participant=self._participant_id,
-                            WM_name=self._participant_data_filename,
-                            Insight_name="")
-            csv_writer.writerow(row_info)
+        registry = participant_registry.ParticipantRegistry(self._registry_fp)
+        try:
+            registry.add_first_part(participant=self._participant_id, wm_name=self._participant_data_filename)
+        finally:
+            registry.close()
 
 
 class ExperimentSecondPartParticipantInfoSaver:
     def __init__(self,
                  chosen_wm_file_name: str,
                  insight_file_name: str,
-                 participants_info_fp: str):
+                 registry_fp: str):
         self._chosen_wm_file_name = chosen_wm_file_name
         self._insight_file_name = os.path.basename(insight_file_name) + ".csv"
-        self._participants_info_fp = participants_info_fp
+        self._registry_fp = registry_fp
 
     def save(self):
-        updated_data = self._read_and_add_info()
-        header = list(updated_data[0].keys())
-        with open(file=self._participants_info_fp, mode="w", encoding="UTF-8", newline="") as csv_file:
-            csv_writer = csv.DictWriter(csv_file, fieldnames=header)
-            csv_writer.writeheader()
-            csv_writer.writerows(updated_data)
-
-    def _read_and_add_info(self) -> List[Dict[str, str]]:
-        with open(file=self._participants_info_fp, mode="r", encoding="UTF-8", newline="") as csv_file:
-            csv_reader = csv.DictReader(csv_file)
-
-            updated_data = []
-            for row in csv_reader:
-                if row["WM_name"] == self._chosen_wm_file_name:
-                    row["Insight_name"] = self._insight_file_name
-
-                updated_data.append(row)
-
-        return updated_data
+        registry = participant_registry.ParticipantRegistry(self._registry_fp)
+        try:
+            registry.add_second_part(wm_name=self._chosen_wm_file_name, insight_name=self._insight_file_name)
+        finally:
+            registry.close()
 
 
 class DataSaver:
     def __init__(self,
                  save_fp: str,
                  experiment_part: ExperimentPart,
-                 participant_info: Dict[str, str]):
+                 participant_info: Dict[str, str],
+                 streaming: bool = False,
+                 asynchronous: bool = False,
+                 save_columns: bool = False,
+                 resume_file_name: Optional[str] = None):
+        """
+        :param streaming: append every row to the data file at once instead of saving all rows on close
+        :param asynchronous: write rows on background thread, so saving does not wait for disk
+        :param save_columns: also save typed columns next to the data file for fast loading by analysis
+        :param resume_file_name: file name of the restarted session, its data file is continued
+        """
         if experiment_part not in ExperimentPart:
             parts = [part for part in ExperimentPart.__members__.keys()]
             raise ValueError(f'experiment_part must be one of {parts}')
 
-        # TODO: find a way to implement data_to_save cleaner
-        data_to_save = ["experiment_part",
-                        "stage",
-                        "task",
-                        "task_solution_time",
-                        "probe_trial",
-                        "probe",
-                        "RT",
-                        "is_correct",
-                        "time_from_experiment_start",
-                        ]
-
-        file_name = f"{save_fp}_{data.getDateStr()}"
-        if experiment_part is ExperimentPart.WM:
-            # TODO: add info about subtasks
-            data_to_save.insert(2, "combination_number")
-            data_to_save.insert(4, "task_trial")
+        if resume_file_name is not None and not streaming:
+            raise ValueError("Only streaming DataSaver can continue data file of the restarted session")
+
+        # columns of the part are compiled once and shared by all savers
+        self._schema = data_records.compile_schema(experiment_part.value)
 
+        file_name = f"{save_fp}_{data.getDateStr()}" if resume_file_name is None else resume_file_name
+        if experiment_part is ExperimentPart.WM:
             self._participant_part_info_saver = ExperimentFirstPartParticipantInfoSaver(
                 participant_data_filename=file_name,
-                participants_info_fp="data/participants info.csv",
+                registry_fp=participant_registry.REGISTRY_FP,
                 participant_name=participant_info["ФИО"],
                 participant_age=participant_info["Возраст"],
                 participant_gender=participant_info["Пол"],
             )
 
         else:
-            data_to_save.insert(3, "task_type")
             self._participant_part_info_saver = ExperimentSecondPartParticipantInfoSaver(
                 chosen_wm_file_name=participant_info["wm_file_name"],
                 insight_file_name=file_name,
-                participants_info_fp="data/participants info.csv",
+                registry_fp=participant_registry.REGISTRY_FP,
             )
             del participant_info["wm_file_name"]
 
         participant_info["filename_info"] = file_name
-        self._saver = data.ExperimentHandler(dataFileName=file_name,
-                                             extraInfo=participant_info,
-                                             version="2020.2.10",  # TODO: указать правильную версию
-                                             autoLog=False,
-                                             savePickle=False)
+        if streaming:
+            self._writer: data_writers.DataWriter = data_writers.StreamingCsvWriter(fp=f"{file_name}.csv",
+                                                                                    schema=self._schema,
+                                                                                    extra_info=participant_info,
+                                                                                    append=resume_file_name is not None)
+        else:
+            self._writer = data_writers.ExperimentHandlerWriter(file_name=file_name,
+                                                                schema=self._schema,
+                                                                extra_info=participant_info)
 
-        self._saver.dataNames = data_to_save
+        if save_columns:
+            columnar_writer = columnar.ColumnarWriter(directory=f"{file_name}_columns",
+                                                      schema=self._schema,
+                                                      extra_info=participant_info)
+            self._writer = data_writers.MultiDataWriter([self._writer, columnar_writer])
 
+        if asynchronous:
+            self._writer = data_writers.AsyncDataWriter(self._writer)
+
+        self._file_name: str = file_name
         self._experiment_part: ExperimentPart = experiment_part
         self._task_type: Optional[str] = None
         self._combination_number: int = 0
@@ -130,6 +122,17 @@ class DataSaver:
         self._probe: Optional[str] = None
         self._probe_trial: int = 0
 
+    @property
+    def file_name(self) -> str:
+        """
+        :return: path of the data file without extension. Other session files are saved next to it
+        """
+        return self._file_name
+
+    @property
+    def writer(self) -> data_writers.DataWriter:
+        return self._writer
+
     def new_task(self, task_name: str, stage: str, task_type: Optional[str] = None):
         self._task_trial: int = 0
         self._task = task_name
@@ -150,28 +153,33 @@ class DataSaver:
                             time_from_experiment_start: float
                             ):
         self._probe_trial += 1
-        self._saver.addData("experiment_part", self._experiment_part.value)
-        self._saver.addData("stage", "probe training")
-        self._saver.addData("probe_trial", self._probe_trial)
-        self._saver.addData("probe", probe_name)
-        self._saver.addData("RT", rt)
-        self._saver.addData("is_correct", int(is_correct))
-        self._saver.addData("time_from_experiment_start", time_from_experiment_start)
-        self._saver.nextEntry()
+        record = self._schema.new_record()
+        record.experiment_part = self._experiment_part.value
+        record.stage = "probe training"
+        record.probe_trial = self._probe_trial
+        record.probe = probe_name
+        record.RT = rt
+        record.is_correct = int(is_correct)
+        record.time_from_experiment_start = time_from_experiment_start
+        self._writer.write_entry(record)
 
     def save_task_practice(self,
                            task_name: str,
                            solution_time: float,
-                           time_from_experiment_start: float
+                           time_from_experiment_start: float,
+                           polled_solution_time: Optional[float] = None,
                            ):
         self._task_trial += 1
-        self._saver.addData("experiment_part", self._experiment_part.value)
-        self._saver.addData("stage", "task training")
-        self._saver.addData("task_trial", self._task_trial)
-        self._saver.addData("task", task_name)
-        self._saver.addData("task_solution_time", solution_time)
-        self._saver.addData("time_from_experiment_start", time_from_experiment_start)
-        self._saver.nextEntry()
+        record = self._schema.new_record()
+        record.experiment_part = self._experiment_part.value
+        record.stage = "task training"
+        if self._experiment_part == ExperimentPart.WM:
+            record.task_trial = self._task_trial
+        record.task = task_name
+        record.task_solution_time = solution_time
+        record.task_solution_polled_time = polled_solution_time
+        record.time_from_experiment_start = time_from_experiment_start
+        self._writer.write_entry(record)
 
     def save_experimental_probe_data(self,
                                      probe_name: str,
@@ -181,43 +189,72 @@ class DataSaver:
                                      ):
         self._probe_trial += 1
 
-        self._saver.addData("experiment_part", self._experiment_part.value)
-        self._saver.addData("stage", "experimental")
+        record = self._schema.new_record()
+        record.experiment_part = self._experiment_part.value
+        record.stage = "experimental"
         if self._experiment_part == ExperimentPart.WM:
-            self._saver.addData("combination_number", self._combination_number)
+            record.combination_number = self._combination_number
 
-        self._saver.addData("task", self._task)
+        record.task = self._task
         if self._experiment_part == ExperimentPart.INSIGHT:
-            self._saver.addData("task_type", self._task_type)
+            record.task_type = self._task_type
 
-        self._saver.addData("probe_trial", self._probe_trial)
-        self._saver.addData("probe", probe_name)
-        self._saver.addData("RT", rt)
-        self._saver.addData("is_correct", int(is_correct))
+        record.probe_trial = self._probe_trial
+        record.probe = probe_name
+        record.RT = rt
+        record.is_correct = int(is_correct)
 
-        self._saver.addData("time_from_experiment_start", time_from_experiment_start)
-        self._saver.nextEntry()
+        record.time_from_experiment_start = time_from_experiment_start
+        self._writer.write_entry(record)
 
     def save_experimental_task_data(self,
                                     solution_time: Optional[float],
-                                    time_from_experiment_start: float
+                                    time_from_experiment_start: float,
+                                    polled_solution_time: Optional[float] = None,
                                     ):
         self._task_trial += 1
 
-        self._saver.addData("experiment_part", self._experiment_part.value)
-        self._saver.addData("stage", "experimental")
+        record = self._schema.new_record()
+        record.experiment_part = self._experiment_part.value
+        record.stage = "experimental"
         if self._experiment_part == ExperimentPart.WM:
-            self._saver.addData("combination_number", self._combination_number)
-            self._saver.addData("task_trial", self._task_trial)
+            record.combination_number = self._combination_number
+            record.task_trial = self._task_trial
 
-        self._saver.addData("task", self._task)
+        record.task = self._task
         if self._experiment_part == ExperimentPart.INSIGHT:
-            self._saver.addData("task_type", self._task_type)
-        self._saver.addData("task_solution_time", solution_time)
-
-        self._saver.addData("time_from_experiment_start", time_from_experiment_start)
-        self._saver.nextEntry()
+            record.task_type = self._task_type
+        record.task_solution_time = solution_time
+        record.task_solution_polled_time = polled_solution_time
+
+        record.time_from_experiment_start = time_from_experiment_start
+        self._writer.write_entry(record)
+
+    def get_state(self) -> dict:
+        """
+        :return: counters of the session and position of written data, rows are written to disk before return
+        """
+        return dict(file_name=self._file_name,
+                    task_type=self._task_type,
+                    combination_number=self._combination_number,
+                    task=self._task,
+                    task_trial=self._task_trial,
+                    probe=self._probe,
+                    probe_trial=self._probe_trial,
+                    writer=self._writer.get_state())
+
+    def set_state(self, state: dict) -> None:
+        if state["file_name"] != self._file_name:
+            raise ValueError(f"State of session {state['file_name']} can not be used for session {self._file_name}")
+
+        self._task_type = state["task_type"]
+        self._combination_number = state["combination_number"]
+        self._task = state["task"]
+        self._task_trial = state["task_trial"]
+        self._probe = state["probe"]
+        self._probe_trial = state["probe_trial"]
+        self._writer.set_state(state["writer"])
 
     def close(self):
         self._participant_part_info_saver.save()
-        self._saver.close()
+        self._writer.close()
@@ -0,0 +1,302 @@
+from abc import ABC, abstractmethod
+import atexit
+import csv
+import os
+import queue
+import threading
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+from base import data_records
+
+Entry = data_records.TrialRecord
+
+
+class DataWriter(ABC):
+    """
+    Destination of DataSaver rows. Every entry is a single row of the participant data file
+    """
+
+    @abstractmethod
+    def write_entry(self, entry: Entry) -> None:
+        pass
+
+    @abstractmethod
+    def close(self) -> None:
+        pass
+
+    def get_state(self) -> dict:
+        """
+        :return: position of the writer after all written rows, so writing can be continued after restart
+        """
+        raise NotImplementedError(f"{type(self).__name__} can not be continued after restart")
+
+    def set_state(self, state: dict) -> None:
+        """
+        Drop rows written after the state was taken, they are written again by the continued session
+        """
+        raise NotImplementedError(f"{type(self).__name__} can not be continued after restart")
+
+
+class MultiDataWriter(DataWriter):
+    """
+    The same rows are written to every writer, for example to csv and to columnar files
+    """
+
+    def __init__(self, writers: Sequence[DataWriter]):
+        self._writers = tuple(writers)
+
+    def write_entry(self, entry: Entry) -> None:
+        for writer in self._writers:
+            writer.write_entry(entry)
+
+    def close(self) -> None:
+        for writer in self._writers:
+            writer.close()
+
+    def get_state(self) -> dict:
+        return dict(writers=[writer.get_state() for writer in self._writers])
+
+    def set_state(self, state: dict) -> None:
+        for writer, writer_state in zip(self._writers, state["writers"]):
+            writer.set_state(writer_state)
+
+
+class ExperimentHandlerWriter(DataWriter):
+    """
+    Rows are kept by psychopy.data.ExperimentHandler in memory and are saved on close
+    """
+
+    def __init__(self, file_name: str, schema: data_records.RecordSchema, extra_info: Dict[str, str]):
+        from psychopy import data
+
+        self._saver = data.ExperimentHandler(dataFileName=file_name,
+                                             extraInfo=extra_info,
+                                             version="2020.2.10",  # TODO: указать правильную версию
+                                             autoLog=False,
+                                             savePickle=False)
+        self._saver.dataNames = list(schema.names)
+
+    def write_entry(self, entry: Entry) -> None:
+        for name, value in zip(entry.columns, entry):
+            if value is not None:
+                self._saver.addData(name, value)
+        self._saver.nextEntry()
+
+    def close(self) -> None:
+        self._saver.close()
+
+
+class StreamingCsvWriter(DataWriter):
+    """
+    Every row is appended to the open csv file, so memory does not grow with the session
+    and rows are on disk if the experiment is quited or crashed.
+    File is flushed after flush_every rows or flush_interval seconds and synced to disk after fsync_interval seconds,
+    thus at most that many rows may be lost
+    """
+
+    def __init__(self,
+                 fp: str,
+                 schema: data_records.RecordSchema,
+                 extra_info: Dict[str, str],
+                 flush_every: int = 10,
+                 flush_interval: float = 1.0,
+                 fsync_interval: float = 5.0,
+                 append: bool = False):
+        """
+        :param append: continue existing file of the restarted session, header is not written again
+        """
+        if flush_every < 1:
+            raise ValueError(f"flush_every must be positive, but got {flush_every}")
+
+        self._extra_values = list(extra_info.values())
+        self._flush_every = flush_every
+        self._flush_interval = flush_interval
+        self._fsync_interval = fsync_interval
+
+        # the same layout and encoding as csv saved by psychopy.data.ExperimentHandler
+        self._file = open(fp, mode="a" if append else "w", encoding="utf-8-sig", newline="")
+        self._csv_writer = csv.writer(self._file)
+        if not append:
+            self._csv_writer.writerow(list(schema.names) + list(extra_info))
+
+        self._rows_not_flushed: int = 0
+        self._last_flush: float = time.monotonic()
+        self._last_fsync: float = self._last_flush
+
+        self.rows: int = 0
+
+        # rows written before escape or crash are saved on interpreter exit
+        atexit.register(self.close)
+
+    def write_entry(self, entry: Entry) -> None:
+        row = ["" if value is None else value for value in entry]
+        row.extend(self._extra_values)
+        self._csv_writer.writerow(row)
+        self.rows += 1
+        self._rows_not_flushed += 1
+
+        now = time.monotonic()
+        if self._rows_not_flushed >= self._flush_every or now - self._last_flush >= self._flush_interval:
+            self._flush(now)
+
+    def _flush(self, now: float, fsync: Optional[bool] = None) -> None:
+        self._file.flush()
+        self._rows_not_flushed = 0
+        self._last_flush = now
+
+        if fsync is None:
+            fsync = now - self._last_fsync >= self._fsync_interval
+
+        if fsync:
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+
+        self._flush(time.monotonic(), fsync=True)
+        self._file.close()
+        atexit.unregister(self.close)
+
+    def get_state(self) -> dict:
+        self._flush(time.monotonic(), fsync=True)
+        return dict(size=self._file.tell(), rows=self.rows)
+
+    def set_state(self, state: dict) -> None:
+        self._flush(time.monotonic())
+        # file is opened for append, so next rows are written right after the truncated part
+        self._file.truncate(state["size"])
+        self.rows = state["rows"]
+
+
+class AsyncDataWriter(DataWriter):
+    """
+    Rows are put into bounded queue and written by another writer on background thread,
+    so disk is never waited for in the frame loop.
+    When queue is full, write_entry waits for a free place instead of dropping the row.
+    Close waits until all queued rows are written
+    """
+
+    _CLOSE = None
+
+    def __init__(self, writer: DataWriter, max_queue_size: int = 1024):
+        if max_queue_size < 1:
+            raise ValueError(f"max_queue_size must be positive, but got {max_queue_size}")
+
+        self._writer = writer
+        self._queue: "queue.Queue[Optional[Tuple[Entry, float]]]" = queue.Queue(maxsize=max_queue_size)
+        self._error: Optional[BaseException] = None
+        self._closed = False
+
+        self.max_queue_depth: int = 0
+        self.backpressure_waits: int = 0
+        self.backpressure_time: float = 0.0
+        self.written: int = 0
+        self.max_write_latency: float = 0.0
+        self._total_write_latency: float = 0.0
+
+        # daemon thread does not prevent exit, rows left in queue are written by close at exit
+        self._thread = threading.Thread(target=self._write, name="data_writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def mean_write_latency(self) -> float:
+        """
+        :return: mean time in seconds from write_entry call to the moment row was written
+        """
+        if not self.written:
+            return 0.0
+
+        return self._total_write_latency / self.written
+
+    def _write(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is self._CLOSE:
+                return
+
+            if isinstance(item, threading.Event):
+                # all rows put before the event are written
+                item.set()
+                continue
+
+            entry, put_time = item
+            try:
+                self._writer.write_entry(entry)
+            except BaseException as error:
+                self._error = error
+                return
+
+            latency = time.perf_counter() - put_time
+            self.written += 1
+            self._total_write_latency += latency
+            self.max_write_latency = max(self.max_write_latency, latency)
+
+    def _raise_writer_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError("AsyncDataWriter failed to write data") from self._error
+
+    def write_entry(self, entry: Entry) -> None:
+        self._raise_writer_error()
+        if self._closed:
+            raise RuntimeError("AsyncDataWriter is closed")
+
+        self._put((entry, time.perf_counter()))
+
+    def _put(self, item) -> None:
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.backpressure_waits += 1
+            wait_start = time.perf_counter()
+            while True:
+                try:
+                    self._queue.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    # writer thread stopped on error will never free the place
+                    self._raise_writer_error()
+            self.backpressure_time += time.perf_counter() - wait_start
+
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+
+    def flush(self) -> None:
+        """
+        Wait until all queued rows are written
+        """
+        self._raise_writer_error()
+        if self._closed:
+            return
+
+        written = threading.Event()
+        self._put(written)
+        while not written.wait(timeout=0.1):
+            self._raise_writer_error()
+
+    def get_state(self) -> dict:
+        self.flush()
+        return self._writer.get_state()
+
+    def set_state(self, state: dict) -> None:
+        self.flush()
+        self._writer.set_state(state)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+
+        self._closed = True
+        atexit.unregister(self.close)
+        if self._thread.is_alive():
+            self._queue.put(self._CLOSE)
+            self._thread.join()
+
+        self._writer.close()
+        self._raise_writer_error()
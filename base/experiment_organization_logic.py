@@ -1,8 +1,11 @@
 import csv
-import random
 from itertools import count, product
-from random import choice, shuffle
-from typing import List, Union, Iterator, Dict, Optional, Tuple, NamedTuple, Any
+import random
+from typing import List, Union, Iterator, Dict, Optional, Sequence, Tuple, NamedTuple
+
+import numpy as np
+
+from base import condition_history, insight_planner
 
 
 class ProbeInfo(NamedTuple):
@@ -64,6 +67,9 @@ class TrainingSequence:
                                    trials=trials)
             self._probes_info.append(probe_info)
 
+    def __len__(self) -> int:
+        return len(self._probes_info)
+
     def __getitem__(self, item) -> ProbeInfo:
         return self._probes_info[item]
 
@@ -77,12 +83,26 @@ class ExperimentWMSequence:
                  tasks: Tuple[str, ...],
                  probes: Tuple[str, ...],
                  task_instructions_path: FilePath = "text/task instructions.csv",
-                 probe_instructions_path: FilePath = "text/probe instructions one.csv"):
-        tasks_and_probes = list(product(tasks, probes))
-        shuffle(tasks_and_probes)
+                 probe_instructions_path: FilePath = "text/probe instructions one.csv",
+                 order: Optional[Sequence[int]] = None,
+                 rng: Optional[random.Random] = None):
+        """
+        :param order: indices of combinations from combinations(tasks, probes) in order of presentation,
+            e.g. row of counterbalancing design. Combinations are shuffled if it is None
+        :param rng: stream of the session to shuffle combinations, e.g. from SessionRNG
+        """
+        tasks_and_probes = self.combinations(tasks, probes)
+        if order is None:
+            rng = rng if rng is not None else random.Random()
+            rng.shuffle(tasks_and_probes)
+        else:
+            if sorted(order) != list(range(len(tasks_and_probes))):
+                raise ValueError(f"order must be permutation of {len(tasks_and_probes)} combinations, but got {order}")
+            tasks_and_probes = [tasks_and_probes[idx] for idx in order]
 
         self._tasks_sequence, probes = zip(*tasks_and_probes)
 
+        self._probe_instructions_path = probe_instructions_path
         self._probes_sequence = TrainingSequence(probes_sequence=probes,
                                                  trials=None,
                                                  probe_instructions_path=probe_instructions_path)
@@ -92,12 +112,34 @@ class ExperimentWMSequence:
 
         self._task_showed = {task: False for task in tasks}
 
+    @staticmethod
+    def combinations(tasks: Tuple[str, ...], probes: Tuple[str, ...]) -> List[Tuple[str, str]]:
+        """
+        :return: all combinations of task and probe, order argument refers to their indices
+        """
+        return list(product(tasks, probes))
+
     def _load_instructions(self, path: str):
         with open(path, mode="r", encoding="UTF-8") as instructions_file:
             reader = csv.DictReader(instructions_file)
             for row in reader:
                 self._task_instructions[row["task"]] = row["instruction"]
 
+    def __len__(self) -> int:
+        return len(self._tasks_sequence)
+
+    def instructions_of(self, item) -> List[str]:
+        """
+        Unlike __getitem__ do not mark task as showed
+
+        :param item: index of task and probe combination
+        :return: paths to instructions of combination. Empty if there is no such combination
+        """
+        if not 0 <= item < len(self):
+            return []
+
+        return [self._task_instructions[self._tasks_sequence[item]], self._probes_sequence[item].instruction]
+
     def __getitem__(self, item) -> Tuple[WMTaskInfo, ProbeInfo]:
         probe = self._probes_sequence[item]
 
@@ -114,10 +156,25 @@ class ExperimentWMSequence:
 
         return task, probe
 
+    def get_state(self) -> dict:
+        """
+        :return: order of combinations and trained tasks, so the sequence can be continued after restart
+        """
+        return dict(tasks=tuple(self._tasks_sequence),
+                    probes=tuple(probe.name for probe in self._probes_sequence),
+                    task_showed=dict(self._task_showed))
+
+    def set_state(self, state: dict) -> None:
+        self._tasks_sequence = tuple(state["tasks"])
+        self._probes_sequence = TrainingSequence(probes_sequence=tuple(state["probes"]),
+                                                 trials=None,
+                                                 probe_instructions_path=self._probe_instructions_path)
+        self._task_showed = dict(state["task_showed"])
+
 
 class ExperimentInsightTaskSequence:
     """
-    Create sequence of insight tasks and probes
+    Create sequence of insight tasks and probes. Whole session is planned in advance
     """
 
     def __init__(self,
@@ -126,33 +183,44 @@ class ExperimentInsightTaskSequence:
                  probes: Tuple[str, ...],
                  tasks_conditions_per_probe: int = 2,
                  task_instruction_path: FilePath = "images/Инструкции/Задания/Инсайтная задача.png",
-                 probe_instructions_path: FilePath = "text/probe instructions two.csv"):
+                 probe_instructions_path: FilePath = "text/probe instructions two.csv",
+                 plan: Optional[insight_planner.SessionPlan] = None,
+                 plan_fp: Optional[FilePath] = None,
+                 history: Optional[condition_history.ConditionHistory] = None,
+                 rng: Optional[np.random.Generator] = None):
+        """
+        :param plan: plan of the session, e.g. loaded plan file. New plan is generated if it is None
+        :param plan_fp: where to save plan of the session
+        :param history: conditions of tasks in previous sessions, new plan evens them out
+        :param rng: generator of the session for new plan, e.g. from SessionRNG
+        """
         self._task_instruction_path = task_instruction_path
         self._tasks: Dict[str, Dict[str, str]] = {}
         self._load_tasks(tasks_fp, id_column)
 
-        probes_for_tasks = self._generate_probes(probes)
-        self._probes_sequence = TrainingSequence(probes_sequence=probes_for_tasks,
+        conditions = tuple(next(iter(self._tasks.values())).keys())
+        self._planner = insight_planner.InsightSessionPlanner(tasks=tuple(self._tasks),
+                                                              conditions=conditions,
+                                                              probes=probes,
+                                                              tasks_conditions_per_probe=tasks_conditions_per_probe)
+        self._probe_instructions_path = probe_instructions_path
+        if plan is None:
+            weights = None if history is None else history.weights(self._planner.tasks, self._planner.conditions)
+            plan = self._planner.plan(rng=rng, condition_weights=weights)
+        self._set_plan(plan)
+
+        if plan_fp is not None:
+            self._plan.save(plan_fp)
+
+    def _set_plan(self, plan: insight_planner.SessionPlan) -> None:
+        errors = self._planner.validate(plan)
+        if errors:
+            raise ValueError("Plan of the session does not meet balance constraints:\n" + "\n".join(errors))
+
+        self._plan = plan
+        self._probes_sequence = TrainingSequence(probes_sequence=plan.probes,
                                                  trials=None,
-                                                 probe_instructions_path=probe_instructions_path)
-        self._probes_conditions = self._generate_probe_conditions(probes, tasks_conditions_per_probe)
-        self._participants_data: Optional[Dict[str, Tuple[float]]] = None
-        self._load_participants_data()
-
-    def _generate_probes(self, probes) -> Tuple[Any, ...]:
-        number_of_each_probe_use = len(self._tasks) / len(probes)
-
-        if not number_of_each_probe_use.is_integer():
-            raise ValueError(f"Quantity of tasks {self._tasks} is not multiple to probes {len(probes)}")
-
-        number_of_each_probe_use = int(number_of_each_probe_use)
-        probes_for_tasks = list(probes * number_of_each_probe_use)
-        shuffle(probes_for_tasks)
-        return tuple(probes_for_tasks)
-
-    def _generate_probe_conditions(self, probes, repeat):
-        conditions = tuple(choice(tuple(self._tasks.values())).keys())
-        return {probe: list(conditions * repeat) for probe in probes}
+                                                 probe_instructions_path=self._probe_instructions_path)
 
     def _load_tasks(self,
                     path: str,
@@ -164,39 +232,41 @@ class ExperimentInsightTaskSequence:
                                                for task_type, task_text in row.items()
                                                if task_type != id_column}
 
-    def _load_participants_data(self):  # TODO: функция для сбора статистики о уже проведенных типах задач
-        pass
-
-    def _get_task_type_based_on_participants_data(self, conditions, task):
-        if self._participants_data is None:
-            return random.choices(population=list(set(conditions)), weights=[0.5, 0.5])[0]
-
-        return random.choices(population=list(set(conditions)), weights=self._participants_data[task])[0]
+    @property
+    def plan(self) -> insight_planner.SessionPlan:
+        return self._plan
 
-    def _choose_task(self, probe_name: str) -> Tuple[str, str, str]:
-        possible_conditions = self._probes_conditions[probe_name]
-        chosen_task_id, task_types = choice(list(self._tasks.items()))
-        del self._tasks[chosen_task_id]
+    def __len__(self) -> int:
+        return len(self._probes_sequence)
 
-        task_type = possible_conditions[0]
-        if self._is_task_type_can_be_chosen(possible_conditions):
-            task_type = self._get_task_type_based_on_participants_data(possible_conditions, chosen_task_id)
+    def instructions_of(self, item) -> List[str]:
+        """
+        Unlike __getitem__ do not choose task
 
-        self._probes_conditions[probe_name].remove(task_type)
-        task_content = task_types[task_type]
-        return chosen_task_id, task_type, task_content
+        :param item: index of task and probe combination
+        :return: paths to instructions of combination. Empty if there is no such combination
+        """
+        if not 0 <= item < len(self):
+            return []
 
-    @staticmethod
-    def _is_task_type_can_be_chosen(conditions):
-        return len(set(conditions)) == 2
+        return [self._probes_sequence[item].instruction]
 
     def __getitem__(self, item) -> Tuple[InsightTaskInfo, ProbeInfo]:
         probe = self._probes_sequence[item]
 
-        task_name, task_type, content = self._choose_task(probe_name=probe.name)
+        task_name, task_type = self._plan.tasks[item], self._plan.conditions[item]
         task = InsightTaskInfo(name=task_name,
                                type=task_type,
                                instruction=self._task_instruction_path,
-                               content=content)
+                               content=self._tasks[task_name][task_type])
 
         return task, probe
+
+    def get_state(self) -> dict:
+        """
+        :return: plan of the session, tasks are not changed by presentation
+        """
+        return dict(plan=tuple(self._plan))
+
+    def set_state(self, state: dict) -> None:
+        self._set_plan(insight_planner.SessionPlan(*state["plan"]))
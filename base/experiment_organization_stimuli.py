@@ -1,19 +1,36 @@
-import csv
-from itertools import cycle
 import os
-from typing import Optional, Iterator, Dict, List
+from typing import Optional, Iterable, Dict, List
 
-from psychopy.hardware import keyboard
-from psychopy import core, gui, visual
+from base import participant_registry, texture_cache
+from base.backend import core, gui, keyboard, load_sound, visual
 
 
 class InstructionImage:
-    def __init__(self, window: visual.Window, skip: bool):
+    def __init__(self,
+                 window: visual.Window,
+                 skip: bool,
+                 textures: Optional[texture_cache.InstructionTextureCache] = None):
         self._win = window
         self._image_stimulus = visual.ImageStim(win=self._win)
         self._keyboard = keyboard.Keyboard()
         self._skip = skip
 
+        if textures is None:
+            textures = texture_cache.InstructionTextureCache()
+        self._textures = textures
+
+    def warm(self, paths: Iterable[Optional[str]]) -> None:
+        """
+        Decode instructions in background, so they are shown without delay
+
+        :param paths: paths to instruction image files that will be shown soon
+        :return:
+        """
+        if self._skip:
+            return
+
+        self._textures.warm(path for path in paths if path is not None)
+
     def show(self, path: Optional[str]) -> None:
         """
         Show instruction if there is any. Otherwise do nothing.
@@ -24,7 +41,7 @@ class InstructionImage:
         if path is None or self._skip:
             return
 
-        self._image_stimulus.image = path
+        self._image_stimulus.image = self._textures.get(path)
         self._keyboard.clearEvents()
 
         while True:
@@ -44,15 +61,21 @@ class GeneralInstructions:
     def __init__(self,
                  fp: str,
                  window: visual.Window,
-                 skip: bool):
+                 skip: bool,
+                 textures: Optional[texture_cache.InstructionTextureCache] = None):
         self._win = window
         self._images_fp = self._find_images(fp)
+        self._next_image_idx = 0
         self._image_stimulus = visual.ImageStim(win=self._win)
         self._keyboard = keyboard.Keyboard()
         self._skip = skip
 
+        if textures is None:
+            textures = texture_cache.InstructionTextureCache()
+        self._textures = textures
+
     @staticmethod
-    def _find_images(fp: str) -> Iterator[str]:
+    def _find_images(fp: str) -> List[str]:
         images_fp = [os.path.join(fp, image)
                      for image in os.listdir(fp)
                      if image.endswith(".png")]
@@ -60,7 +83,18 @@ class GeneralInstructions:
         if not images_fp:
             raise ValueError(f"There is not png images in the directory {fp}")
 
-        return cycle(images_fp)
+        return images_fp
+
+    def warm(self) -> None:
+        """
+        Decode next instruction in background, so it is shown without delay
+
+        :return:
+        """
+        if self._skip:
+            return
+
+        self._textures.warm([self._images_fp[self._next_image_idx]])
 
     def show(self) -> None:
         """
@@ -71,7 +105,9 @@ class GeneralInstructions:
         if self._skip:
             return
 
-        self._image_stimulus.image = next(self._images_fp)
+        self._image_stimulus.image = self._textures.get(self._images_fp[self._next_image_idx])
+        self._next_image_idx = (self._next_image_idx + 1) % len(self._images_fp)
+        self.warm()
         self._keyboard.clearEvents()
 
         while True:
@@ -104,7 +140,7 @@ class EndMessage:
     def __init__(self,
                  window: visual.Window,
                  end_phrase: str):
-        from psychopy import sound
+        sound = load_sound()
         self._win = window
         self._end_message = visual.TextStim(window,
                                             color="black",
@@ -153,10 +189,16 @@ class ParticipantInfoLinker:
     Class used in second part of experiment to link data from first and second part of experiment
     """
 
-    def __init__(self, participants_info_fp: str):
+    def __init__(self,
+                 participants_info_fp: str = participant_registry.LEGACY_CSV_FP,
+                 registry_fp: str = participant_registry.REGISTRY_FP):
+        """
+        :param participants_info_fp: participants info csv of previous versions, moved to the registry once
+        :param registry_fp: path to participant registry
+        """
         self._participant_info_to_save_by = []
         self._participant_name_ids = []
-        self._participants_info_to_show = self._load_info(participants_info_fp)
+        self._participants_info_to_show = self._load_info(participants_info_fp, registry_fp)
         info = dict(Испытуемый=self._participants_info_to_show)
         dialog_title = "Выберите имя испытуемого из первой части эксперимента"
         self._dialog = gui.DlgFromDict(dictionary=info, title=dialog_title)
@@ -168,22 +210,21 @@ class ParticipantInfoLinker:
         participant_info.update(dict(wm_file_name=participant_wm_file))
         self.filled_info = participant_info
 
-    def _load_info(self, fp) -> List[str]:
-        with open(fp, mode="r", encoding="UTF-8") as csv_file:
-            csv_reader = csv.DictReader(csv_file)
-
-            only_finished_first_part_to_choose_from = []
-            for row in csv_reader:
-                name_age_gender, wm_file, insight_file = row["participant"], row["WM_name"], row["Insight_name"]
-
-                self._check_data(name_age_gender, wm_file)
-
-                if insight_file != "":
-                    continue
-
-                only_finished_first_part_to_choose_from.append(f"{name_age_gender} (файл {wm_file})")
-                self._participant_info_to_save_by.append(wm_file)
-                self._participant_name_ids.append(name_age_gender)
+    def _load_info(self, legacy_csv_fp: str, registry_fp: str) -> List[str]:
+        registry = participant_registry.ParticipantRegistry(fp=registry_fp, legacy_csv_fp=legacy_csv_fp)
+        try:
+            # registry finds participants without second part by index
+            participants = registry.without_second_part()
+        finally:
+            registry.close()
+
+        only_finished_first_part_to_choose_from = []
+        for name_age_gender, wm_file, _ in participants:
+            self._check_data(name_age_gender, wm_file)
+
+            only_finished_first_part_to_choose_from.append(f"{name_age_gender} (файл {wm_file})")
+            self._participant_info_to_save_by.append(wm_file)
+            self._participant_name_ids.append(name_age_gender)
         return only_finished_first_part_to_choose_from
 
     @staticmethod
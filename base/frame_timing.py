@@ -0,0 +1,152 @@
+import atexit
+import csv
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class FrameTelemetry:
+    """
+    Record time of every window flip in preallocated ring buffer.
+    Full buffer is appended to csv file, so every data row can be checked against frames that produced it
+    """
+
+    COLUMNS = ("stage", "task", "probe", "probe_trial", "flip_time", "flip_interval", "dropped_frames")
+
+    def __init__(self,
+                 save_fp: str,
+                 frame_period: float,
+                 capacity: int = 4096,
+                 drop_tolerance: float = 0.5):
+        if frame_period <= 0:
+            raise ValueError(f"frame_period must be positive, but got {frame_period}")
+
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1, but got {capacity}")
+
+        self._save_fp = save_fp
+        self._frame_period = frame_period
+        # interval longer than (1 + drop_tolerance) frames means that at least one frame was dropped
+        self._drop_threshold = frame_period * (1 + drop_tolerance)
+        self._capacity = capacity
+
+        self._stage = np.zeros(capacity, dtype=np.int16)
+        self._task = np.zeros(capacity, dtype=np.int16)
+        self._probe = np.zeros(capacity, dtype=np.int16)
+        self._probe_trial = np.zeros(capacity, dtype=np.int32)
+        self._flip_time = np.zeros(capacity, dtype=np.float64)
+        self._flip_interval = np.zeros(capacity, dtype=np.float64)
+        self._dropped_frames = np.zeros(capacity, dtype=np.int32)
+
+        self._position: int = 0
+        self._unsaved: int = 0
+
+        # strings are stored as codes, so no string is kept per flip
+        self._names: List[str] = [""]
+        self._codes: Dict[str, int] = {"": 0}
+
+        self._current_stage: int = 0
+        self._current_task: int = 0
+        self._current_probe: int = 0
+        self._current_probe_trial: int = 0
+        self._previous_flip_time: Optional[float] = None
+
+        self.flips: int = 0
+        self.dropped_frames: int = 0
+
+        # flips of session ended by escape or crash are saved on interpreter exit
+        atexit.register(self.close)
+
+    def _code(self, name: Optional[str]) -> int:
+        if name is None:
+            name = ""
+
+        if name not in self._codes:
+            self._codes[name] = len(self._names)
+            self._names.append(name)
+
+        return self._codes[name]
+
+    def new_block(self, stage: str, task: Optional[str] = None, probe: Optional[str] = None) -> None:
+        """
+        Start to record flips of new block of trials. Mirrors DataSaver.new_probe,
+        i.e. probe trials are counted from the beginning.
+        """
+        self._current_stage = self._code(stage)
+        self._current_task = self._code(task)
+        self._current_probe = self._code(probe)
+        self._current_probe_trial = 0
+        # between blocks instructions are shown, thus interval to them is not a frame drop
+        self._previous_flip_time = None
+
+    def new_trial(self) -> None:
+        self._current_probe_trial += 1
+
+    def record_flip(self, flip_time: float) -> None:
+        idx = self._position
+
+        self._stage[idx] = self._current_stage
+        self._task[idx] = self._current_task
+        self._probe[idx] = self._current_probe
+        self._probe_trial[idx] = self._current_probe_trial
+        self._flip_time[idx] = flip_time
+
+        if self._previous_flip_time is None:
+            self._flip_interval[idx] = np.nan
+            self._dropped_frames[idx] = 0
+        else:
+            interval = flip_time - self._previous_flip_time
+            self._flip_interval[idx] = interval
+
+            if interval > self._drop_threshold:
+                dropped = int(interval / self._frame_period + 0.5) - 1
+                self._dropped_frames[idx] = dropped
+                self.dropped_frames += dropped
+            else:
+                self._dropped_frames[idx] = 0
+
+        self._previous_flip_time = flip_time
+        self.flips += 1
+        self._position = (idx + 1) % self._capacity
+        self._unsaved += 1
+
+        if self._unsaved == self._capacity:
+            self.flush()
+
+    def recent_intervals(self) -> np.ndarray:
+        """
+        :return: intervals of flips which are still in the buffer in the order of flips
+        """
+        stored = min(self.flips, self._capacity)
+        order = np.arange(self._position - stored, self._position) % self._capacity
+        return self._flip_interval[order]
+
+    def flush(self) -> None:
+        if self._unsaved == 0:
+            return
+
+        start = self._position - self._unsaved
+        order = np.arange(start, self._position) % self._capacity
+
+        is_file_exist = os.path.exists(self._save_fp)
+        with open(self._save_fp, mode="a", encoding="UTF-8", newline="") as csv_file:
+            csv_writer = csv.writer(csv_file)
+
+            if not is_file_exist:
+                csv_writer.writerow(self.COLUMNS)
+
+            names = self._names
+            csv_writer.writerows(zip([names[code] for code in self._stage[order]],
+                                     [names[code] for code in self._task[order]],
+                                     [names[code] for code in self._probe[order]],
+                                     self._probe_trial[order].tolist(),
+                                     self._flip_time[order].tolist(),
+                                     self._flip_interval[order].tolist(),
+                                     self._dropped_frames[order].tolist()))
+
+        self._unsaved = 0
+
+    def close(self) -> None:
+        self.flush()
+        atexit.unregister(self.close)
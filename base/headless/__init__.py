@@ -0,0 +1,4 @@
+"""
+Replacement of PsychoPy window, keyboard, mouse and sound for machines without display.
+Time is virtual: it advances only on window flip, so whole session runs faster than real time
+"""
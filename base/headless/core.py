@@ -0,0 +1,57 @@
+import sys
+from typing import Optional
+
+_virtual_time: float = 0.0
+
+
+def getTime() -> float:
+    return _virtual_time
+
+
+def advance(seconds: float) -> None:
+    global _virtual_time
+
+    if seconds < 0:
+        raise ValueError(f"Virtual time can not go backwards, but got {seconds}")
+
+    _virtual_time += seconds
+
+
+def quit() -> None:
+    sys.exit(0)
+
+
+class Clock:
+    """
+    Same as psychopy.core.Clock, but counts virtual time
+    """
+
+    def __init__(self):
+        self._time_at_last_reset: float = getTime()
+
+    def getTime(self) -> float:
+        return getTime() - self._time_at_last_reset
+
+    def reset(self, newT: float = 0.0) -> None:
+        self._time_at_last_reset = getTime() + newT
+
+    def addTime(self, t: float) -> None:
+        self._time_at_last_reset += t
+
+
+class CountdownTimer(Clock):
+    def __init__(self, start: float = 0):
+        super().__init__()
+        self._countdown_duration: float = start
+        self.reset(start)
+
+    def getTime(self) -> float:
+        return self._time_at_last_reset - getTime()
+
+    def reset(self, t: Optional[float] = None) -> None:
+        if t is None:
+            t = self._countdown_duration
+        else:
+            self._countdown_duration = t
+
+        self._time_at_last_reset = getTime() + t
@@ -0,0 +1,8 @@
+import time
+
+
+def getDateStr(format: str = "%Y_%b_%d_%H%M") -> str:
+    """
+    Same as psychopy.data.getDateStr: current local time for file names
+    """
+    return time.strftime(format, time.localtime())
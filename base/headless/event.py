@@ -0,0 +1,84 @@
+import random
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from base.headless import core
+from base.headless.visual import Window
+
+
+class Mouse:
+    """
+    Mouse of simulated participant. It clicks left button after click interval
+    on one of the clickable stimuli drawn on the last frame
+    """
+
+    click_interval: Tuple[float, float] = (0.5, 3.0)
+    hold_time: float = 0.1
+    seed: Optional[int] = None
+
+    def __init__(self, visible: bool = True, newPos: Optional[Tuple[float, float]] = None, win: Optional[Window] = None):
+        self.visible = visible
+        self.win = win
+        self._random = random.Random(self.seed)
+        self._pos = np.zeros(2) if newPos is None else np.array(newPos, dtype=float)
+
+        self._click_reset_time: float = core.getTime()
+        self._press_time: float = 0.0
+        self._schedule_press(core.getTime())
+
+    def _schedule_press(self, after: float) -> None:
+        self._press_time = after + self._random.uniform(*self.click_interval)
+        self._is_target_chosen = False
+
+    def _is_pressed(self) -> bool:
+        now = core.getTime()
+
+        if now >= self._press_time + self.hold_time:
+            self._schedule_press(now)
+
+        if now < self._press_time:
+            return False
+
+        if not self._is_target_chosen:
+            self._is_target_chosen = True
+            self._move_to_target()
+
+        return True
+
+    def _move_to_target(self) -> None:
+        if self.win is None:
+            return
+
+        targets = [stimulus for stimulus in self.win.last_frame_stimuli if hasattr(stimulus, "contains")]
+        if targets:
+            self._pos = np.array(self._random.choice(targets).pos, dtype=float)
+
+    def setVisible(self, visible: bool) -> None:
+        self.visible = visible
+
+    def getPos(self) -> np.ndarray:
+        return self._pos.copy()
+
+    def setPos(self, newPos: Tuple[float, float] = (0, 0)) -> None:
+        self._pos = np.array(newPos, dtype=float)
+
+    def clickReset(self, buttons: Sequence[int] = (0, 1, 2)) -> None:
+        self._click_reset_time = core.getTime()
+        self._schedule_press(self._click_reset_time)
+
+    def getPressed(self, getTime: bool = False) -> Union[List[int], Tuple[List[int], List[float]]]:
+        is_pressed = self._is_pressed()
+        buttons = [int(is_pressed), 0, 0]
+
+        if not getTime:
+            return buttons
+
+        press_time = self._press_time - self._click_reset_time if is_pressed else 0.0
+        return buttons, [press_time, 0.0, 0.0]
+
+    def isPressedIn(self, shape, buttons: Sequence[int] = (0, 1, 2)) -> bool:
+        if 0 not in buttons or not self._is_pressed():
+            return False
+
+        return shape.contains(self._pos)
@@ -0,0 +1,24 @@
+from typing import Any, Dict, Optional, Sequence
+
+
+class DlgFromDict:
+    """
+    Dialog which is immediately accepted. Choices are filled with the first option and empty fields with filler
+    """
+
+    filler: str = "headless"
+
+    def __init__(self,
+                 dictionary: Dict[str, Any],
+                 title: str = "",
+                 order: Optional[Sequence[str]] = None,
+                 **kwargs):
+        for key, value in dictionary.items():
+            if isinstance(value, (list, tuple)):
+                dictionary[key] = value[0]
+            elif value == "":
+                dictionary[key] = self.filler
+
+        self.dictionary = dictionary
+        self.title = title
+        self.OK = True
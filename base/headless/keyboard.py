@@ -0,0 +1,73 @@
+import random
+from typing import List, Optional, Sequence, Tuple
+
+from base.headless import core
+
+
+class KeyPress:
+    def __init__(self, name: str, tDown: float, rt: float):
+        self.name = name
+        self.tDown = tDown
+        self.rt = rt
+        self.duration: Optional[float] = None
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, str):
+            return self.name == other
+
+        return super().__eq__(other)
+
+    def __hash__(self):
+        return hash(self.name)
+
+    def __repr__(self):
+        return f"KeyPress(name={self.name!r}, tDown={self.tDown}, rt={self.rt})"
+
+
+class Keyboard:
+    """
+    Keyboard of simulated participant. It presses one of the response keys
+    after response time since events were cleared or last key was pressed
+    """
+
+    response_keys: Tuple[str, ...] = ("right", "left", "space")
+    response_time: Tuple[float, float] = (0.25, 0.9)
+    seed: Optional[int] = None
+
+    def __init__(self, **kwargs):
+        self.clock = core.Clock()
+        self._random = random.Random(self.seed)
+        self._response_start: float = core.getTime()
+        self._response_time: float = self._random.uniform(*self.response_time)
+
+    def _next_response(self) -> None:
+        self._response_start = core.getTime()
+        self._response_time = self._random.uniform(*self.response_time)
+
+    def clearEvents(self, eventType: Optional[str] = None) -> None:
+        self._next_response()
+
+    def getKeys(self,
+                keyList: Optional[Sequence[str]] = None,
+                waitRelease: bool = True,
+                clear: bool = True) -> List[KeyPress]:
+        if keyList is None:
+            keyList = self.response_keys
+
+        possible_keys = [key for key in keyList if key in self.response_keys]
+        if not possible_keys:
+            return []
+
+        key_down_time = self._response_start + self._response_time
+        if core.getTime() < key_down_time:
+            return []
+
+        time_since_key_down = core.getTime() - key_down_time
+        key = KeyPress(name=self._random.choice(possible_keys),
+                       tDown=key_down_time,
+                       rt=self.clock.getTime() - time_since_key_down)
+
+        if clear:
+            self._next_response()
+
+        return [key]
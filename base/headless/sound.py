@@ -0,0 +1,52 @@
+import wave
+from typing import Any, Optional
+
+from base.headless import core
+
+NOT_STARTED = 0
+PLAYING = STARTED = 1
+STOPPED = FINISHED = -1
+
+
+class Sound:
+    """
+    Sound which is not played, but takes virtual time to finish
+    """
+
+    def __init__(self, value: Any = "A", secs: float = 0.5, sampleRate: int = 44100, **kwargs):
+        self.sampleRate = sampleRate
+        self.secs = secs
+        self._start_time: Optional[float] = None
+        self._duration: float = secs
+        self.setSound(value, secs=secs)
+
+    def setSound(self, value: Any, secs: Optional[float] = None, **kwargs) -> None:
+        if secs is None:
+            secs = self.secs
+
+        if isinstance(value, str) and value.endswith(".wav"):
+            with wave.open(value, mode="rb") as wav_file:
+                self._duration = wav_file.getnframes() / wav_file.getframerate()
+        elif hasattr(value, "__len__") and not isinstance(value, str):
+            self._duration = len(value) / self.sampleRate
+        else:
+            self._duration = secs
+
+        self._start_time = None
+
+    def play(self, **kwargs) -> None:
+        self._start_time = core.getTime()
+
+    def stop(self, **kwargs) -> None:
+        if self._start_time is not None:
+            self._start_time = core.getTime() - self._duration
+
+    @property
+    def status(self) -> int:
+        if self._start_time is None:
+            return NOT_STARTED
+
+        if core.getTime() - self._start_time >= self._duration:
+            return FINISHED
+
+        return PLAYING
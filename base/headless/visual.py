@@ -0,0 +1,170 @@
+import time
+from typing import Any, Callable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from base.headless import core
+
+
+class Window:
+    """
+    Window without display. Every flip advances virtual time by one frame
+    """
+
+    def __init__(self,
+                 size: Tuple[int, int] = (800, 600),
+                 color: Any = (0, 0, 0),
+                 units: str = "pix",
+                 fullscr: bool = False,
+                 frame_rate: float = 60.0,
+                 **kwargs):
+        self.size = np.array(size)
+        self.color = color
+        self.units = units
+        self.fullscr = fullscr
+        self.monitorFramePeriod: float = 1 / frame_rate
+
+        self._to_call_on_flip: List[Tuple[Callable, tuple, dict]] = []
+        self._last_flip_time: float = core.getTime()
+        self.stimuli_drawn: List["BaseVisualStim"] = []
+        self.last_frame_stimuli: List["BaseVisualStim"] = []
+
+        # statistics to benchmark python work done between flips
+        self.frames: int = 0
+        self.draw_calls: int = 0
+        self.python_time: float = 0.0
+        self.max_python_time: float = 0.0
+        self._last_flip_perf_counter: Optional[float] = None
+
+    def callOnFlip(self, function: Callable, *args, **kwargs) -> None:
+        self._to_call_on_flip.append((function, args, kwargs))
+
+    def getFutureFlipTime(self, targetTime: float = 0, clock: Union[None, str, core.Clock] = None) -> float:
+        next_flip = self._last_flip_time + self.monitorFramePeriod + targetTime
+
+        if clock is None:
+            return next_flip
+
+        if clock == "now":
+            return next_flip - core.getTime()
+
+        return clock.getTime() + next_flip - core.getTime()
+
+    def flip(self, clearBuffer: bool = True) -> float:
+        perf_counter = time.perf_counter()
+        if self._last_flip_perf_counter is not None:
+            frame_python_time = perf_counter - self._last_flip_perf_counter
+            self.python_time += frame_python_time
+            self.max_python_time = max(self.max_python_time, frame_python_time)
+
+        # time passes until the beginning of the next frame
+        flip_time = self._last_flip_time + self.monitorFramePeriod
+        core.advance(max(flip_time - core.getTime(), 0))
+        self._last_flip_time = core.getTime()
+
+        to_call_on_flip, self._to_call_on_flip = self._to_call_on_flip, []
+        for function, args, kwargs in to_call_on_flip:
+            function(*args, **kwargs)
+
+        if clearBuffer:
+            self.last_frame_stimuli, self.stimuli_drawn = self.stimuli_drawn, []
+
+        self.frames += 1
+        self._last_flip_perf_counter = time.perf_counter()
+        return self._last_flip_time
+
+    def mean_python_time_per_frame(self) -> float:
+        if self.frames < 2:
+            return 0.0
+
+        return self.python_time / (self.frames - 1)
+
+    def close(self) -> None:
+        pass
+
+
+class BaseVisualStim:
+    def __init__(self, win: Window, pos: Tuple[float, float] = (0, 0), **kwargs):
+        self.win = win
+        self.pos = np.array(pos, dtype=float)
+
+        for name, value in kwargs.items():
+            setattr(self, name, value)
+
+    def draw(self) -> None:
+        self.win.draw_calls += 1
+        self.win.stimuli_drawn.append(self)
+
+
+class ImageStim(BaseVisualStim):
+    def __init__(self, win: Window, image: Any = None, pos: Tuple[float, float] = (0, 0), **kwargs):
+        super().__init__(win, pos=pos, **kwargs)
+        self.image = image
+
+
+class TextStim(BaseVisualStim):
+    def __init__(self,
+                 win: Window,
+                 text: str = "",
+                 pos: Tuple[float, float] = (0, 0),
+                 height: Optional[float] = None,
+                 color: Any = "white",
+                 wrapWidth: Optional[float] = None,
+                 **kwargs):
+        super().__init__(win, pos=pos, **kwargs)
+        self.text = text
+        self.height = height
+        self.color = color
+        self.wrapWidth = wrapWidth
+
+
+class Rect(BaseVisualStim):
+    def __init__(self,
+                 win: Window,
+                 width: float = 0.5,
+                 height: float = 0.5,
+                 pos: Tuple[float, float] = (0, 0),
+                 **kwargs):
+        super().__init__(win, pos=pos, **kwargs)
+        self.width = width
+        self.height = height
+
+    def contains(self, x, y=None) -> bool:
+        if y is None:
+            x, y = x
+
+        half_width, half_height = self.width / 2, self.height / 2
+        return (self.pos[0] - half_width <= x <= self.pos[0] + half_width
+                and self.pos[1] - half_height <= y <= self.pos[1] + half_height)
+
+
+class ElementArrayStim(BaseVisualStim):
+    def __init__(self,
+                 win: Window,
+                 nElements: int = 100,
+                 sizes: Any = 2.0,
+                 fieldPos: Tuple[float, float] = (0.0, 0.0),
+                 elementTex: Any = None,
+                 elementMask: Any = None,
+                 **kwargs):
+        super().__init__(win, **kwargs)
+        self.nElements = nElements
+        self.sizes = sizes
+        self.fieldPos = np.array(fieldPos, dtype=float)
+        self.elementTex = elementTex
+        self.elementMask = elementMask
+        self.colors = None
+        self.xys = None
+
+    def setTex(self, value: Any, log: Optional[bool] = None) -> None:
+        self.elementTex = value
+
+    def setColors(self, colors: Any, colorSpace: Optional[str] = None, log: Optional[bool] = None) -> None:
+        self.colors = colors
+
+    def setXYs(self, value: Any = None, operation: str = "", log: Optional[bool] = None) -> None:
+        self.xys = value
+
+
+# psychopy.visual.basevisual is used in type hints of views
+basevisual = BaseVisualStim
@@ -0,0 +1,45 @@
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from base.backend import visual
+
+
+class RectHitIndex:
+    """
+    Bounds of not rotated rectangles kept in one array, so the rectangle under the point
+    is found by a single comparison instead of containment test of every stimulus.
+    Index must be rebuilt after rectangles were moved
+    """
+
+    def __init__(self, rects: Sequence[visual.Rect] = ()):
+        # every row is (left, bottom, right, top)
+        self._bounds: np.ndarray = np.empty((0, 4), dtype=float)
+        self.rebuild(rects)
+
+    def rebuild(self, rects: Sequence[visual.Rect]) -> None:
+        bounds = np.empty((len(rects), 4), dtype=float)
+        for idx, rect in enumerate(rects):
+            x, y = rect.pos
+            half_width, half_height = rect.width / 2, rect.height / 2
+            bounds[idx] = (x - half_width, y - half_height, x + half_width, y + half_height)
+
+        self._bounds = bounds
+
+    def __len__(self) -> int:
+        return len(self._bounds)
+
+    def find(self, point: Tuple[float, float]) -> Optional[int]:
+        """
+        :param point: point on the screen in units of rectangles
+        :return: index of the first rectangle containing the point or None
+        """
+        x, y = point
+        is_inside = ((self._bounds[:, 0] <= x) & (x <= self._bounds[:, 2])
+                     & (self._bounds[:, 1] <= y) & (y <= self._bounds[:, 3]))
+
+        inside_idx = np.flatnonzero(is_inside)
+        if inside_idx.size == 0:
+            return None
+
+        return int(inside_idx[0])
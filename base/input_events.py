@@ -0,0 +1,182 @@
+import collections
+import threading
+from typing import Deque, List, NamedTuple, Optional, Sequence, Tuple
+
+from base.backend import core, event, keyboard
+
+
+class KeyEvent(NamedTuple):
+    name: str
+    # time of key press by device clock of the queue
+    time: float
+
+
+class KeyboardEventQueue:
+    """
+    Keyboard events are collected on a dedicated thread, so trial loop does not poll keyboard on every frame.
+    Events are kept with time of key press given by device, so RT does not depend on the frame
+    when event was consumed.
+    Device clock is never reset, so onset of stimulus and key presses are measured by the same clock.
+    The queue is the only consumer of its keys, other keyboards must not poll them.
+    Collecting thread and mark_onset share the lock of the device, only drain is lock-free
+    """
+
+    def __init__(self,
+                 key_list: Sequence[str],
+                 poll_interval: float = 0.001,
+                 device: Optional[keyboard.Keyboard] = None):
+        self._key_list = list(key_list)
+        self._poll_interval = poll_interval
+        self._device = device if device is not None else keyboard.Keyboard()
+
+        # deque append and popleft are atomic, so drain does not take the lock
+        self._events: Deque[KeyEvent] = collections.deque()
+        # keyboard device is not used by two threads at once: mark_onset waits while collecting thread polls device
+        self._device_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.onset_time: Optional[float] = None
+        self.polls: int = 0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            raise RuntimeError("KeyboardEventQueue is already started")
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._collect, name="keyboard_events", daemon=True)
+        self._thread.start()
+
+    def _collect(self) -> None:
+        while not self._stopped.is_set():
+            with self._device_lock:
+                keys = self._device.getKeys(keyList=self._key_list, waitRelease=False)
+                self._events.extend(KeyEvent(name=key.name, time=key.rt) for key in keys)
+                self.polls += 1
+
+            self._stopped.wait(self._poll_interval)
+
+    def mark_onset(self) -> None:
+        """
+        Forget events collected so far and measure following RTs from now.
+        Call it on flip of the screen with stimulus: win.callOnFlip(queue.mark_onset)
+        """
+        with self._device_lock:
+            self._device.clearEvents(eventType="keyboard")
+            self._events.clear()
+            self.onset_time = self._device.clock.getTime()
+
+    def drain(self) -> List[KeyEvent]:
+        """
+        :return: events collected since last drain in order of key presses
+        """
+        events = []
+        while self._events:
+            events.append(self._events.popleft())
+
+        return events
+
+    def reaction_time(self, key_event: KeyEvent) -> float:
+        if self.onset_time is None:
+            raise RuntimeError("Onset of stimulus was not marked before reaction time was asked")
+
+        return key_event.time - self.onset_time
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class ClickEvent(NamedTuple):
+    button: int
+    is_press: bool
+    # time of press given by mouse since last reset. Release time is known only at poll
+    time: float
+    # time of the frame when click was noticed
+    polled_time: float
+    # position of pointer when click was noticed, mouse does not keep position of press
+    pos: Tuple[float, float]
+
+
+class MouseClickQueue:
+    """
+    Press and release events of mouse buttons with time of press given by mouse.
+    Mouse events are dispatched on window flip, so events are polled once per frame on the same thread.
+    Press is found by change of its time, so click released before the poll is not lost.
+    Times of press and times of poll are measured from the same reset of the queue.
+    Mouse keeps time of the last press until reset, so clicks made between tasks are forgotten by sync
+    """
+
+    def __init__(self,
+                 mouse: event.Mouse,
+                 buttons: Sequence[int] = (0,)):
+        self._mouse = mouse
+        self._clock = core.Clock()
+        self._buttons = tuple(buttons)
+
+        self._is_pressed: List[int] = []
+        self._press_times: List[float] = []
+        self._is_reset_scheduled: bool = False
+        self._sync_state()
+
+        self.max_poll_delay: float = 0.0
+
+    def _sync_state(self) -> None:
+        is_pressed, press_times = self._mouse.getPressed(getTime=True)
+        self._is_pressed, self._press_times = list(is_pressed), list(press_times)
+
+    def sync(self) -> None:
+        """
+        Forget clicks made so far, e.g. on screens between tasks, and poll nothing until reset.
+        Call it when reset is scheduled: queue.sync(); win.callOnFlip(queue.reset)
+        """
+        self._sync_state()
+        self._is_reset_scheduled = True
+
+    def reset(self) -> None:
+        """
+        Start measuring click times from now. Call it on flip of the screen with task:
+        win.callOnFlip(queue.reset)
+        """
+        self._mouse.clickReset(buttons=self._buttons)
+        self._clock.reset()
+        self._is_pressed = list(self._mouse.getPressed())
+        self._press_times = [0.0] * len(self._is_pressed)
+        self._is_reset_scheduled = False
+
+    def poll(self) -> List[ClickEvent]:
+        """
+        :return: clicks since last poll. Press of the button goes before its release.
+        Nothing is returned between sync and reset, because press times are not measured from the reset yet
+        """
+        if self._is_reset_scheduled:
+            return []
+
+        is_pressed, press_times = self._mouse.getPressed(getTime=True)
+        polled_time = self._clock.getTime()
+        pos = tuple(self._mouse.getPos())
+
+        events = []
+        for button in self._buttons:
+            is_new_press = press_times[button] > 0 and press_times[button] != self._press_times[button]
+            # mouse without press times: press is noticed only by change of state
+            is_new_press = is_new_press or (is_pressed[button] and not self._is_pressed[button]
+                                            and press_times[button] == self._press_times[button])
+
+            if is_new_press:
+                press_time = press_times[button] if press_times[button] > 0 else polled_time
+                events.append(ClickEvent(button=button, is_press=True, time=press_time, polled_time=polled_time,
+                                          pos=pos))
+                self.max_poll_delay = max(self.max_poll_delay, polled_time - press_time)
+
+            was_pressed = self._is_pressed[button] or is_new_press
+            if was_pressed and not is_pressed[button]:
+                events.append(ClickEvent(button=button, is_press=False, time=polled_time, polled_time=polled_time,
+                                          pos=pos))
+
+            self._press_times[button] = press_times[button]
+            self._is_pressed[button] = is_pressed[button]
+
+        return events
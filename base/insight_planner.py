@@ -0,0 +1,175 @@
+import json
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class SessionPlan(NamedTuple):
+    """
+    Probe, task and its condition of every combination of Insight session in order of presentation
+    """
+    probes: Tuple[str, ...]
+    tasks: Tuple[str, ...]
+    conditions: Tuple[str, ...]
+
+    def save(self, fp: str) -> None:
+        with open(fp, mode="w", encoding="UTF-8") as plan_file:
+            json.dump(dict(probes=self.probes, tasks=self.tasks, conditions=self.conditions),
+                      plan_file, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, fp: str) -> "SessionPlan":
+        with open(fp, mode="r", encoding="UTF-8") as plan_file:
+            plan = json.load(plan_file)
+
+        return cls(probes=tuple(plan["probes"]), tasks=tuple(plan["tasks"]), conditions=tuple(plan["conditions"]))
+
+
+class PlanBatch(NamedTuple):
+    """
+    Candidate plans as indices of probes, tasks and conditions, row is a plan and column is a combination
+    """
+    probes: np.ndarray
+    tasks: np.ndarray
+    conditions: np.ndarray
+
+
+class InsightSessionPlanner:
+    """
+    Plans of Insight session computed in advance. Every task is given once, every probe is used equal number of times
+    and every condition is used equal number of times with every probe
+    """
+
+    def __init__(self,
+                 tasks: Sequence[str],
+                 conditions: Sequence[str],
+                 probes: Sequence[str],
+                 tasks_conditions_per_probe: int = 2):
+        """
+        :param tasks: IDs of tasks
+        :param conditions: types of every task, e.g. Many and Few
+        :param tasks_conditions_per_probe: how many times every condition is used with every probe
+        """
+        self.tasks: Tuple[str, ...] = tuple(tasks)
+        self.conditions: Tuple[str, ...] = tuple(conditions)
+        self.probes: Tuple[str, ...] = tuple(probes)
+
+        if len(self.tasks) % len(self.probes) != 0:
+            raise ValueError(f"Quantity of tasks {len(self.tasks)} is not multiple to probes {len(self.probes)}")
+
+        self.uses_of_probe: int = len(self.tasks) // len(self.probes)
+        if self.uses_of_probe != len(self.conditions) * tasks_conditions_per_probe:
+            raise ValueError(f"Every probe is used {self.uses_of_probe} times, but {len(self.conditions)} conditions "
+                             f"must be used {tasks_conditions_per_probe} times with every probe")
+
+        # conditions of the uses of a probe before they are shuffled
+        self._probe_conditions = np.repeat(np.arange(len(self.conditions), dtype=np.int8),
+                                           tasks_conditions_per_probe)
+        self._probe_slots = np.repeat(np.arange(len(self.probes), dtype=np.int8), self.uses_of_probe)
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def generate(self, plans: int, rng: Optional[np.random.Generator] = None) -> PlanBatch:
+        """
+        :param plans: quantity of candidate plans
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        slots = len(self)
+
+        probes = self._probe_slots[rng.random((plans, slots)).argsort(axis=1)]
+        tasks = rng.random((plans, slots)).argsort(axis=1).astype(np.int16)
+
+        # shuffled conditions of every probe, k-th use of the probe takes k-th condition
+        probe_conditions = self._probe_conditions[rng.random((plans, len(self.probes), self.uses_of_probe))
+                                                  .argsort(axis=2)]
+        is_probe = probes[:, :, np.newaxis] == np.arange(len(self.probes))
+        use_of_probe = (np.cumsum(is_probe, axis=1) - 1)[is_probe].reshape(plans, slots)
+        conditions = probe_conditions[np.arange(plans)[:, np.newaxis], probes, use_of_probe]
+
+        return PlanBatch(probes=probes, tasks=tasks, conditions=conditions)
+
+    def is_valid(self, batch: PlanBatch) -> np.ndarray:
+        """
+        :return: for every plan whether it meets balance constraints
+        """
+        plans = len(batch.probes)
+        tasks_used = np.zeros((plans, len(self)), dtype=np.int64)
+        np.add.at(tasks_used, (np.arange(plans)[:, np.newaxis], batch.tasks), 1)
+
+        # uses of every pair of probe and condition
+        pairs = batch.probes.astype(np.int64) * len(self.conditions) + batch.conditions
+        pairs_used = np.zeros((plans, len(self.probes) * len(self.conditions)), dtype=np.int64)
+        np.add.at(pairs_used, (np.arange(plans)[:, np.newaxis], pairs), 1)
+
+        expected_pair_uses = self.uses_of_probe // len(self.conditions)
+        return (tasks_used == 1).all(axis=1) & (pairs_used == expected_pair_uses).all(axis=1)
+
+    def plan_of(self, batch: PlanBatch, idx: int) -> SessionPlan:
+        return SessionPlan(probes=tuple(self.probes[probe] for probe in batch.probes[idx]),
+                           tasks=tuple(self.tasks[task] for task in batch.tasks[idx]),
+                           conditions=tuple(self.conditions[condition] for condition in batch.conditions[idx]))
+
+    def plan(self,
+             rng: Optional[np.random.Generator] = None,
+             condition_weights: Optional[np.ndarray] = None,
+             candidates: int = 2000) -> SessionPlan:
+        """
+        :param condition_weights: (tasks, conditions) weights of giving task in condition.
+            Plan is chosen from candidates with probability proportional to product of weights of its tasks
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        if condition_weights is None:
+            candidates = 1
+
+        batch = self.generate(candidates, rng)
+        is_valid = self.is_valid(batch)
+        if not is_valid.any():
+            raise RuntimeError("Generated plans do not meet balance constraints")
+
+        if condition_weights is None:
+            return self.plan_of(batch, 0)
+
+        if condition_weights.shape != (len(self.tasks), len(self.conditions)):
+            raise ValueError(f"condition_weights must have shape {(len(self.tasks), len(self.conditions))}, "
+                             f"but got {condition_weights.shape}")
+
+        scores = np.log(condition_weights[batch.tasks, batch.conditions]).sum(axis=1)
+        scores[~is_valid] = -np.inf
+        probabilities = np.exp(scores - scores.max())
+        return self.plan_of(batch, rng.choice(candidates, p=probabilities / probabilities.sum()))
+
+    def validate(self, plan: SessionPlan) -> List[str]:
+        """
+        :return: description of every violated constraint, empty for valid plan
+        """
+        errors = []
+        if sorted(plan.tasks) != sorted(self.tasks):
+            errors.append(f"Tasks must be used once, but got {plan.tasks}")
+
+        for probe in self.probes:
+            probe_conditions = [condition for plan_probe, condition in zip(plan.probes, plan.conditions)
+                                if plan_probe == probe]
+            for condition in self.conditions:
+                uses = probe_conditions.count(condition)
+                if uses != self.uses_of_probe // len(self.conditions):
+                    errors.append(f"Condition {condition} is used {uses} times with probe {probe}")
+
+        unknown = set(plan.probes) - set(self.probes) | set(plan.conditions) - set(self.conditions)
+        if unknown:
+            errors.append(f"Plan has unknown probes or conditions {sorted(unknown)}")
+
+        return errors
+
+    def position_counts(self, batch: PlanBatch) -> Dict[str, np.ndarray]:
+        """
+        :return: how many plans have every probe and every condition at every position,
+            shapes are (positions, probes) and (positions, conditions)
+        """
+        positions = np.arange(len(self))
+        probes = np.zeros((len(self), len(self.probes)), dtype=np.int64)
+        np.add.at(probes, (positions[np.newaxis, :], batch.probes), 1)
+        conditions = np.zeros((len(self), len(self.conditions)), dtype=np.int64)
+        np.add.at(conditions, (positions[np.newaxis, :], batch.conditions), 1)
+
+        return dict(probes=probes, conditions=conditions)
@@ -0,0 +1,173 @@
+import csv
+import os
+import sqlite3
+from typing import List, NamedTuple, Optional
+
+REGISTRY_FP = "data/participants.sqlite3"
+LEGACY_CSV_FP = "data/participants info.csv"
+CSV_HEADER = ["participant", "WM_name", "Insight_name"]
+
+
+class ParticipantEntry(NamedTuple):
+    # name, age and gender separated by spaces
+    participant: str
+    wm_name: str
+    insight_name: str
+
+
+class ParticipantRegistry:
+    """
+    Participants of both parts of experiment in SQLite database.
+    Session adds or updates one row in a transaction, so several stations can use the same file.
+    Rollback journal is used instead of WAL, because WAL does not work for a file on a network drive
+    """
+
+    def __init__(self,
+                 fp: str = REGISTRY_FP,
+                 legacy_csv_fp: Optional[str] = LEGACY_CSV_FP,
+                 timeout: float = 30.0):
+        """
+        :param fp: path to database file, it is created if it does not exist
+        :param legacy_csv_fp: participants info csv, which rows are moved to the registry once
+        :param timeout: seconds to wait for another station to finish its transaction
+        """
+        directory = os.path.dirname(fp)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # transactions are managed explicitly
+        self._connection = sqlite3.connect(fp, timeout=timeout, isolation_level=None)
+        self._create_tables()
+
+        if legacy_csv_fp is not None and os.path.exists(legacy_csv_fp):
+            self.migrate_from_csv(legacy_csv_fp)
+
+    def _create_tables(self) -> None:
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS participants (
+                id INTEGER PRIMARY KEY,
+                participant TEXT NOT NULL CHECK (participant != ''),
+                wm_name TEXT NOT NULL UNIQUE CHECK (wm_name != ''),
+                insight_name TEXT NOT NULL DEFAULT ''
+            );
+            CREATE INDEX IF NOT EXISTS participants_by_participant ON participants (participant);
+            CREATE INDEX IF NOT EXISTS participants_without_second_part ON participants (id)
+                WHERE insight_name = '';
+            CREATE TABLE IF NOT EXISTS migrations (
+                source TEXT PRIMARY KEY,
+                rows INTEGER NOT NULL,
+                size INTEGER NOT NULL DEFAULT -1,
+                mtime_ns INTEGER NOT NULL DEFAULT -1
+            );
+        """)
+
+        # registry created before size and modification time of migrated file were kept
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(migrations)")}
+        for column in ("size", "mtime_ns"):
+            if column not in columns:
+                self._connection.execute(f"ALTER TABLE migrations ADD COLUMN {column} INTEGER NOT NULL DEFAULT -1")
+
+    def _execute_in_transaction(self, sql: str, parameters: tuple) -> sqlite3.Cursor:
+        # IMMEDIATE takes write lock at once, so two stations do not fail on upgrade of read lock
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = self._connection.execute(sql, parameters)
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+
+        self._connection.execute("COMMIT")
+        return cursor
+
+    def add_first_part(self, participant: str, wm_name: str) -> None:
+        self._execute_in_transaction("INSERT INTO participants (participant, wm_name) VALUES (?, ?)",
+                                     (participant, wm_name))
+
+    def add_second_part(self, wm_name: str, insight_name: str) -> None:
+        cursor = self._execute_in_transaction("UPDATE participants SET insight_name = ? WHERE wm_name = ?",
+                                              (insight_name, wm_name))
+        if cursor.rowcount == 0:
+            raise ValueError(f"Participant with WM file {wm_name} is not registered")
+
+    def find_by_wm_name(self, wm_name: str) -> Optional[ParticipantEntry]:
+        row = self._connection.execute("SELECT participant, wm_name, insight_name FROM participants "
+                                       "WHERE wm_name = ?", (wm_name,)).fetchone()
+        return None if row is None else ParticipantEntry(*row)
+
+    def find_by_participant(self, participant: str) -> List[ParticipantEntry]:
+        rows = self._connection.execute("SELECT participant, wm_name, insight_name FROM participants "
+                                        "WHERE participant = ? ORDER BY id", (participant,))
+        return [ParticipantEntry(*row) for row in rows]
+
+    def without_second_part(self) -> List[ParticipantEntry]:
+        """
+        :return: participants who finished the first part, in order of registration
+        """
+        rows = self._connection.execute("SELECT participant, wm_name, insight_name FROM participants "
+                                        "WHERE insight_name = '' ORDER BY id")
+        return [ParticipantEntry(*row) for row in rows]
+
+    def all(self) -> List[ParticipantEntry]:
+        """
+        :return: all participants in order of registration
+        """
+        rows = self._connection.execute("SELECT participant, wm_name, insight_name FROM participants ORDER BY id")
+        return [ParticipantEntry(*row) for row in rows]
+
+    def _is_migrated(self, source: str, size: int, mtime_ns: int) -> bool:
+        row = self._connection.execute("SELECT size, mtime_ns FROM migrations WHERE source = ?",
+                                       (source,)).fetchone()
+        return row is not None and tuple(row) == (size, mtime_ns)
+
+    def migrate_from_csv(self, csv_fp: str) -> int:
+        """
+        Move rows of participants info csv to the registry. File is migrated once, it is read again only if
+        its size or modification time changed. Rows with WM file already in the registry are skipped
+        :return: number of added rows
+        """
+        source = os.path.abspath(csv_fp)
+        stat = os.stat(csv_fp)
+        # the same file is checked on every start of session, so it is not read after migration
+        if self._is_migrated(source, stat.st_size, stat.st_mtime_ns):
+            return 0
+
+        with open(csv_fp, mode="r", encoding="UTF-8", newline="") as csv_file:
+            rows = [ParticipantEntry(row["participant"], row["WM_name"], row["Insight_name"])
+                    for row in csv.DictReader(csv_file)]
+
+        for row in rows:
+            if row.participant == "" or row.wm_name == "":
+                raise ValueError(f"В файле с идентификторами испытуемых ошибка:\n"
+                                 f"должны быть заполнены первый и второй столбец, а вместо этого\n"
+                                 f"[{row.participant}, {row.wm_name}]")
+
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            added = 0
+            # another station could migrate the file while it was read
+            if not self._is_migrated(source, stat.st_size, stat.st_mtime_ns):
+                before = self._connection.total_changes
+                self._connection.executemany("INSERT OR IGNORE INTO participants (participant, wm_name, insight_name) "
+                                             "VALUES (?, ?, ?)", rows)
+                added = self._connection.total_changes - before
+                self._connection.execute("INSERT OR REPLACE INTO migrations (source, rows, size, mtime_ns) "
+                                         "VALUES (?, ?, ?, ?)", (source, added, stat.st_size, stat.st_mtime_ns))
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+
+        self._connection.execute("COMMIT")
+        return added
+
+    def export_csv(self, csv_fp: str) -> None:
+        """
+        Save registry in the format of participants info csv
+        """
+        rows = self.all()
+        with open(csv_fp, mode="w", encoding="UTF-8", newline="") as csv_file:
+            csv_writer = csv.writer(csv_file)
+            csv_writer.writerow(CSV_HEADER)
+            csv_writer.writerows(rows)
+
+    def close(self) -> None:
+        self._connection.close()
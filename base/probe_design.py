@@ -0,0 +1,122 @@
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from base import probe_presenters
+
+
+class DesignTargets(NamedTuple):
+    """
+    Expected properties of probe sequences, None is not checked
+    """
+    # share of trials with "right" as correct key
+    right_answers: Optional[float] = 0.5
+    # share of trials with congruent word and color
+    congruency_rate: Optional[float] = None
+    # share of trials with the same probe as on the previous trial
+    same_ratio: Optional[float] = None
+    # longest run of trials with the same correct key
+    max_run: Optional[int] = None
+    # allowed difference of shares from targets
+    tolerance: float = 0.02
+
+
+TARGETS: Dict[str, DesignTargets] = {
+    "TwoAlternatives": DesignTargets(),
+    "Switch": DesignTargets(),
+    "Inhibition": DesignTargets(congruency_rate=1 / 6),
+    # correct key of Update probe is "right" for the same probe, so balanced keys are balanced same and different.
+    # Targets are the settings of Update probe in experiments
+    "Update": DesignTargets(right_answers=None, **probe_presenters.UPDATE_ANSWERS),
+}
+
+
+class DesignReport(NamedTuple):
+    """
+    Empirical properties of simulated probe sequences. Trials without correct key are not counted
+    """
+    probe_type: str
+    sequences: int
+    trials: int
+    right_answers: float
+    # nan for probes without congruency
+    congruency_rate: float
+    same_ratio: float
+    mean_run: float
+    max_run: int
+    # how many runs of the same correct key have every length, index is the length
+    run_lengths: np.ndarray
+
+
+def _congruent_probes(probe: probe_presenters.Probe) -> Optional[np.ndarray]:
+    if probe.probe_type != "Inhibition":
+        return None
+
+    # name of Inhibition probe is letter of the word and letter of its color
+    return np.array([name[0] == name[1] for name in probe.probes])
+
+
+def simulate(probe: probe_presenters.Probe,
+             sequences: int = 1_000_000,
+             trials: int = 30,
+             rng: Optional[np.random.Generator] = None,
+             chunk: int = 100_000) -> DesignReport:
+    """
+    Simulate sequences of the probe in chunks, so memory does not depend on quantity of sequences
+
+    :param trials: length of every sequence, e.g. trials of one probe in a combination
+    """
+    if sequences < 1 or trials < 2:
+        raise ValueError(f"Simulation needs at least one sequence of two trials, but got {sequences} of {trials}")
+
+    rng = rng if rng is not None else np.random.default_rng()
+    congruent = _congruent_probes(probe)
+
+    answered = right = congruent_trials = same = 0
+    run_lengths = np.zeros(trials + 1, dtype=np.int64)
+    for start in range(0, sequences, chunk):
+        indices = probe.sample_sequences(min(chunk, sequences - start), trials, rng)
+        keys, key_names = probe.answer_codes(indices)
+        keys = keys[:, (keys != probe_presenters.NO_KEY).any(axis=0)]
+        answered += keys.size
+        if "right" in key_names:
+            right += int((keys == key_names.index("right")).sum())
+        same += int((indices[:, 1:] == indices[:, :-1]).sum())
+        if congruent is not None:
+            congruent_trials += int(congruent[indices].sum())
+
+        run_starts = np.ones(keys.shape, dtype=bool)
+        run_starts[:, 1:] = keys[:, 1:] != keys[:, :-1]
+        lengths = np.bincount(np.cumsum(run_starts.ravel()) - 1)
+        run_lengths += np.bincount(lengths, minlength=trials + 1)
+
+    runs = int(run_lengths.sum())
+    return DesignReport(probe_type=probe.probe_type,
+                        sequences=sequences,
+                        trials=trials,
+                        right_answers=right / answered,
+                        congruency_rate=np.nan if congruent is None else congruent_trials / (sequences * trials),
+                        same_ratio=same / (sequences * (trials - 1)),
+                        mean_run=answered / runs,
+                        max_run=int(np.flatnonzero(run_lengths).max()),
+                        run_lengths=run_lengths)
+
+
+def validate(report: DesignReport, targets: Optional[DesignTargets] = None) -> List[str]:
+    """
+    :param targets: targets of the probe type by default
+    :return: description of every missed target, empty if the design meets targets
+    """
+    targets = targets if targets is not None else TARGETS[report.probe_type]
+
+    errors = []
+    for name in ("right_answers", "congruency_rate", "same_ratio"):
+        target, value = getattr(targets, name), getattr(report, name)
+        if target is not None and not abs(value - target) <= targets.tolerance:
+            errors.append(f"{report.probe_type}: {name} is {value:.4f}, but target is {target:.4f}")
+
+    if targets.max_run is not None and report.max_run > targets.max_run:
+        errors.append(f"{report.probe_type}: run of {report.max_run} trials with the same key "
+                      f"is longer than {targets.max_run}")
+
+    return errors
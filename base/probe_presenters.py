@@ -1,12 +1,19 @@
 from abc import ABC, abstractmethod
 import csv
-import itertools
-from typing import List, Optional, Tuple, Dict
-from random import choice, randrange
+import random
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple, Dict
+
+import numpy as np
 
 
 # TODO: проверить, что во всех зондах есть проверка, что правильный ответ - правильный
 
+# code of trial without correct key in sampled sequences, e.g. the first trial of Update probe
+NO_KEY = -1
+# answers of Update probe in experiments: same and different probes equally often, at most four same keys in a row
+UPDATE_ANSWERS = dict(same_ratio=0.5, max_run=4)
+
+
 class AbstractProbeInformationHandler(ABC):
     @abstractmethod
     def next_probe(self) -> None:
@@ -22,7 +29,26 @@ class AbstractProbeInformationHandler(ABC):
 
 
 class ProbeInformationHandler(AbstractProbeInformationHandler):
-    def __init__(self, probes: List[str]):
+    """
+    Probes are generated by blocks in advance, so next_probe only takes the next index of the block
+    """
+
+    def __init__(self,
+                 probes: List[str],
+                 rng: Optional[random.Random] = None,
+                 block_size: int = 32,
+                 max_run: Optional[int] = None):
+        """
+        :param rng: stream of the session to choose probes, e.g. from SessionRNG
+        :param block_size: quantity of probes generated at once
+        :param max_run: maximum number of trials in a row with the same correct key, not limited if it is None
+        """
+        if block_size < 1:
+            raise ValueError(f"Block must have at least one probe, but got {block_size}")
+
+        if max_run is not None and max_run < 1:
+            raise ValueError(f"Maximum run must be at least one trial, but got {max_run}")
+
         if not probes:
             raise ValueError("Empty Probe is prohibited")
 
@@ -33,9 +59,79 @@ class ProbeInformationHandler(AbstractProbeInformationHandler):
 
         self.current_probe_idx: Optional[int] = None
         self.probes: List[str] = probes
+        self._rng = rng if rng is not None else random.Random()
+
+        self._block_size = block_size
+        self._max_run = max_run
+        self._block: np.ndarray = np.empty(0, dtype=np.int64)
+        self._block_position: int = 0
+        # every generated block in order, so the sequence of shown probes is recorded
+        self.blocks: List[np.ndarray] = []
 
     def next_probe(self):
-        self.current_probe_idx = choice(range(len(self.probes)))
+        if self._block_position == len(self._block):
+            self._new_block()
+
+        self.current_probe_idx = int(self._block[self._block_position])
+        self._block_position += 1
+
+    def _new_block(self) -> None:
+        # generator of the block is seeded from the stream, so state of the stream is enough to repeat blocks
+        block = self._generate_block(np.random.default_rng(self._rng.getrandbits(128)))
+
+        self._block = block
+        self._block_position = 0
+        self.blocks.append(block)
+
+    def _generate_block(self, rng: np.random.Generator) -> np.ndarray:
+        block = self.sample_sequences(1, self._block_size, rng)[0]
+        if self._max_run is None:
+            return block
+
+        return self._limit_runs(block, rng)
+
+    def _limit_runs(self, block: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """
+        Probe which makes run of the same key longer than maximum is replaced by probe of other key,
+        so block is built in one pass without rejection of sampled blocks
+
+        :return: block continuing shown probes without too long run of the same key
+        """
+        # run of the shown block is continued, the last shown probe gives key of Update probe
+        shown = self._block[-(self._max_run + 1):]
+        indices = np.concatenate((shown, block))
+        last_code, run = NO_KEY, 0
+        for trial in range(len(indices)):
+            code = self._code_of(indices, trial)
+            if trial >= len(shown) and code != NO_KEY and code == last_code and run >= self._max_run:
+                indices[trial] = self._break_run(indices, trial, rng)
+                code = self._code_of(indices, trial)
+
+            run = run + 1 if code != NO_KEY and code == last_code else 1
+            last_code = code
+
+        return indices[len(shown):]
+
+    def _code_of(self, indices: np.ndarray, trial: int) -> int:
+        codes, _ = self.answer_codes(indices[np.newaxis, max(trial - 1, 0):trial + 1])
+        return int(codes[0, -1])
+
+    def _break_run(self, indices: np.ndarray, trial: int, rng: np.random.Generator) -> int:
+        """
+        :return: index of probe for the trial which key differs from the key of the previous trial
+        """
+        raise NotImplementedError
+
+    def block_log(self) -> List[Tuple[int, int, int, bool]]:
+        """
+        :return: block, trial of the block, index of probe and whether it was shown for every generated probe
+        """
+        log = []
+        for block_idx, block in enumerate(self.blocks):
+            shown = len(block) if block_idx < len(self.blocks) - 1 else self._block_position
+            log.extend((block_idx, trial, int(probe_idx), trial < shown) for trial, probe_idx in enumerate(block))
+
+        return log
 
     def get_press_correctness(self, pressed_key_name: str) -> bool:
         raise NotImplementedError
@@ -43,13 +139,48 @@ class ProbeInformationHandler(AbstractProbeInformationHandler):
     def prepare_for_new_task(self):
         pass
 
+    def sample_sequences(self, sequences: int, trials: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """
+        Vectorized next_probe for validation of the design, state of the handler is not changed
+
+        :return: (sequences, trials) indices of probes which the handler may choose on next trials
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        return rng.integers(len(self.probes), size=(sequences, trials))
+
+    def answer_codes(self, indices: np.ndarray) -> Tuple[np.ndarray, Tuple[str, ...]]:
+        """
+        :param indices: (sequences, trials) indices of probes from the start of the task
+        :return: code of correct key of every trial and keys of the codes. Code is NO_KEY if any key is correct
+        """
+        raise NotImplementedError
+
+    def get_state(self) -> dict:
+        """
+        :return: shown probe and position in the order of probes, so probe can be continued after restart
+        """
+        return dict(current_probe_idx=self.current_probe_idx,
+                    rng=self._rng.getstate(),
+                    blocks=[block.copy() for block in self.blocks],
+                    block_position=self._block_position)
+
+    def set_state(self, state: dict) -> None:
+        self.current_probe_idx = state["current_probe_idx"]
+        self._rng.setstate(state["rng"])
+        self.blocks = [block.copy() for block in state["blocks"]]
+        self._block = self.blocks[-1] if self.blocks else np.empty(0, dtype=np.int64)
+        self._block_position = state["block_position"]
+
 
 class ProbeInformationMapper(ProbeInformationHandler):
     def __init__(self,
                  probes: List[str],
                  answers: List[str],
-                 custom_choice_rule: Optional[str] = None):
-        super().__init__(probes)
+                 custom_choice_rule: Optional[str] = None,
+                 rng: Optional[random.Random] = None,
+                 block_size: int = 32,
+                 max_run: Optional[int] = None):
+        super().__init__(probes, rng, block_size, max_run)
 
         if len(probes) != len(answers):
             not_enough_answers_error_message = f"Every probe must have the answer.\n\
@@ -63,7 +194,8 @@ class ProbeInformationMapper(ProbeInformationHandler):
             times_repeat = 2  # по умолчанию дважды каждый стимул берётся из одной группы
             black = ((0, 1, 4, 5),) * times_repeat
             blue = ((2, 3, 6, 7),) * times_repeat
-            self._right_sequence = itertools.cycle(black + blue)
+            self._right_sequence = black + blue
+            self._right_sequence_step = 0
         elif self._custom_choice_rule == "Inhibition":
             # to ensure that congruent word and color are shown in 1/6 ratio
             self._ratio = [0] * 5 + [1]
@@ -72,25 +204,221 @@ class ProbeInformationMapper(ProbeInformationHandler):
             incongruent_probes = [idx for idx, probe in enumerate(probes) if probe[0] != probe[1]]
             self._probes_groups = (incongruent_probes, congruent_probes)
 
+        if max_run is not None:
+            for group in self._choice_groups():
+                if len({answers[probe_idx] for probe_idx in group}) < 2:
+                    raise ValueError(f"Maximum run of {max_run} trials can not be kept, "
+                                     f"because probes {[probes[probe_idx] for probe_idx in group]} have the same answer")
+
+    def _choice_groups(self) -> List[Sequence[int]]:
+        """
+        :return: groups of probes, probe of a trial is chosen inside one of them
+        """
+        if self._custom_choice_rule == "Switch":
+            return list(dict.fromkeys(self._right_sequence))
+
+        if self._custom_choice_rule == "Inhibition":
+            return [probes_group for probes_group in self._probes_groups if probes_group]
+
+        return [range(len(self.probes))]
+
     def get_press_correctness(self, pressed_key_name: str) -> bool:
         return self.answers[self.current_probe_idx] == pressed_key_name
 
+    def sample_sequences(self, sequences: int, trials: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        rng = rng if rng is not None else np.random.default_rng()
+
+        if self._custom_choice_rule == "Switch":
+            # groups follow each other from the current step, probe is chosen inside the group of the trial
+            steps = (self._right_sequence_step + np.arange(trials)) % len(self._right_sequence)
+            groups = np.array(self._right_sequence)
+            return groups[steps, rng.integers(groups.shape[1], size=(sequences, trials))]
+
+        if self._custom_choice_rule == "Inhibition":
+            group = np.array(self._ratio)[rng.integers(len(self._ratio), size=(sequences, trials))]
+            sizes = np.array([len(probes_group) for probes_group in self._probes_groups])
+            padded_groups = np.zeros((len(sizes), sizes.max()), dtype=np.int64)
+            for group_idx, probes_group in enumerate(self._probes_groups):
+                padded_groups[group_idx, :len(probes_group)] = probes_group
+
+            member = (rng.random((sequences, trials)) * sizes[group]).astype(np.int64)
+            return padded_groups[group, member]
+
+        return super().sample_sequences(sequences, trials, rng)
+
+    def answer_codes(self, indices: np.ndarray) -> Tuple[np.ndarray, Tuple[str, ...]]:
+        keys = tuple(sorted(set(self.answers)))
+        probe_codes = np.array([keys.index(answer) for answer in self.answers], dtype=np.int8)
+        return probe_codes[indices], keys
+
+    def _break_run(self, indices: np.ndarray, trial: int, rng: np.random.Generator) -> int:
+        # probe is replaced inside its group, so groups of Switch and ratio of Inhibition are kept
+        group = next(group for group in self._choice_groups() if indices[trial] in group)
+        other_keys = [probe_idx for probe_idx in group if self.answers[probe_idx] != self.answers[indices[trial - 1]]]
+        return other_keys[rng.integers(len(other_keys))]
+
     def next_probe(self):
+        super(ProbeInformationMapper, self).next_probe()
         if self._custom_choice_rule == "Switch":
-            self.current_probe_idx = choice(next(self._right_sequence))
-        elif self._custom_choice_rule == "Inhibition":
-            group = choice(self._ratio)
-            self.current_probe_idx = choice(self._probes_groups[group])
-        else:
-            super(ProbeInformationMapper, self).next_probe()
+            # step is phase of groups for the next block
+            self._right_sequence_step += 1
+
+    def get_state(self) -> dict:
+        state = super().get_state()
+        if self._custom_choice_rule == "Switch":
+            state["right_sequence_step"] = self._right_sequence_step
+        return state
+
+    def set_state(self, state: dict) -> None:
+        super().set_state(state)
+        if self._custom_choice_rule == "Switch":
+            self._right_sequence_step = state["right_sequence_step"]
+
+
+class AnswerRunState(NamedTuple):
+    """
+    Answers generated so far, values are arrays with element for every generated sequence
+    """
+    answered: np.ndarray
+    same: np.ndarray
+    last_same: np.ndarray
+    run: np.ndarray
+
+
+class SameDifferentGenerator:
+    """
+    Same and different answers of Update probe with target share of same answers and runs not longer than maximum.
+    Every answer is same with probability of the target corrected by deficit of same answers so far,
+    and answer is switched when its run reaches maximum, so no sequence is rejected
+    """
+
+    def __init__(self, same_ratio: float, max_run: Optional[int] = None, correction: float = 0.25):
+        """
+        :param same_ratio: target share of same answers
+        :param max_run: maximum number of the same answers in a row, not limited if it is None
+        :param correction: change of probability of same answer for every missing or extra same answer
+        """
+        if not 0 <= same_ratio <= 1:
+            raise ValueError(f"Share of same answers must be between 0 and 1, but got {same_ratio}")
+
+        if max_run is not None and max_run < 1:
+            raise ValueError(f"Maximum run must be at least one answer, but got {max_run}")
+
+        self.same_ratio = same_ratio
+        self.max_run = max_run
+        self._correction = correction
+
+    @staticmethod
+    def initial_state(sequences: int = 1) -> AnswerRunState:
+        return AnswerRunState(answered=np.zeros(sequences, dtype=np.int64),
+                              same=np.zeros(sequences, dtype=np.int64),
+                              last_same=np.zeros(sequences, dtype=bool),
+                              run=np.zeros(sequences, dtype=np.int64))
+
+    def generate(self,
+                 trials: int,
+                 rng: np.random.Generator,
+                 state: AnswerRunState) -> Tuple[np.ndarray, AnswerRunState]:
+        """
+        :param state: answers generated before, e.g. by the previous call
+        :return: (sequences, trials) whether every answer is same and state after them
+        """
+        answered, same, last_same, run = (value.copy() for value in state)
+        is_same = np.empty((len(answered), trials), dtype=bool)
+
+        # answers of a trial depend on the previous ones, so only sequences are vectorized
+        for trial in range(trials):
+            deficit = self.same_ratio * answered - same
+            probability = np.clip(self.same_ratio + self._correction * deficit, 0, 1)
+            trial_same = rng.random(len(answered)) < probability
+            if self.max_run is not None:
+                trial_same = np.where(run >= self.max_run, ~last_same, trial_same)
+
+            run = np.where((trial_same == last_same) & (answered > 0), run + 1, 1)
+            last_same = trial_same
+            answered += 1
+            same += trial_same
+            is_same[:, trial] = trial_same
+
+        return is_same, AnswerRunState(answered=answered, same=same, last_same=last_same, run=run)
+
+    def chunks(self, chunk: int, rng: np.random.Generator) -> Iterator[np.ndarray]:
+        """
+        Endless sequence of answers generated lazily, e.g. for probe shown until the task is finished
+
+        :return: whether every answer of the next chunk is same
+        """
+        state = self.initial_state()
+        while True:
+            is_same, state = self.generate(chunk, rng, state)
+            yield is_same[0]
 
 
 class ProbeInformationSequence(ProbeInformationHandler):
-    def __init__(self, probes: List[str]):
-        super().__init__(probes)
+    def __init__(self,
+                 probes: List[str],
+                 rng: Optional[random.Random] = None,
+                 block_size: int = 32,
+                 max_run: Optional[int] = None,
+                 same_ratio: Optional[float] = None):
+        """
+        :param same_ratio: target share of same probes in a row, probes are chosen independently if it is None
+        """
+        super().__init__(probes, rng, block_size, max_run)
+
+        if max_run is not None and len(probes) < 2:
+            raise ValueError(f"Maximum run of {max_run} trials can not be kept with one probe {probes}")
 
         self.previous_probe_idx: Optional[int] = None
 
+        self._answers: Optional[SameDifferentGenerator] = None
+        self._answers_state: Optional[AnswerRunState] = None
+        if same_ratio is not None:
+            if len(probes) < 2:
+                raise ValueError(f"Different probes need at least two probes, but got {probes}")
+
+            self._answers = SameDifferentGenerator(same_ratio=same_ratio, max_run=max_run)
+            self._answers_state = self._answers.initial_state()
+
+    def _indices_of(self,
+                    is_same: np.ndarray,
+                    rng: np.random.Generator,
+                    previous_probe_idx: Optional[int]) -> np.ndarray:
+        """
+        :param is_same: answers of trials after the previous probe. Without previous probe the first probe
+            is not compared with anything, so there is one probe more than answers
+        :return: indices of probes, different probe is chosen from other probes
+        """
+        steps = np.where(is_same, 0, rng.integers(1, len(self.probes), size=is_same.shape))
+        if previous_probe_idx is None:
+            start = rng.integers(len(self.probes), size=len(is_same))
+            steps = np.concatenate((np.zeros((len(is_same), 1), dtype=steps.dtype), steps), axis=1)
+        else:
+            start = np.full(len(is_same), previous_probe_idx)
+
+        return (start[:, np.newaxis] + np.cumsum(steps, axis=1)) % len(self.probes)
+
+    def sample_sequences(self, sequences: int, trials: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """
+        Sequences of Update probe with share of same probes start from the beginning of the session,
+        because the share is kept over all blocks
+        """
+        if self._answers is None:
+            return super().sample_sequences(sequences, trials, rng)
+
+        rng = rng if rng is not None else np.random.default_rng()
+        is_same, _ = self._answers.generate(trials - 1, rng, self._answers.initial_state(sequences))
+        return self._indices_of(is_same, rng, previous_probe_idx=None)
+
+    def _generate_block(self, rng: np.random.Generator) -> np.ndarray:
+        if self._answers is None:
+            return super()._generate_block(rng)
+
+        # state of answers is continued by every block, so share of same answers is kept over the whole session
+        answers = self._block_size if self.current_probe_idx is not None else self._block_size - 1
+        is_same, self._answers_state = self._answers.generate(answers, rng, self._answers_state)
+        return self._indices_of(is_same, rng, self.current_probe_idx)[0]
+
     def next_probe(self):
         self.previous_probe_idx = self.current_probe_idx
         super(ProbeInformationSequence, self).next_probe()
@@ -109,21 +437,62 @@ class ProbeInformationSequence(ProbeInformationHandler):
     def prepare_for_new_task(self):
         self.previous_probe_idx = None
 
+    def _break_run(self, indices: np.ndarray, trial: int, rng: np.random.Generator) -> int:
+        previous_probe_idx = indices[trial - 1]
+        if indices[trial] != previous_probe_idx:
+            return previous_probe_idx
+
+        return (previous_probe_idx + rng.integers(1, len(self.probes))) % len(self.probes)
+
+    def answer_codes(self, indices: np.ndarray) -> Tuple[np.ndarray, Tuple[str, ...]]:
+        keys = ("left", "right")
+        codes = np.full(indices.shape, NO_KEY, dtype=np.int8)
+        codes[:, 1:] = indices[:, 1:] == indices[:, :-1]
+        return codes, keys
+
+    def get_state(self) -> dict:
+        state = super().get_state()
+        state["previous_probe_idx"] = self.previous_probe_idx
+        if self._answers is not None:
+            state["answers_state"] = tuple(value.copy() for value in self._answers_state)
+        return state
+
+    def set_state(self, state: dict) -> None:
+        super().set_state(state)
+        self.previous_probe_idx = state["previous_probe_idx"]
+        if self._answers is not None:
+            self._answers_state = AnswerRunState(*(value.copy() for value in state["answers_state"]))
+
 
 class Probe:
     def __init__(self,
                  probes: List[str],
                  answers: Optional[List[str]] = None,
-                 probe_type: str = "TwoAlternatives"):
+                 probe_type: str = "TwoAlternatives",
+                 rng: Optional[random.Random] = None,
+                 block_size: int = 32,
+                 max_run: Optional[int] = None,
+                 same_ratio: Optional[float] = None):
+        """
+        :param block_size: quantity of probes generated at once
+        :param max_run: maximum number of trials in a row with the same correct key, not limited if it is None
+        :param same_ratio: target share of same probes in a row for Update probe
+        """
+        if same_ratio is not None and probe_type != "Update":
+            raise ValueError(f"Share of same probes is set only for Update probe, but got {probe_type}")
+
+        self.probe_type: str = probe_type
+        blocks = dict(rng=rng, block_size=block_size, max_run=max_run)
 
         if probe_type == "TwoAlternatives":
-            self._information_handler = ProbeInformationMapper(probes, answers)
+            self._information_handler = ProbeInformationMapper(probes, answers, **blocks)
         elif probe_type == "Update":
-            self._information_handler = ProbeInformationSequence(probes)
+            self._information_handler = ProbeInformationSequence(probes, same_ratio=same_ratio, **blocks)
         elif probe_type == "Switch":
-            self._information_handler = ProbeInformationMapper(probes, answers, custom_choice_rule="Switch")
+            self._information_handler = ProbeInformationMapper(probes, answers, custom_choice_rule="Switch", **blocks)
         elif probe_type == "Inhibition":
-            self._information_handler = ProbeInformationMapper(probes, answers, custom_choice_rule="Inhibition")
+            self._information_handler = ProbeInformationMapper(probes, answers, custom_choice_rule="Inhibition",
+                                                               **blocks)
         else:
             raise NotImplementedError(f"{probe_type} is not implemented")
 
@@ -142,6 +511,43 @@ class Probe:
     def prepare_for_new_task(self):
         self._information_handler.prepare_for_new_task()
 
+    @property
+    def probes(self) -> List[str]:
+        return self._information_handler.probes
+
+    def sample_sequences(self, sequences: int, trials: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        return self._information_handler.sample_sequences(sequences, trials, rng)
+
+    def answer_codes(self, indices: np.ndarray) -> Tuple[np.ndarray, Tuple[str, ...]]:
+        return self._information_handler.answer_codes(indices)
+
+    def block_log(self) -> List[Tuple[int, int, str, bool]]:
+        """
+        :return: block, trial of the block, probe and whether it was shown for every generated probe
+        """
+        return [(block, trial, self.probes[probe_idx], shown)
+                for block, trial, probe_idx, shown in self._information_handler.block_log()]
+
+    def get_state(self) -> dict:
+        return self._information_handler.get_state()
+
+    def set_state(self, state: dict) -> None:
+        self._information_handler.set_state(state)
+
 
 # TODO: change tests to accept Probe as UpdateProbe
 UpdateProbe = Probe
+
+
+def save_block_log(fp: str, probes: Dict[str, Probe]) -> None:
+    """
+    Save generated blocks of probes, so the exact sequence of shown probes is recorded
+
+    :param probes: probes by their names, e.g. ProbeView
+    """
+    with open(fp, mode="w", encoding="UTF-8", newline="") as log_file:
+        writer = csv.writer(log_file)
+        writer.writerow(("probe", "block", "block_trial", "stimulus", "shown"))
+        for name, probe in probes.items():
+            writer.writerows((name, block, trial, stimulus, int(shown))
+                             for block, trial, stimulus, shown in probe.block_log())
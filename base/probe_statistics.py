@@ -0,0 +1,240 @@
+import csv
+import hashlib
+import os
+import pickle
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from base import columnar, data_records
+
+# columns which split probe trials of the experiment part into groups
+PART_GROUP_COLUMNS = {
+    "WM": ("stage", "combination_number", "task", "probe"),
+    "Insight": ("stage", "task_type", "task", "probe"),
+}
+
+
+class ProbeTrials(NamedTuple):
+    """
+    Probe rows of one participant data file in the order they were saved
+    """
+    experiment_part: str
+    # string values of key columns, missing values are empty strings
+    keys: Dict[str, np.ndarray]
+    probe_trial: np.ndarray
+    rt: np.ndarray
+    is_correct: np.ndarray
+
+
+class ProbeStatistics(NamedTuple):
+    """
+    Statistics of groups of probe trials, element i of every array belongs to group i.
+    RT statistics are computed on correct trials
+    """
+    by: Tuple[str, ...]
+    keys: Dict[str, np.ndarray]
+    trials: np.ndarray
+    accuracy: np.ndarray
+    mean_rt: np.ndarray
+    median_rt: np.ndarray
+    # mean RT divided by accuracy
+    inverse_efficiency: np.ndarray
+    # mean RT of correct trials after error minus mean RT of correct trials after correct one
+    post_error_slowing: np.ndarray
+    # (groups, max probe_trial) mean RT of correct trials at every position in the probe
+    rt_by_position: np.ndarray
+
+
+def _probe_rows(probe: np.ndarray, rt: np.ndarray) -> np.ndarray:
+    return (probe != "") & ~np.isnan(rt)
+
+
+def _load_csv(fp: str) -> ProbeTrials:
+    with open(fp, mode="r", encoding="utf-8-sig", newline="") as csv_file:
+        csv_reader = csv.reader(csv_file)
+        header = next(csv_reader)
+        rows = np.array(list(csv_reader), dtype=str).reshape(-1, len(header))
+
+    values = {name: rows[:, idx] for idx, name in enumerate(header)}
+    experiment_part = values["experiment_part"][0] if len(rows) else "WM"
+    if experiment_part not in PART_GROUP_COLUMNS:
+        raise ValueError(f"{fp} has rows of unknown experiment part {experiment_part}")
+    group_columns = PART_GROUP_COLUMNS[experiment_part]
+
+    rt = np.where(values["RT"] == "", "nan", values["RT"]).astype(np.float64)
+    selected = _probe_rows(values["probe"], rt)
+
+    return ProbeTrials(experiment_part=experiment_part,
+                       keys={name: values[name][selected] for name in group_columns},
+                       probe_trial=values["probe_trial"][selected].astype(np.int32),
+                       rt=rt[selected],
+                       is_correct=values["is_correct"][selected].astype(np.int8).astype(bool))
+
+
+def _load_columns(directory: str) -> ProbeTrials:
+    data = columnar.ColumnarData(directory)
+    kinds = {column.name: column.kind for column in data.columns}
+
+    def as_strings(name: str) -> np.ndarray:
+        if kinds[name] == data_records.STR:
+            return data.decoded(name)
+
+        values = np.asarray(data[name])
+        return np.where(values == columnar.MISSING_CODE, "", values.astype(str))
+
+    probe = as_strings("probe")
+    rt = np.asarray(data["RT"])
+    selected = _probe_rows(probe, rt)
+
+    return ProbeTrials(experiment_part=data.experiment_part,
+                       keys={name: as_strings(name)[selected] for name in PART_GROUP_COLUMNS[data.experiment_part]},
+                       probe_trial=np.asarray(data["probe_trial"])[selected],
+                       rt=rt[selected],
+                       is_correct=np.asarray(data["is_correct"])[selected] == 1)
+
+
+def load_probe_trials(fp: str) -> ProbeTrials:
+    """
+    :param fp: csv saved by DataSaver or directory of columns saved with save_columns
+    """
+    if os.path.isdir(fp):
+        return _load_columns(fp)
+
+    return _load_csv(fp)
+
+
+def _group_ids(keys: Dict[str, np.ndarray], by: Sequence[str]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    :return: group of every trial and key values of groups
+    """
+    uniques, codes = zip(*(np.unique(keys[name], return_inverse=True) for name in by))
+    combined = np.ravel_multi_index(codes, [len(unique) for unique in uniques])
+    groups, ids = np.unique(combined, return_inverse=True)
+
+    group_codes = np.unravel_index(groups, [len(unique) for unique in uniques])
+    group_keys = {name: unique[code] for name, unique, code in zip(by, uniques, group_codes)}
+    return ids.reshape(-1), group_keys
+
+
+def _group_mean(ids: np.ndarray, values: np.ndarray, mask: np.ndarray, groups: int) -> np.ndarray:
+    counts = np.bincount(ids[mask], minlength=groups)
+    sums = np.bincount(ids[mask], weights=values[mask], minlength=groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts
+
+
+def _group_median(ids: np.ndarray, values: np.ndarray, mask: np.ndarray, groups: int) -> np.ndarray:
+    ids, values = ids[mask], values[mask]
+    order = np.lexsort((values, ids))
+    ids, values = ids[order], values[order]
+
+    counts = np.bincount(ids, minlength=groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    medians = np.full(groups, np.nan)
+    present = counts > 0
+    # mean of two middle values, they are the same value for odd counts
+    lower = starts[present] + (counts[present] - 1) // 2
+    upper = starts[present] + counts[present] // 2
+    medians[present] = (values[lower] + values[upper]) / 2
+    return medians
+
+
+def summarize(trials: ProbeTrials, by: Optional[Sequence[str]] = None) -> ProbeStatistics:
+    """
+    :param by: key columns of groups, all group columns of the experiment part by default
+    """
+    by = tuple(PART_GROUP_COLUMNS[trials.experiment_part] if by is None else by)
+    unknown = [name for name in by if name not in trials.keys]
+    if unknown:
+        raise ValueError(f"Probe trials of {trials.experiment_part} can not be grouped by {unknown}")
+
+    if not len(trials.rt):
+        empty = np.empty(0)
+        return ProbeStatistics(by=by, keys={name: np.empty(0, dtype=str) for name in by},
+                               trials=np.empty(0, dtype=np.int64), accuracy=empty, mean_rt=empty, median_rt=empty,
+                               inverse_efficiency=empty, post_error_slowing=empty, rt_by_position=np.empty((0, 0)))
+
+    ids, keys = _group_ids(trials.keys, by)
+    groups = len(keys[by[0]])
+    correct = trials.is_correct
+
+    counts = np.bincount(ids, minlength=groups)
+    accuracy = np.bincount(ids, weights=correct, minlength=groups) / counts
+    mean_rt = _group_mean(ids, trials.rt, correct, groups)
+    median_rt = _group_median(ids, trials.rt, correct, groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        inverse_efficiency = mean_rt / accuracy
+
+    # previous trial is the one before in the same probe, probe_trial starts again with every probe
+    follows = np.zeros_like(correct)
+    follows[1:] = (trials.probe_trial[1:] == trials.probe_trial[:-1] + 1) & (ids[1:] == ids[:-1])
+    after_error = np.zeros_like(correct)
+    after_error[1:] = ~correct[:-1]
+    post_error_slowing = (_group_mean(ids, trials.rt, correct & follows & after_error, groups)
+                          - _group_mean(ids, trials.rt, correct & follows & ~after_error, groups))
+
+    positions = int(trials.probe_trial.max())
+    cells = ids * positions + trials.probe_trial - 1
+    rt_by_position = _group_mean(cells, trials.rt, correct, groups * positions).reshape(groups, positions)
+
+    return ProbeStatistics(by=by,
+                           keys=keys,
+                           trials=counts,
+                           accuracy=accuracy,
+                           mean_rt=mean_rt,
+                           median_rt=median_rt,
+                           inverse_efficiency=inverse_efficiency,
+                           post_error_slowing=post_error_slowing,
+                           rt_by_position=rt_by_position)
+
+
+class ProbeStatisticsCache:
+    """
+    Statistics of every participant file are kept in cache directory with size and modification time of the file,
+    so statistics of the cohort are computed only for new and changed files
+    """
+
+    def __init__(self, cache_dir: str):
+        os.makedirs(cache_dir, exist_ok=True)
+        self._cache_dir = cache_dir
+
+        self.computed: int = 0
+        self.reused: int = 0
+
+    @staticmethod
+    def _signature(fp: str) -> Tuple[int, float]:
+        if os.path.isdir(fp):
+            # columns are saved at once with meta file
+            fp = os.path.join(fp, columnar.META_FILE)
+
+        stat = os.stat(fp)
+        return stat.st_size, stat.st_mtime
+
+    def _cache_fp(self, fp: str, by: Optional[Sequence[str]]) -> str:
+        key = f"{os.path.abspath(fp)}|{by}"
+        return os.path.join(self._cache_dir, f"{hashlib.sha256(key.encode('UTF-8')).hexdigest()}.pickle")
+
+    def summarize_file(self, fp: str, by: Optional[Sequence[str]] = None) -> ProbeStatistics:
+        signature = self._signature(fp)
+        cache_fp = self._cache_fp(fp, by)
+
+        if os.path.exists(cache_fp):
+            with open(cache_fp, mode="rb") as cache_file:
+                cached_signature, statistics = pickle.load(cache_file)
+            if cached_signature == signature:
+                self.reused += 1
+                return statistics
+
+        statistics = summarize(load_probe_trials(fp), by=by)
+        with open(cache_fp, mode="wb") as cache_file:
+            pickle.dump((signature, statistics), cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self.computed += 1
+        return statistics
+
+    def summarize_cohort(self, fps: List[str], by: Optional[Sequence[str]] = None) -> Dict[str, ProbeStatistics]:
+        """
+        :return: statistics of every participant file
+        """
+        return {fp: self.summarize_file(fp, by=by) for fp in fps}
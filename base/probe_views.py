@@ -1,10 +1,10 @@
 from abc import ABCMeta, abstractmethod
+import random
 from typing import List, Optional, Tuple
 from pathlib import Path
 
-from psychopy import visual
-
 from base import probe_presenters
+from base.backend import visual
 
 
 class AbstractProbeViw(metaclass=ABCMeta):
@@ -39,15 +39,27 @@ class ProbeView(AbstractProbeViw):
                  probe_type: str,
                  position: Tuple[int, int] = (0, 0),
                  start_time: float = 0.1,
-                 image_ext: str = "png"
+                 image_ext: str = "png",
+                 rng: Optional[random.Random] = None,
+                 block_size: int = 32,
+                 max_run: Optional[int] = None,
+                 same_ratio: Optional[float] = None
                  ):
+        """
+        :param rng: stream of the session to choose probes, e.g. from SessionRNG
+        :param block_size: quantity of probes generated at once
+        :param max_run: maximum number of trials in a row with the same correct key, not limited if it is None
+        :param same_ratio: target share of same probes in a row for Update probe
+        """
         self._presenter_probe: Optional[probe_presenters.Probe] = None
         self._start_time: float = start_time
         self.visual_probes: List[visual.basevisual] = []
         self._current_probe: Optional[visual.basevisual] = None
         self._window: visual.Window = window
 
-        self._presenter_probe = probe_presenters.Probe(probes, answers, probe_type)
+        self._presenter_probe = probe_presenters.Probe(probes, answers, probe_type, rng=rng,
+                                                      block_size=block_size, max_run=max_run,
+                                                      same_ratio=same_ratio)
 
         path: Path = Path(image_path_dir)
         for probe_name in probes:
@@ -71,6 +83,16 @@ class ProbeView(AbstractProbeViw):
     def prepare_for_new_task(self) -> None:
         self._presenter_probe.prepare_for_new_task()
 
+    def block_log(self) -> List[Tuple[int, int, str, bool]]:
+        return self._presenter_probe.block_log()
+
+    def get_state(self) -> dict:
+        return self._presenter_probe.get_state()
+
+    def set_state(self, state: dict) -> None:
+        self._presenter_probe.set_state(state)
+        self._current_probe = self.visual_probes[self._presenter_probe.get_probe_number()]
+
     @property
     def position(self):
         return self._position
@@ -0,0 +1,60 @@
+import json
+import os
+import sqlite3
+from typing import Optional
+
+from base import participant_registry
+
+
+class SessionDesigns:
+    """
+    Designs chosen for sessions by state of the cohort, e.g. row of counterbalancing design or plan
+    evening out conditions of previous sessions. State of the cohort changes after the session,
+    so design is kept by seed of the session and replay of the seed takes recorded design instead of choosing new one.
+    Designs are kept in SQLite database of participant registry, thus every station replays sessions of others
+    """
+
+    def __init__(self,
+                 part: str,
+                 fp: str = participant_registry.REGISTRY_FP,
+                 timeout: float = 30.0):
+        """
+        :param part: part of experiment, seeds of different parts are independent
+        :param fp: path to database file, by default the file of participant registry
+        """
+        self._part = part
+
+        directory = os.path.dirname(fp)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(fp, timeout=timeout, isolation_level=None)
+        # seed is kept as text, because it does not fit into SQLite integer
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS session_designs (
+                part TEXT NOT NULL,
+                seed TEXT NOT NULL,
+                design TEXT NOT NULL,
+                PRIMARY KEY (part, seed)
+            );
+        """)
+
+    def find(self, seed: int) -> Optional[dict]:
+        """
+        :return: design recorded with the seed, None for new seed
+        """
+        row = self._connection.execute("SELECT design FROM session_designs WHERE part = ? AND seed = ?",
+                                       (self._part, str(seed))).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def record(self, seed: int, design: dict) -> dict:
+        """
+        :param design: JSON serializable design of the session
+        :return: design of the seed, earlier recorded one is kept
+        """
+        self._connection.execute("INSERT OR IGNORE INTO session_designs (part, seed, design) VALUES (?, ?, ?)",
+                                 (self._part, str(seed), json.dumps(design, ensure_ascii=False)))
+        return self.find(seed)
+
+    def close(self) -> None:
+        self._connection.close()
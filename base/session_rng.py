@@ -0,0 +1,51 @@
+import random
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# kinds of streams, so stream and generator of the same component are different
+_STREAM = 0
+_GENERATOR = 1
+
+
+class SessionRNG:
+    """
+    Random streams of one session derived from its seed. Every component gets its own stream by name,
+    streams do not depend on each other and on the order they are requested,
+    so sessions run in parallel do not share state and any session is replayed from its recorded seed
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        """
+        :param seed: recorded seed of the session to replay, new seed is drawn from the OS if it is None
+        """
+        if seed is not None and seed < 0:
+            raise ValueError(f"Seed must be non-negative, but got {seed}")
+
+        self.seed: int = np.random.SeedSequence(seed).entropy
+        self._streams: Dict[str, random.Random] = {}
+        self._generators: Dict[str, np.random.Generator] = {}
+
+    def _seed_sequence(self, kind: int, component: str) -> np.random.SeedSequence:
+        # child of the session seed is identified by the name of the component instead of the order of spawning
+        spawn_key: Tuple[int, ...] = (kind, *component.encode("UTF-8"))
+        return np.random.SeedSequence(self.seed, spawn_key=spawn_key)
+
+    def stream(self, component: str) -> random.Random:
+        """
+        :return: stream of the component with interface of random module, the same object for every call
+        """
+        if component not in self._streams:
+            words = self._seed_sequence(_STREAM, component).generate_state(4, dtype=np.uint32)
+            self._streams[component] = random.Random(int.from_bytes(words.tobytes(), byteorder="little"))
+
+        return self._streams[component]
+
+    def generator(self, component: str) -> np.random.Generator:
+        """
+        :return: numpy generator of the component, the same object for every call
+        """
+        if component not in self._generators:
+            self._generators[component] = np.random.default_rng(self._seed_sequence(_GENERATOR, component))
+
+        return self._generators[component]
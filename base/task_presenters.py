@@ -1,9 +1,11 @@
 from abc import ABC, abstractmethod
 import csv
 from pathlib import Path
-from random import choice, shuffle
+import random
 from typing import List, Optional, Tuple, Iterator, Union
 
+import numpy as np
+
 
 class Task(ABC):
     @abstractmethod
@@ -19,14 +21,18 @@ class UpdateTask(Task):
     def __init__(self,
                  stimuli_fp: str,
                  possible_sequences: Tuple[int, ...],
-                 blocks_before_task_finished: int):
-
+                 blocks_before_task_finished: int,
+                 rng: Optional[random.Random] = None):
+        """
+        :param rng: stream of the session to choose stimuli and group sizes, e.g. from SessionRNG
+        """
         if any(group < 1 for group in possible_sequences):
             raise ValueError("Sequence of groups with length less than one are prohibited")
 
         self._all_examples: List[str, ...] = []
         self._all_words: List[str, ...] = []
 
+        self._rng = rng if rng is not None else random.Random()
         self._possible_sequences: Tuple[int, ...] = possible_sequences
         self._before_answer: int = self._choose_group_size()
         self._blocks_before_task_finished: int = blocks_before_task_finished
@@ -39,8 +45,8 @@ class UpdateTask(Task):
         self._load_stimuli(stimuli_fp)
         self._length = len(self._all_examples)
 
-        shuffle(self._all_examples)
-        shuffle(self._all_words)
+        self._rng.shuffle(self._all_examples)
+        self._rng.shuffle(self._all_words)
 
         self._examples_sequence: Iterator[str] = iter(self._all_examples)
         self._words_sequence: Iterator[str] = iter(self._all_words)
@@ -60,7 +66,7 @@ class UpdateTask(Task):
                 self._all_words.append(row["words"])
 
     def _choose_group_size(self) -> int:
-        return choice(self._possible_sequences) + 1
+        return self._rng.choice(self._possible_sequences) + 1
 
     def is_answer_time(self) -> bool:
         return self._before_answer == 0
@@ -98,11 +104,45 @@ class UpdateTask(Task):
 
         self._blocks_finished = 0
 
+    def get_state(self) -> dict:
+        """
+        :return: order of stimuli and progress of the task, so it can be continued after restart
+        """
+        return dict(all_examples=list(self._all_examples),
+                    all_words=list(self._all_words),
+                    length=self._length,
+                    before_answer=self._before_answer,
+                    blocks_finished=self._blocks_finished,
+                    example=self.example,
+                    word=self.word,
+                    initialized=self._task_was_initialized_before_first_trial,
+                    rng=self._rng.getstate())
+
+    def set_state(self, state: dict) -> None:
+        self._all_examples = list(state["all_examples"])
+        self._all_words = list(state["all_words"])
+        self._length = state["length"]
+        self._before_answer = state["before_answer"]
+        self._blocks_finished = state["blocks_finished"]
+        self.example = state["example"]
+        self.word = state["word"]
+        self._task_was_initialized_before_first_trial = state["initialized"]
+        self._rng.setstate(state["rng"])
+
+        # every shown stimulus decreased length
+        used = len(self._all_examples) - self._length
+        self._examples_sequence = iter(self._all_examples[used:])
+        self._words_sequence = iter(self._all_words[used:])
+
 
 class InhibitionTask(Task):
     def __init__(self,
                  fp: str,
-                 trials_before_task_finished: int):
+                 trials_before_task_finished: int,
+                 rng: Optional[random.Random] = None):
+        """
+        :param rng: stream of the session to shuffle stimuli
+        """
         stimuli = self._load_stimuli(fp)
 
         if not stimuli:
@@ -112,8 +152,10 @@ class InhibitionTask(Task):
         self._trials_before_task_finished = trials_before_task_finished
         self._trial: Optional[int] = None
 
-        shuffle(stimuli)
-        self._unused_stimuli = iter(stimuli)
+        rng = rng if rng is not None else random.Random()
+        rng.shuffle(stimuli)
+        self._stimuli: List[str] = stimuli
+        self._next_stimulus_idx: int = 0
 
         self._the_first_trial = True
 
@@ -133,10 +175,21 @@ class InhibitionTask(Task):
         if self.is_task_finished():
             return
 
+        if self._next_stimulus_idx == len(self._stimuli):
+            raise StopIteration
+
         self._length -= 1
-        image_path = next(self._unused_stimuli)
+        image_path = self._stimuli[self._next_stimulus_idx]
+        self._next_stimulus_idx += 1
         return image_path
 
+    def upcoming_stimuli(self, quantity: int) -> List[str]:
+        """
+        :param quantity: how many stimuli to look ahead
+        :return: stimuli which will be returned by next calls to next_subtask
+        """
+        return self._stimuli[self._next_stimulus_idx:self._next_stimulus_idx + quantity]
+
     def is_task_finished(self) -> bool:
         return self._trial == self._trials_before_task_finished + 1
 
@@ -152,6 +205,20 @@ class InhibitionTask(Task):
 
         self._trial = 0
 
+    def get_state(self) -> dict:
+        return dict(stimuli=list(self._stimuli),
+                    next_stimulus_idx=self._next_stimulus_idx,
+                    length=self._length,
+                    trial=self._trial,
+                    the_first_trial=self._the_first_trial)
+
+    def set_state(self, state: dict) -> None:
+        self._stimuli = list(state["stimuli"])
+        self._next_stimulus_idx = state["next_stimulus_idx"]
+        self._length = state["length"]
+        self._trial = state["trial"]
+        self._the_first_trial = state["the_first_trial"]
+
 
 class WisconsinCard:
     def __init__(self, features):
@@ -161,8 +228,144 @@ class WisconsinCard:
         return self._features[rule]
 
 
+class WisconsinDeck:
+    """
+    Features of all cards of Wisconsin test generated in advance: the first four cards of a trial
+    are for choice and the last one is the target.
+    Rule which changes on a trial depends on participant answers, so for every trial the deck keeps
+    swaps removing ambiguity of choice for each pair of previous and current rules
+    """
+
+    CARD_FEATURES = np.dtype([("color", np.int8), ("shape", np.int8), ("figures_place", np.int8)])
+    CHOICE_CARDS = 4
+    RULES = 3
+    NO_SWAP = -1
+
+    def __init__(self, trials: int = 256, rng: Optional[np.random.Generator] = None):
+        if trials < 1:
+            raise ValueError(f"WisconsinDeck must have at least one trial, but got {trials}")
+
+        self._chunk_size = trials
+        self._rng = rng if rng is not None else np.random.default_rng()
+
+        self._cards = np.empty((0, self.CHOICE_CARDS + 1), dtype=self.CARD_FEATURES)
+        # for trial, previous and current rule: ambiguous card and card to switch feature of previous rule with
+        self._swaps = np.empty((0, self.RULES, self.RULES, 2), dtype=np.int8)
+        # previous and current rule of every given trial, so shown cards can be restored
+        self._given_rules: List[Tuple[int, int]] = []
+
+        self._extend(trials)
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    def _extend(self, trials: int) -> None:
+        # every feature of choice cards is a permutation, so each card has unique color, shape and quantity
+        choice_features = self._rng.random((trials, self.RULES, self.CHOICE_CARDS)).argsort(axis=-1)
+        choice_features = choice_features.transpose(0, 2, 1)
+        target_features = self._rng.integers(self.CHOICE_CARDS, size=(trials, 1, self.RULES))
+        features = np.concatenate((choice_features, target_features), axis=1)
+
+        is_same_as_target = features[:, :-1] == features[:, -1:]
+        swaps = np.full((trials, self.RULES, self.RULES, 2), self.NO_SWAP, dtype=np.int8)
+        trial_idx = np.arange(trials)
+        for previous_rule in range(self.RULES):
+            for current_rule in range(self.RULES):
+                if previous_rule == current_rule:
+                    continue
+
+                is_ambiguous = is_same_as_target[:, :, previous_rule] & is_same_as_target[:, :, current_rule]
+                is_swap_needed = is_ambiguous.any(axis=1)
+                ambiguous_card = is_ambiguous.argmax(axis=1)
+                card_to_switch = (ambiguous_card + self._rng.integers(1, self.CHOICE_CARDS, size=trials)) \
+                    % self.CHOICE_CARDS
+
+                swaps[trial_idx[is_swap_needed], previous_rule, current_rule, 0] = ambiguous_card[is_swap_needed]
+                swaps[trial_idx[is_swap_needed], previous_rule, current_rule, 1] = card_to_switch[is_swap_needed]
+
+        cards = np.empty(features.shape[:2], dtype=self.CARD_FEATURES)
+        for rule, feature_name in enumerate(self.CARD_FEATURES.names):
+            cards[feature_name] = features[:, :, rule]
+
+        self._cards = np.concatenate((self._cards, cards))
+        self._swaps = np.concatenate((self._swaps, swaps))
+
+    def trial(self, trial: int, previous_rule: Optional[int] = None, current_rule: Optional[int] = None) -> np.ndarray:
+        """
+        :param trial: number of trial from the start of the deck
+        :param previous_rule: rule before change, if it is the first trial after rule change
+        :param current_rule: rule after change, if it is the first trial after rule change
+        :return: features of choice cards and target card without ambiguity between previous and current rule
+        """
+        while trial >= len(self._cards):
+            self._extend(self._chunk_size)
+
+        cards = self._cards[trial].copy()
+
+        if previous_rule is None or current_rule is None:
+            self._given_rules.append((self.NO_SWAP, self.NO_SWAP))
+            return cards
+
+        self._given_rules.append((previous_rule, current_rule))
+        ambiguous_card, card_to_switch = self._swaps[trial, previous_rule, current_rule]
+        if ambiguous_card != self.NO_SWAP:
+            feature_name = self.CARD_FEATURES.names[previous_rule]
+            cards[feature_name][[ambiguous_card, card_to_switch]] = cards[feature_name][[card_to_switch,
+                                                                                         ambiguous_card]]
+
+        return cards
+
+    def get_state(self) -> dict:
+        """
+        :return: generated cards, given rules and state of random generator for cards which are not generated yet
+        """
+        return dict(cards=self._cards.copy(),
+                    swaps=self._swaps.copy(),
+                    given_rules=list(self._given_rules),
+                    rng=self._rng.bit_generator.state)
+
+    def set_state(self, state: dict) -> None:
+        self._cards = state["cards"].copy()
+        self._swaps = state["swaps"].copy()
+        self._given_rules = list(state["given_rules"])
+        self._rng.bit_generator.state = state["rng"]
+
+    def save(self, fp: str) -> None:
+        np.savez(fp,
+                 cards=self._cards,
+                 swaps=self._swaps,
+                 given_rules=np.array(self._given_rules, dtype=np.int8).reshape(-1, 2))
+
+    @classmethod
+    def load(cls, fp: str, rng: Optional[np.random.Generator] = None) -> "WisconsinDeck":
+        """
+        Load saved deck to replay it from the first trial. Trials after saved ones are generated again
+
+        :param rng: generator of trials after saved ones, it is not used until the saved trials are over
+        """
+        # saved cards are not generated again, so the deck is built without __init__ drawing from rng
+        deck = cls.__new__(cls)
+        with np.load(fp, allow_pickle=False) as saved:
+            deck._cards = saved["cards"]
+            deck._swaps = saved["swaps"]
+
+        deck._chunk_size = len(deck._cards)
+        deck._rng = rng if rng is not None else np.random.default_rng()
+        deck._given_rules = []
+
+        return deck
+
+
 class WisconsinTest(Task):  # SwitchTask
-    def __init__(self, max_streak: int, max_trials: Optional[int], max_rules_changed: Optional[int]):
+    def __init__(self,
+                 max_streak: int,
+                 max_trials: Optional[int],
+                 max_rules_changed: Optional[int],
+                 rng: Optional[random.Random] = None):
+        """
+        :param rng: stream of the session to choose rules
+        """
+        self._rng = rng if rng is not None else random.Random()
         self._max_streak: int = max_streak
         self._rules: Tuple[str, ...] = ("color", "shape", "quantity")
         self.previous_rule: Optional[int] = None
@@ -191,7 +394,7 @@ class WisconsinTest(Task):  # SwitchTask
             self.previous_rule = self.rule
             possible_rules.remove(self.rule)
 
-        self.rule = choice(possible_rules)
+        self.rule = self._rng.choice(possible_rules)
         self.rule_name = self._rules[self.rule]
 
     def is_correct(self, chosen_card: WisconsinCard, target_card: WisconsinCard) -> bool:
@@ -257,3 +460,26 @@ class WisconsinTest(Task):  # SwitchTask
         self._next_subtask_with_new_rule()
         self._trial = 0
         self._rules_changed = 0
+
+    def get_state(self) -> dict:
+        return dict(previous_rule=self.previous_rule,
+                    rule=self.rule,
+                    streak=self.streak,
+                    first_trial_after_rule_change=self._first_trial_after_rule_change,
+                    trial_correctness=self._trial_correctness,
+                    trial=self._trial,
+                    rules_changed=self._rules_changed,
+                    the_first_trial=self._the_first_trial,
+                    rng=self._rng.getstate())
+
+    def set_state(self, state: dict) -> None:
+        self.previous_rule = state["previous_rule"]
+        self.rule = state["rule"]
+        self.rule_name = None if self.rule is None else self._rules[self.rule]
+        self.streak = state["streak"]
+        self._first_trial_after_rule_change = state["first_trial_after_rule_change"]
+        self._trial_correctness = state["trial_correctness"]
+        self._trial = state["trial"]
+        self._rules_changed = state["rules_changed"]
+        self._the_first_trial = state["the_first_trial"]
+        self._rng.setstate(state["rng"])
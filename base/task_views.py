@@ -1,29 +1,36 @@
 from abc import ABCMeta, abstractmethod
-from collections import namedtuple
-from typing import List, Tuple, Optional
+import random
+import time
+from typing import Callable, Dict, List, Sequence, Tuple, Optional
 from pathlib import Path
 
 import numpy as np
-from psychopy import core, event, visual
 
-from base import task_presenters
+from base import audio_bank, hit_testing, input_events, task_presenters, texture_cache
+from base.backend import core, event, load_sound, visual
 
 
-def _ensure_creation_of_element(obj_creation_function: visual.basevisual):
+def _create_element(creation_function: Callable[[], visual.basevisual],
+                    max_attempts: int = 10) -> Tuple[visual.basevisual, int, float]:
     """
-    That function ensure creation of psychopy.visual element (primarily used for visual.ElementArrayStim)
-    :param obj_creation_function: visual.basevisual
-    :return: function wrapper
+    Create psychopy.visual element, which creation sometimes fails with ValueError
+    (primarily used for visual.ElementArrayStim)
+    :param creation_function: function creating the element
+    :param max_attempts: attempts of creation before RuntimeError is raised
+    :return: element, number of attempts and time in seconds they took
     """
+    start = time.perf_counter()
+    last_error = None
+    for attempt in range(1, max_attempts + 1):
+        try:
+            element = creation_function()
+        except ValueError as error:
+            last_error = error
+            continue
 
-    def wrapper(self, position):
-        while True:
-            try:
-                return obj_creation_function(self, position)
-            except ValueError:
-                pass
+        return element, attempt, time.perf_counter() - start
 
-    return wrapper
+    raise RuntimeError(f"Element was not created after {max_attempts} attempts") from last_error
 
 
 ScreenPosition = Tuple[float, float]
@@ -44,7 +51,10 @@ class AbstractTaskView(metaclass=ABCMeta):
         pass
 
     @staticmethod
-    def is_valid_click() -> bool:
+    def is_valid_click(click: input_events.ClickEvent) -> bool:
+        """
+        :param click: press polled from the queue of mouse clicks
+        """
         return True
 
     @property
@@ -78,9 +88,18 @@ class InhibitionTaskView(AbstractTaskView):
                  window: visual.Window,
                  position: ScreenPosition,
                  stimuli_fp: str,
-                 trials_finishing_task: int):
+                 trials_finishing_task: int,
+                 prefetch_depth: int = 3,
+                 rng: Optional[random.Random] = None):
+        """
+        :param rng: stream of the session to shuffle stimuli, e.g. from SessionRNG
+        """
         self._presenter = task_presenters.InhibitionTask(fp=stimuli_fp,
-                                                         trials_before_task_finished=trials_finishing_task)
+                                                         trials_before_task_finished=trials_finishing_task,
+                                                         rng=rng)
+        self._prefetch_depth = prefetch_depth
+        self._prefetcher = texture_cache.TexturePrefetcher()
+        self._prefetcher.prefetch(self._presenter.upcoming_stimuli(self._prefetch_depth))
 
         # TODO: заменить на нормальные изображения
         self._position = position
@@ -96,7 +115,16 @@ class InhibitionTaskView(AbstractTaskView):
 
     def next_subtask(self):
         self._is_next_task = False
-        self._current_task.image = self._presenter.next_subtask()
+        self._current_task.image = self._prefetcher.get(self._presenter.next_subtask())
+        self._prefetcher.prefetch(self._presenter.upcoming_stimuli(self._prefetch_depth))
+
+    @property
+    def prefetch_hits(self) -> int:
+        return self._prefetcher.hits
+
+    @property
+    def prefetch_misses(self) -> int:
+        return self._prefetcher.misses
 
     def new_task(self) -> None:
         self._presenter.new_task()
@@ -123,24 +151,38 @@ class InhibitionTaskView(AbstractTaskView):
     def draw(self, t_to_next_flip):
         self._current_task.draw()
 
+    def get_state(self) -> dict:
+        return self._presenter.get_state()
+
+    def set_state(self, state: dict) -> None:
+        self._presenter.set_state(state)
+        self._prefetcher.prefetch(self._presenter.upcoming_stimuli(self._prefetch_depth))
+
+    def close(self) -> None:
+        """
+        Stop worker thread of prefetcher, images which are not decoded yet are dropped
+        """
+        self._prefetcher.close()
+
 
 class SoundPlayer:  # TODO: change files extension because mp3 is not working with Sound
     def __init__(self, sounds_fp, extension=".wav"):
-        # noinspection PyProtectedMember
-        from psychopy import prefs
-        prefs.hardware['audioLib'] = ['ptb']
-        from psychopy import sound
+        self._bank = audio_bank.AudioBank(sounds_fp=sounds_fp, extension=extension)
 
-        self._sound = sound.Sound()
+        sound = load_sound()
+        self._sound = sound.Sound(sampleRate=self._bank.sample_rate)
 
-        self._sounds_paths = {sound_fp.stem: str(sound_fp)
-                              for sound_fp in Path(sounds_fp).glob(pattern=f"*{extension}")}
+        # how long it took to hand every word to the sound library
+        self.preparation_latency: Dict[str, float] = {}
 
-        if not self._sounds_paths:
-            raise ValueError(f"SoundPlayer did not find files in the directory {sounds_fp} with extension {extension}")
+    @property
+    def resident_bytes(self) -> int:
+        return self._bank.resident_bytes
 
     def prepare_sound(self, sound_name):
-        self._sound.setSound(self._sounds_paths[sound_name])
+        start = time.perf_counter()
+        self._sound.setSound(self._bank[sound_name])
+        self.preparation_latency[sound_name] = time.perf_counter() - start
 
     def play(self):
         self._sound.play()
@@ -159,7 +201,11 @@ class UpdateTaskView(AbstractTaskView):
                  blocks_finishing_task: int,
                  possible_task_sequences: Tuple[int, ...],
                  sound_extension: str = ".wav",
+                 rng: Optional[random.Random] = None,
                  ):
+        """
+        :param rng: stream of the session to choose stimuli and group sizes, e.g. from SessionRNG
+        """
         self._word_presenter_timer = core.CountdownTimer()
         self._word_show_time = word_show_time
         self._ask_to_name_words = False
@@ -171,7 +217,8 @@ class UpdateTaskView(AbstractTaskView):
 
         self._presenter = task_presenters.UpdateTask(stimuli_fp=stimuli_fp,
                                                      possible_sequences=possible_task_sequences,
-                                                     blocks_before_task_finished=blocks_finishing_task)
+                                                     blocks_before_task_finished=blocks_finishing_task,
+                                                     rng=rng)
 
         self._position = position
         self._word_stimuli: visual.TextStim = visual.TextStim(win=window,
@@ -205,7 +252,7 @@ class UpdateTaskView(AbstractTaskView):
     def is_task_finished(self) -> bool:
         return self._presenter.is_task_finished()
 
-    def is_valid_click(self) -> bool:
+    def is_valid_click(self, click: input_events.ClickEvent) -> bool:
         return not self._is_next_task
 
     def get_data(self):
@@ -230,6 +277,12 @@ class UpdateTaskView(AbstractTaskView):
         self._presenter.new_task()
         self.next_subtask()
 
+    def get_state(self) -> dict:
+        return self._presenter.get_state()
+
+    def set_state(self, state: dict) -> None:
+        self._presenter.set_state(state)
+
     @property
     def position(self) -> ScreenPosition:
         return self._position
@@ -257,7 +310,36 @@ class UpdateTaskView(AbstractTaskView):
             self._answer_time_text.draw()
 
 
-SuitFeatures = namedtuple("SuitFeatures", "color shape figures_place")
+class SuitElements:
+    """
+    Suit elements of every card created for every shape. Image of the shape is decoded once and shared
+    by the elements of all cards, each element uploads it on creation.
+    Colors and positions of suit are set once per trial, so frame only draws chosen elements
+    """
+
+    def __init__(self, elements: Sequence[Sequence[visual.ElementArrayStim]]):
+        """
+        :param elements: elements of every card by shape
+        """
+        self._elements = tuple(tuple(card_elements) for card_elements in elements)
+        self._shown = [card_elements[0] for card_elements in self._elements]
+
+    def show(self, card: int, shape: int, color: str, xys: List[List[float]]) -> None:
+        element = self._elements[card][shape]
+        element.setColors(color)
+        element.setXYs(xys)
+        self._shown[card] = element
+
+    def move(self, from_position: ScreenPosition, to_position: ScreenPosition) -> None:
+        # visual element pos is numpy array, thus we can subtract tuple from it
+        # result is relative position of element to the task
+        for card_elements in self._elements:
+            for element in card_elements:
+                element.fieldPos -= from_position
+                element.fieldPos += to_position
+
+    def draw(self, card: int) -> None:
+        self._shown[card].draw()
 
 
 class WisconsinTestTaskView(AbstractTaskView):
@@ -269,7 +351,15 @@ class WisconsinTestTaskView(AbstractTaskView):
                  trials_finishing_task: int,
                  rule_changes_finishing_task: int,
                  max_streak: int = 8,
-                 feedback_time: float = 1.0):
+                 feedback_time: float = 1.0,
+                 deck: Optional[task_presenters.WisconsinDeck] = None,
+                 rng: Optional[random.Random] = None,
+                 deck_rng: Optional[np.random.Generator] = None):
+        """
+        :param deck: features of cards to show, for example loaded deck of previous session to replay it
+        :param rng: stream of the session to choose rules, e.g. from SessionRNG
+        :param deck_rng: generator of the session for cards of the deck, if deck is not given
+        """
         self._win = window
         self._position = position
         self.feedback_text_pos: Optional[ScreenPosition] = None
@@ -277,29 +367,36 @@ class WisconsinTestTaskView(AbstractTaskView):
         self._center_position_x, self._center_position_y = position
         self._test_presenter = task_presenters.WisconsinTest(max_streak=max_streak,
                                                              max_trials=trials_finishing_task,
-                                                             max_rules_changed=rule_changes_finishing_task)
+                                                             max_rules_changed=rule_changes_finishing_task,
+                                                             rng=rng)
 
         self.card_x = self._win.size[1] * 0.1  # horizontal space between choice cards
         self.card_w = self._win.size[1] * 0.1  # card width
         self.card_h = self._win.size[1] * 0.15  # card height
         self.card_y = -self.card_h * 0.33 + self._center_position_y  # vertical position of choice cards
 
-        self._shapes: List[visual.basevisual] = []
-        self._load_shapes(path=image_path_dir)
+        self._shape_textures = self._load_shapes(path=image_path_dir)
         self._calculate_correct_size()
 
         self._cards = []
-        self._suit_elements = []
+        self._suit_elements: Optional[SuitElements] = None
+        self.suit_creation_attempts: int = 0
+        self.suit_creation_time: float = 0.0
 
         self._fill_cards()
         self._target_card = self._cards[-1]
         self._presentation_cards = self._cards[:-1]
+        self._presentation_cards_hits = hit_testing.RectHitIndex(self._presentation_cards)
         self._chosen_card = None
 
         self._feedback_text = visual.TextStim(self._win, pos=self.feedback_text_pos, height=40)
         self._feedback_countdown = core.CountdownTimer(start=feedback_time)
         self._mouse = mouse
         self._clock = core.Clock()
+        if deck is None:
+            deck = task_presenters.WisconsinDeck(trials=trials_finishing_task or 256, rng=deck_rng)
+        self._deck = deck
+        self._deck_trial = 0
         self._next_trial()
 
         self._show_feedback = False
@@ -307,14 +404,14 @@ class WisconsinTestTaskView(AbstractTaskView):
         self._answer_time = None
         self._is_next_task = False  # TODO: подумать здесь ли место этой логике
 
-    def _load_shapes(self, path: str) -> None:
+    @staticmethod
+    def _load_shapes(path: str) -> List:
         # TODO: ПОМЕНЯТЬ ТРЕУГОЛЬНИК НА КРЕСТ
         shapes = ("circle", "square", "star", "triangle")
         image_dir_path = Path(path)
 
-        for shape in shapes:
-            image_path = image_dir_path / f"{shape}.png"
-            self._shapes.append(image_path)
+        # shapes are decoded once and shared by suit elements of all cards
+        return [texture_cache.decode_image(str(image_dir_path / f"{shape}.png")) for shape in shapes]
 
     def _calculate_correct_size(self):
         self.target_pos = (0, self.card_y - self.card_h * 1.75)  # position of the target card
@@ -353,12 +450,8 @@ class WisconsinTestTaskView(AbstractTaskView):
         card_positions = [((i - 1.5) * (self.card_x + self.card_w), self.card_y)
                           for i in range(choice_cards)] + [self.target_pos]
 
-        for position in card_positions:
-            card = self._create_card(position)
-            suit_elements = self._create_suit(position)
-
-            self._cards.append(card)
-            self._suit_elements.append(suit_elements)
+        self._cards = [self._create_card(position) for position in card_positions]
+        self._suit_elements = self._create_suits(card_positions)
 
         self.target_pos = tuple(self._cards[-1].pos)
         self.feedback_text_pos = (self.target_pos[0], (self.target_pos[1] + self.card_y) / 2)
@@ -373,62 +466,51 @@ class WisconsinTestTaskView(AbstractTaskView):
                            )
         return card
 
-    @_ensure_creation_of_element
-    def _create_suit(self, position):
-        x, y = position
-        suit = visual.ElementArrayStim(self._win,
-                                       nElements=4,
-                                       sizes=self.card_h / 4,
-                                       fieldPos=(x + self._center_position_x, y),
-                                       elementTex=None,
-                                       elementMask=None,
-                                       )
-        return suit
-
-    def _is_card_features_with_target_ambiguous(self, card_features, previous_rule, current_rule):
-        return card_features[previous_rule] == self._target_card_features[previous_rule] \
-               and card_features[current_rule] == self._target_card_features[current_rule]
+    def _create_suits(self, card_positions: Sequence[ScreenPosition]) -> SuitElements:
+        elements = []
+        for x, y in card_positions:
+            card_elements = []
+            for shape_texture in self._shape_textures:
+                element, attempts, creation_time = _create_element(
+                    lambda: visual.ElementArrayStim(self._win,
+                                                    nElements=4,
+                                                    sizes=self.card_h / 4,
+                                                    fieldPos=(x + self._center_position_x, y),
+                                                    elementTex=shape_texture,
+                                                    elementMask=None,
+                                                    ))
+                self.suit_creation_attempts += attempts
+                self.suit_creation_time += creation_time
+                card_elements.append(element)
+
+            elements.append(card_elements)
+
+        return SuitElements(elements)
 
     def _next_trial(self):
-        current_rule = self._test_presenter.rule
-        previous_rule = self._test_presenter.previous_rule
-
         self._trial_start = None
         self._answer_time = None
         self._show_feedback = False
 
-        choice_cards = 4
-        stimuli_features_randomization = [np.random.permutation(choice_cards) for _ in self._cards[:-1]]
-        presentation_chosen_features = np.array(stimuli_features_randomization).T.tolist()
-        self._target_card_features = list(np.random.randint(4, size=choice_cards))
-        self._presentation_cards_features = [features[:-1] for features in presentation_chosen_features]
-        all_features = presentation_chosen_features + [self._target_card_features]
-        all_features = [SuitFeatures(*features[:-1]) for features in all_features]
-
         if self._test_presenter.is_first_trial_after_rule_change():
-            for idx, card_features in enumerate(all_features[:-1]):
-                # TODO: убедиться, что действительно не может совпасть правило (код работает,
-                #  но надо подумать всё ли ловит)
-                if self._is_card_features_with_target_ambiguous(card_features=card_features,
-                                                                previous_rule=previous_rule,
-                                                                current_rule=current_rule):
-                    card_to_switch_idx = np.random.choice(a=[card_idx
-                                                             for card_idx in range(choice_cards)
-                                                             if card_idx != idx])
-
-                    card_to_switch = list(all_features[card_to_switch_idx])
-                    card_features = list(card_features)
-
-                    card_to_switch[previous_rule], card_features[previous_rule] = \
-                        card_features[previous_rule], card_to_switch[previous_rule]
-                    all_features[idx] = SuitFeatures(*card_features)
-                    all_features[card_to_switch_idx] = SuitFeatures(*card_to_switch)
-                    break
-
-        for suit, card_features in zip(self._suit_elements, all_features):
-            suit.setColors(self.colors[card_features.color])
-            suit.setTex(self._shapes[card_features.shape])
-            suit.setXYs(self.suit_pos[card_features.figures_place])
+            cards_features = self._deck.trial(self._deck_trial,
+                                              previous_rule=self._test_presenter.previous_rule,
+                                              current_rule=self._test_presenter.rule)
+        else:
+            cards_features = self._deck.trial(self._deck_trial)
+        self._deck_trial += 1
+        self._show_cards(cards_features)
+
+    def _show_cards(self, cards_features: np.ndarray) -> None:
+        self._cards_features = cards_features
+        self._presentation_cards_features = cards_features[:-1]
+        self._target_card_features = cards_features[-1]
+
+        for card, card_features in enumerate(cards_features):
+            self._suit_elements.show(card=card,
+                                     shape=card_features["shape"],
+                                     color=self.colors[card_features["color"]],
+                                     xys=self.suit_pos[card_features["figures_place"]])
 
     def finish_trial(self) -> None:
         if self._chosen_card is not None:
@@ -464,6 +546,18 @@ class WisconsinTestTaskView(AbstractTaskView):
     def new_task(self) -> None:
         self._test_presenter.new_task()
 
+    def get_state(self) -> dict:
+        return dict(test=self._test_presenter.get_state(),
+                    deck=self._deck.get_state(),
+                    deck_trial=self._deck_trial,
+                    cards_features=self._cards_features.copy())
+
+    def set_state(self, state: dict) -> None:
+        self._test_presenter.set_state(state["test"])
+        self._deck.set_state(state["deck"])
+        self._deck_trial = state["deck_trial"]
+        self._show_cards(state["cards_features"])
+
     def _prepare_feedback(self, is_correct_answer):
         if is_correct_answer:
             self._feedback_text.text = u"ВЕРНО"
@@ -483,18 +577,22 @@ class WisconsinTestTaskView(AbstractTaskView):
         self._feedback_countdown.reset()
         self._show_feedback = True
 
-    def is_valid_click(self) -> bool:
+    def is_valid_click(self, click: input_events.ClickEvent) -> bool:
+        """
+        Card is chosen by position of the click, not by current position of the mouse.
+        Answer time is taken from the press time of the click, so it is not quantized to frames
+        """
         if self._is_next_task:
             return False
 
         is_valid_click = False
         if not self._show_feedback:
-            for idx, card in enumerate(self._presentation_cards):
-                if self._mouse.isPressedIn(shape=card, buttons=[0]):
-                    self._answer_time = self._clock.getTime()
-                    self._chosen_card = idx
-                    is_valid_click = True
-                    break
+            chosen_card = self._presentation_cards_hits.find(click.pos)
+            if chosen_card is not None:
+                # press time of the queue is moved to the clock of the task by its delay before the poll
+                self._answer_time = self._clock.getTime() - (click.polled_time - click.time)
+                self._chosen_card = chosen_card
+                is_valid_click = True
 
         return is_valid_click
 
@@ -506,13 +604,9 @@ class WisconsinTestTaskView(AbstractTaskView):
         card.pos -= (self._center_position_x, self._center_position_y)
         card.pos += new_center_position
 
-    def _change_center_position_for_suit_elements(self,
-                                                  suit_elements: visual.basevisual,
-                                                  new_center_position: ScreenPosition):
-        # visual element pos is numpy array, thus we can subtract tuple from it
-        # result is relative position of element to the task
-        suit_elements.fieldPos -= (self._center_position_x, self._center_position_y)
-        suit_elements.fieldPos += new_center_position
+    def _change_center_position_for_suit_elements(self, new_center_position: ScreenPosition):
+        self._suit_elements.move(from_position=(self._center_position_x, self._center_position_y),
+                                 to_position=new_center_position)
 
     @property
     def position(self) -> ScreenPosition:
@@ -521,9 +615,9 @@ class WisconsinTestTaskView(AbstractTaskView):
     @position.setter
     def position(self, value: ScreenPosition) -> None:
         # Посмотреть как именно утроенно задания местопложения карт и элементов на них
-        for card, suit_elements in zip(self._cards, self._suit_elements):
+        for card in self._cards:
             self._change_center_position_for_card(card, new_center_position=value)
-            self._change_center_position_for_suit_elements(suit_elements, new_center_position=value)
+        self._change_center_position_for_suit_elements(new_center_position=value)
 
         # Должно быть последним, так просто использует новое значение от  положения целевой карты
         self._center_position_x, self._center_position_y = value
@@ -532,6 +626,18 @@ class WisconsinTestTaskView(AbstractTaskView):
         self.card_y = -self.card_h * 0.33 + self._center_position_y
         self.feedback_text_pos = (self.target_pos[0], (self.target_pos[1] + self.card_y) / 2)
         self._feedback_text.pos = self.feedback_text_pos
+        self._presentation_cards_hits.rebuild(self._presentation_cards)
+
+    @property
+    def deck(self) -> task_presenters.WisconsinDeck:
+        return self._deck
+
+    @property
+    def presentation_cards_hits(self) -> hit_testing.RectHitIndex:
+        """
+        :return: index of choice cards, card number is the index of rectangle
+        """
+        return self._presentation_cards_hits
 
     def draw(self, t_to_next_flip):  # TODO: Возможно стоит добавить использование времени
         if self._show_feedback:
@@ -540,9 +646,9 @@ class WisconsinTestTaskView(AbstractTaskView):
             else:
                 self._show_feedback = False
 
-        for card, suit in zip(self._cards, self._suit_elements):
+        for card_idx, card in enumerate(self._cards):
             card.draw()
-            suit.draw()
+            self._suit_elements.draw(card_idx)
 
         if self._trial_start is None:
             self._trial_start = self._clock.getTime()
@@ -0,0 +1,171 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import os
+import threading
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from PIL import Image
+
+
+def decode_image(path: str) -> Image.Image:
+    """
+    Read and decode image file, so psychopy.visual.ImageStim gets ready pixels instead of path
+    :param path: path to image file
+    :return: decoded image
+    """
+    with Image.open(path) as image:
+        image.load()
+        return image.convert("RGBA")
+
+
+class TexturePrefetcher:
+    """
+    Decode images which will be shown next on worker thread.
+    Render thread only swaps in decoded image, so there is no file reading on the frame of stimulus change
+    """
+
+    def __init__(self,
+                 decoder: Callable[[str], Image.Image] = decode_image,
+                 workers: int = 1):
+        self._decoder = decoder
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="texture_prefetcher")
+        self._prefetched: Dict[str, Future] = {}
+
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def prefetch(self, paths: Iterable[str]) -> None:
+        for path in paths:
+            if path not in self._prefetched:
+                self._prefetched[path] = self._executor.submit(self._decoder, path)
+
+    def get(self, path: Optional[str]) -> Optional[Image.Image]:
+        """
+        :param path: path to image file
+        :return: decoded image. If it was not decoded yet, waits for it or decodes on the calling thread
+        """
+        if path is None:
+            return None
+
+        # every stimulus is shown once, so there is no need to keep it after use
+        future = self._prefetched.pop(path, None)
+
+        if future is not None and future.done():
+            self.hits += 1
+            return future.result()
+
+        self.misses += 1
+        if future is not None:
+            return future.result()
+
+        return self._decoder(path)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._prefetched.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def image_size_in_bytes(image: Image.Image) -> int:
+    return image.width * image.height * len(image.getbands())
+
+
+TextureKey = Tuple[str, float]
+
+
+class InstructionTextureCache:
+    """
+    Least recently used cache of decoded instruction images limited by memory they take.
+    Image is found by path and modification time of the file, so changed instruction is decoded again
+    """
+
+    def __init__(self,
+                 max_bytes: int = 256 * 1024 ** 2,
+                 decoder: Callable[[str], Image.Image] = decode_image,
+                 workers: int = 1):
+        self._max_bytes = max_bytes
+        self._decoder = decoder
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="instruction_textures")
+
+        self._lock = threading.Lock()
+        self._textures: "OrderedDict[TextureKey, Image.Image]" = OrderedDict()
+        self._warming: Dict[TextureKey, Future] = {}
+
+        self.size_in_bytes: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+
+    @staticmethod
+    def _key(path: str) -> TextureKey:
+        return os.path.abspath(path), os.stat(path).st_mtime
+
+    def _decode_and_store(self, key: TextureKey) -> Image.Image:
+        image = self._decoder(key[0])
+        image_size = image_size_in_bytes(image)
+
+        with self._lock:
+            self._warming.pop(key, None)
+
+            if key in self._textures or image_size > self._max_bytes:
+                return image
+
+            # older versions of the same file will never be asked again
+            for outdated_key in [cached for cached in self._textures if cached[0] == key[0]]:
+                self._remove(outdated_key)
+
+            while self.size_in_bytes + image_size > self._max_bytes:
+                self._remove(next(iter(self._textures)))
+
+            self._textures[key] = image
+            self.size_in_bytes += image_size
+
+        return image
+
+    def _remove(self, key: TextureKey) -> None:
+        image = self._textures.pop(key)
+        self.size_in_bytes -= image_size_in_bytes(image)
+
+    def warm(self, paths: Iterable[str]) -> None:
+        """
+        Decode images on worker thread, so following call to get does not wait for decoding
+        :param paths: paths to image files
+        """
+        for path in paths:
+            key = self._key(path)
+
+            with self._lock:
+                if key in self._textures or key in self._warming:
+                    continue
+
+                self._warming[key] = self._executor.submit(self._decode_and_store, key)
+
+    def get(self, path: str) -> Image.Image:
+        key = self._key(path)
+
+        with self._lock:
+            if key in self._textures:
+                self.hits += 1
+                self._textures.move_to_end(key)
+                return self._textures[key]
+
+            self.misses += 1
+            warming = self._warming.get(key)
+
+        if warming is not None:
+            return warming.result()
+
+        return self._decode_and_store(key)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
@@ -1,11 +1,12 @@
 import collections
 import configparser
 import itertools
+from typing import Iterable
 
-from psychopy import core, event, visual
-from psychopy.hardware import keyboard
-
-from base import data_save, experiment_organization_logic, experiment_organization_stimuli, probe_views, task_views
+from base import checkpoint, counterbalancing, data_save, experiment_organization_logic, \
+    experiment_organization_stimuli, frame_timing, input_events, probe_presenters, probe_views, session_designs, \
+    session_rng, task_views, texture_cache
+from base.backend import core, event, keyboard, visual
 
 MODE = "EXPERIMENT"
 
@@ -15,6 +16,10 @@ SETTINGS_PARSER.read(SETTINGS_FP, encoding="UTF-8")
 SETTINGS = SETTINGS_PARSER[MODE]
 
 FULL_SCREEN = SETTINGS.getboolean("full_screen")
+# путь к контрольной точке прерванной сессии, пустой для новой сессии
+RESUME_CHECKPOINT_FP = SETTINGS.get("resume_checkpoint", fallback="")
+# зерно сессии для её воспроизведения, пустое для нового зерна
+SESSION_SEED = SETTINGS.get("session_seed", fallback="")
 
 TASKS_SIZE = dict(Обновление=dict(word_size=40, example_size=40, answer_size=30))
 TRAINING_TRAILS_QTY = dict(Обновление=1, Переключение=10, Торможение=2)
@@ -26,6 +31,9 @@ EXPERIMENTAL_TASK_ONE_SOLUTION_SETTINGS = dict(Обновление=dict(blocks_
 
 FRAME_TOLERANCE = 0.001  # how close to onset before 'same' frame TODO: проверить что используется правильно
 PROBE_START = 0.1
+# одинаковые и разные зонды обновления показываются поровну и не больше четырёх ответов подряд,
+# те же настройки проверяет validate_probe_design.py
+UPDATE_PROBE_ANSWERS = probe_presenters.UPDATE_ANSWERS
 EXPERIMENTAL_PROBE_POSITION = dict(Торможение=(0, -300), Обновление=(0, -209), Переключение=(0, -275))
 PROBES_TRAINING_POSITION = (0, 0)
 EXPERIMENTAL_TASK_POSITION = dict(Торможение=(0, 132), Обновление=(0, 43), Переключение=(0, 266))
@@ -43,31 +51,62 @@ def change_mouse_visibility(mouse_component: event.Mouse,
         mouse_component.setVisible(False)
 
 
-def finish_experiment(window: visual.Window):
+def finish_experiment(window: visual.Window, resources: Iterable = ()):
     """
     PsychoPy выдаёт ошибки при завершении скрипта, которые никак не мешают исполнению, но мешают отладке.
     Данный код попытка их игнорировать
+
+    :param resources: объекты с методом close, например кэши изображений с рабочими потоками
     """
     from contextlib import suppress
 
+    for resource in resources:
+        with suppress(Exception):
+            resource.close()
+
     with suppress(Exception):
         window.close()
         core.quit()
 
 
-info_dialog = experiment_organization_stimuli.ParticipantInfoGetter()
-if info_dialog.is_canceled:
-    core.quit()
-participant_info = info_dialog.filled_info
+if RESUME_CHECKPOINT_FP:
+    resumed_state = checkpoint.SessionCheckpoint(RESUME_CHECKPOINT_FP).load()
+    participant_info = dict(resumed_state["participant_info"])
+    resume_file_name = resumed_state["data_saver"]["file_name"]
+    session_seed = participant_info["session_seed"]
+else:
+    resumed_state = None
+    info_dialog = experiment_organization_stimuli.ParticipantInfoGetter()
+    if info_dialog.is_canceled:
+        core.quit()
+    participant_info = info_dialog.filled_info
+    resume_file_name = None
+    session_seed = SESSION_SEED
+# у каждого компонента свой поток случайных чисел из зерна сессии, зерно сохраняется в данных
+session_random = session_rng.SessionRNG(seed=int(session_seed) if session_seed else None)
+participant_info["session_seed"] = str(session_random.seed)
+# DataSaver дополняет информацию, а в контрольную точку сохраняется введённая
+session_participant_info = dict(participant_info)
 
 win = visual.Window(size=(1200, 800), color="white", units="pix", fullscr=FULL_SCREEN)
 data_saver = data_save.DataSaver(save_fp=f"data/WM/{participant_info['ФИО']}",
                                  experiment_part=data_save.ExperimentPart.WM,
-                                 participant_info=participant_info)
-instruction = experiment_organization_stimuli.InstructionImage(window=win, skip=False)
+                                 participant_info=participant_info,
+                                 streaming=True,
+                                 asynchronous=True,
+                                 save_columns=True,
+                                 resume_file_name=resume_file_name)
+session_checkpoint = checkpoint.SessionCheckpoint(f"{data_saver.file_name}_checkpoint.pickle")
+frame_telemetry = frame_timing.FrameTelemetry(save_fp=f"{data_saver.file_name}_frames.csv",
+                                              frame_period=win.monitorFramePeriod)
+instruction_textures = texture_cache.InstructionTextureCache()
+# закрываются при любом завершении эксперимента, в том числе по клавише выхода
+session_resources = [instruction_textures]
+instruction = experiment_organization_stimuli.InstructionImage(window=win, skip=False, textures=instruction_textures)
 organisation_message = experiment_organization_stimuli.GeneralInstructions(fp="images/Инструкции/Общие/WM",
                                                                            window=win,
-                                                                           skip=False)
+                                                                           skip=False,
+                                                                           textures=instruction_textures)
 
 # Подготовка зондов для эксперимента
 probe_two_alternatives = probe_views.ProbeView(window=win,
@@ -76,14 +115,17 @@ probe_two_alternatives = probe_views.ProbeView(window=win,
                                                probe_type="TwoAlternatives",
                                                start_time=PROBE_START,
                                                image_path_dir="images/Выбор из 2 альтернатив/",
-                                               position=PROBES_TRAINING_POSITION)
+                                               position=PROBES_TRAINING_POSITION,
+                                               rng=session_random.stream("probe Выбор из 2 альтернатив"))
 probes_update = probe_views.ProbeView(window=win,
                                       probes=["1", "2", "3"],
                                       answers=None,
                                       probe_type="Update",
                                       start_time=PROBE_START,
                                       image_path_dir="images/Обновление/",
-                                      position=PROBES_TRAINING_POSITION)
+                                      position=PROBES_TRAINING_POSITION,
+                                      rng=session_random.stream("probe Обновление"),
+                                      **UPDATE_PROBE_ANSWERS)
 
 probe_switch = probe_views.ProbeView(window=win,
                                      probes=list("12345678"),
@@ -91,7 +133,8 @@ probe_switch = probe_views.ProbeView(window=win,
                                      probe_type="Switch",
                                      start_time=PROBE_START,
                                      image_path_dir="images/Переключение/",
-                                     position=PROBES_TRAINING_POSITION)
+                                     position=PROBES_TRAINING_POSITION,
+                                     rng=session_random.stream("probe Переключение"))
 
 inhibition_probes = ["".join(colorful_word) for colorful_word in itertools.product("RGBY", repeat=2)]
 inhibition_right_answers = dict(R="right", Y="right", G="left", B="left")
@@ -103,7 +146,8 @@ probe_inhibition = probe_views.ProbeView(window=win,
                                          probe_type="Inhibition",
                                          start_time=PROBE_START,
                                          image_path_dir="images/Торможение/",
-                                         position=PROBES_TRAINING_POSITION)
+                                         position=PROBES_TRAINING_POSITION,
+                                         rng=session_random.stream("probe Торможение"))
 
 all_probes = collections.OrderedDict((
     ("Выбор из 2 альтернатив", probe_two_alternatives),
@@ -119,7 +163,9 @@ experimental_probes = collections.OrderedDict((
 ))
 
 # Подготовка устройств ввода
-single_keyboard = keyboard.Keyboard()
+# ответы на зонды собираются в отдельном потоке
+probe_keys = input_events.KeyboardEventQueue(key_list=["right", "left"])
+probe_keys.start()
 quit_keyboard = keyboard.Keyboard()
 mouse = event.Mouse(visible=False, win=win)
 
@@ -133,7 +179,8 @@ task_update = task_views.UpdateTaskView(window=win,
                                         word_show_time=0.750,
                                         blocks_finishing_task=TRAINING_TRAILS_QTY["Обновление"],
                                         possible_task_sequences=(4,),
-                                        position=TRAINING_TASK_POSITION)
+                                        position=TRAINING_TASK_POSITION,
+                                        rng=session_random.stream("training task Обновление"))
 
 task_switch = task_views.WisconsinTestTaskView(window=win,
                                                image_path_dir="images/Висконсинский тест",
@@ -141,12 +188,16 @@ task_switch = task_views.WisconsinTestTaskView(window=win,
                                                max_streak=8,
                                                trials_finishing_task=TRAINING_TRAILS_QTY["Переключение"],
                                                rule_changes_finishing_task=TRAINING_TRAILS_QTY["Переключение"],
-                                               position=TRAINING_TASK_POSITION)
+                                               position=TRAINING_TASK_POSITION,
+                                               rng=session_random.stream("training task Переключение"),
+                                               deck_rng=session_random.generator("training task Переключение"))
 
 task_inhibition = task_views.InhibitionTaskView(window=win,
                                                 stimuli_fp="images/Tower of London/training",
                                                 trials_finishing_task=TRAINING_TRAILS_QTY["Торможение"],
-                                                position=TRAINING_TASK_POSITION)
+                                                position=TRAINING_TASK_POSITION,
+                                                rng=session_random.stream("training task Торможение"))
+session_resources.append(task_inhibition)
 
 training_tasks = collections.OrderedDict((
     ("Обновление", task_update),
@@ -162,6 +213,7 @@ task_update = task_views.UpdateTaskView(window=win,
                                         word_show_time=0.750,
                                         possible_task_sequences=(3, 4),
                                         position=EXPERIMENTAL_TASK_POSITION["Обновление"],
+                                        rng=session_random.stream("task Обновление"),
                                         **EXPERIMENTAL_TASK_ONE_SOLUTION_SETTINGS["Обновление"]
                                         )
 
@@ -170,12 +222,16 @@ task_switch = task_views.WisconsinTestTaskView(window=win,
                                                mouse=mouse,
                                                max_streak=8,
                                                position=EXPERIMENTAL_TASK_POSITION["Переключение"],
+                                               rng=session_random.stream("task Переключение"),
+                                               deck_rng=session_random.generator("task Переключение"),
                                                **EXPERIMENTAL_TASK_ONE_SOLUTION_SETTINGS["Переключение"])
 
 task_inhibition = task_views.InhibitionTaskView(window=win,
                                                 stimuli_fp="images/Tower of London",
                                                 position=EXPERIMENTAL_TASK_POSITION["Торможение"],
+                                                rng=session_random.stream("task Торможение"),
                                                 **EXPERIMENTAL_TASK_ONE_SOLUTION_SETTINGS["Торможение"])
+session_resources.append(task_inhibition)
 
 experimental_tasks = collections.OrderedDict((
     ("Обновление", task_update),
@@ -188,60 +244,115 @@ experimental_tasks = collections.OrderedDict((
 
 training_probe_sequence = experiment_organization_logic.TrainingSequence(probes_sequence=tuple(all_probes),
                                                                          trials=50)
+# порядок комбинаций задач и зондов - следующая строка сбалансированного латинского квадрата.
+# Строка зависит от предыдущих сессий, поэтому сохраняется с зерном, и воспроизведение зерна берёт её же
+wm_combinations = experiment_organization_logic.ExperimentWMSequence.combinations(tuple(experimental_tasks),
+                                                                                  tuple(experimental_probes))
+wm_designs = session_designs.SessionDesigns(part=data_save.ExperimentPart.WM.value)
+try:
+    wm_design = wm_designs.find(session_random.seed)
+    if wm_design is None:
+        counterbalancing_allocator = counterbalancing.CounterbalancingAllocator(
+            design_key=counterbalancing.design_key(wm_combinations),
+            rows=counterbalancing.williams_design(len(wm_combinations)))
+        try:
+            combinations_order = counterbalancing_allocator.allocate(session=data_saver.file_name)
+        finally:
+            counterbalancing_allocator.close()
+        wm_design = wm_designs.record(session_random.seed, dict(order=combinations_order))
+finally:
+    wm_designs.close()
+combinations_order = wm_design["order"]
 experiment_sequence = experiment_organization_logic.ExperimentWMSequence(tasks=tuple(experimental_tasks),
                                                                          probes=tuple(experimental_probes),
-                                                                         )
+                                                                         order=combinations_order,
+                                                                         rng=session_random.stream("sequence"))
 
 trial_clock = core.Clock()
-task_solution_clock = core.Clock()
+# время нажатия берётся от мыши, а не от кадра, на котором нажатие было замечено
+task_clicks = input_events.MouseClickQueue(mouse=mouse)
 experiment_clock = core.Clock()
-# тренировка с зондами
-for probe_name, instruction_text, number_of_trials in training_probe_sequence:
-    data_saver.new_probe()
-    probe = all_probes[probe_name]
 
-    instruction.show(path=instruction_text)
+# состояние, которое сохраняется после каждой комбинации задачи и зонда
+checkpoint_components = dict(sequence=experiment_sequence,
+                             data_saver=data_saver,
+                             **{f"probe {name}": probe for name, probe in all_probes.items()},
+                             **{f"training task {name}": task for name, task in training_tasks.items()},
+                             **{f"task {name}": task for name, task in experimental_tasks.items()})
 
-    for trial in number_of_trials:
-        # сейчас RT - от времени отрисовки зонда
 
-        probe_started = False
+def save_probe_blocks():
+    """
+    Блоки зондов сохраняются, чтобы была известна точная последовательность показанных стимулов.
+    Лог переписывается с каждой контрольной точкой и при выходе, поэтому он есть и у прерванной сессии
+    """
+    probe_presenters.save_block_log(f"{data_saver.file_name}_probe_blocks.csv", all_probes)
+
+
+first_combination = 0
+if resumed_state is not None:
+    # сессия продолжается со следующей после последней завершённой комбинации, тренировка не повторяется
+    checkpoint.restore_state(checkpoint_components, resumed_state)
+    first_combination = resumed_state["next_combination"]
+    experiment_clock.reset(-resumed_state["experiment_time"])
+    instruction.warm(experiment_sequence.instructions_of(first_combination))
+    organisation_message.warm()
+else:
+    # тренировка с зондами
+    instruction.warm([training_probe_sequence[0].instruction])
+    for probe_idx, (probe_name, instruction_text, number_of_trials) in enumerate(training_probe_sequence):
+        data_saver.new_probe()
+        frame_telemetry.new_block(stage="probe training", probe=probe_name)
+        probe = all_probes[probe_name]
+
+        instruction.show(path=instruction_text)
+        # следующая инструкция готовится, пока идёт тренировка
+        if probe_idx + 1 < len(training_probe_sequence):
+            instruction.warm([training_probe_sequence[probe_idx + 1].instruction])
+        else:
+            instruction.warm(experiment_sequence.instructions_of(0))
+            organisation_message.warm()
+
+        for trial in number_of_trials:
+            # сейчас RT - от времени отрисовки зонда
+
+            probe_started = False
+            frame_telemetry.new_trial()
 
-        _timeToFirstFrame = win.getFutureFlipTime(clock="now")
-        trial_clock.reset(-_timeToFirstFrame)
-        while True:
-            tThisFlip = win.getFutureFlipTime(clock=trial_clock)
+            _timeToFirstFrame = win.getFutureFlipTime(clock="now")
+            trial_clock.reset(-_timeToFirstFrame)
+            while True:
+                tThisFlip = win.getFutureFlipTime(clock=trial_clock)
 
-            if probe_started:
-                keys = single_keyboard.getKeys(keyList=["right", "left"],
-                                               waitRelease=False)
-                if keys:
-                    button = keys[0]
-                    key_name, key_rt = button.name, button.rt
-                    is_correct = probe.get_press_correctness(key_name)
+                if probe_started:
+                    key_events = probe_keys.drain()
+                    if key_events:
+                        key_event = key_events[0]
+                        key_name, key_rt = key_event.name, probe_keys.reaction_time(key_event)
+                        is_correct = probe.get_press_correctness(key_name)
 
-                    data_saver.save_probe_practice(probe_name=probe_name,
-                                                   is_correct=is_correct,
-                                                   rt=key_rt,
-                                                   time_from_experiment_start=experiment_clock.getTime())
-                    probe.next_probe()
-                    break
+                        data_saver.save_probe_practice(probe_name=probe_name,
+                                                       is_correct=is_correct,
+                                                       rt=key_rt,
+                                                       time_from_experiment_start=experiment_clock.getTime())
+                        probe.next_probe()
+                        break
 
-            if not probe_started and tThisFlip >= PROBE_START - FRAME_TOLERANCE:
-                probe_started = True
-                win.callOnFlip(single_keyboard.clock.reset)  # t=0 on next screen flip
-                win.callOnFlip(single_keyboard.clearEvents,
-                               eventType='keyboard')  # clear events on next screen flip
+                if not probe_started and tThisFlip >= PROBE_START - FRAME_TOLERANCE:
+                    probe_started = True
+                    win.callOnFlip(probe_keys.mark_onset)  # t=0 on next screen flip
 
-            probe.draw(tThisFlip + FRAME_TOLERANCE)
+                probe.draw(tThisFlip + FRAME_TOLERANCE)
 
-            win.flip()
+                frame_telemetry.record_flip(win.flip())
 
-            if quit_keyboard.getKeys(keyList=QUIT_KEYS):
-                finish_experiment(window=win)
+                if quit_keyboard.getKeys(keyList=QUIT_KEYS):
+                    save_probe_blocks()
+                    finish_experiment(window=win, resources=session_resources)
 
 # ЭКСПЕРИМЕНТАЛЬНАЯ ЧАСТЬ
-for task_info, probe_info in experiment_sequence:
+for combination_idx in range(first_combination, len(experiment_sequence)):
+    task_info, probe_info = experiment_sequence[combination_idx]
     # Часть с инструкциями
     organisation_message.show()
     instruction.show(path=task_info.instruction)
@@ -249,39 +360,34 @@ for task_info, probe_info in experiment_sequence:
     # тренировка с задачами
     if not task_info.trained:
         data_saver.new_task(task_info.name, stage="task training")
+        frame_telemetry.new_block(stage="task training", task=task_info.name)
         training_task = training_tasks[task_info.name]
 
         change_mouse_visibility(mouse, task_info.name, training_task)
 
         training_task.new_task()
         while not training_task.is_task_finished():
-            previous_buttons_state = mouse.getPressed()
-            _timeToFirstFrame = win.getFutureFlipTime(clock="now")
-            win.callOnFlip(function=mouse.clickReset)  # TODO: попробовать сделать решения задачи ближе к реальному
-            task_solution_clock.reset(-_timeToFirstFrame)  # TODO: различается сохранение в столбец с экспериментальным
+            task_clicks.sync()  # клики между заданиями не считаются решением
+            win.callOnFlip(function=task_clicks.reset)  # TODO: попробовать сделать решения задачи ближе к реальному
             while True:
-                buttons_pressed, times = mouse.getPressed(getTime=True)
-
-                if buttons_pressed != previous_buttons_state:
-                    previous_buttons_state = buttons_pressed
-
-                    if buttons_pressed[0]:
-                        if training_task.is_valid_click():  # only first mouse press is used
-                            training_task.finish_trial()
-                            press_time = times[0]
-                            data_saver.save_task_practice(task_name=task_info.name,
-                                                          solution_time=task_solution_clock.getTime(),
-                                                          time_from_experiment_start=experiment_clock.getTime())
+                for click in task_clicks.poll():
+                    if click.is_press and training_task.is_valid_click(click):  # only first mouse press is used
+                        training_task.finish_trial()
+                        data_saver.save_task_practice(task_name=task_info.name,
+                                                      solution_time=click.time,
+                                                      polled_solution_time=click.polled_time,
+                                                      time_from_experiment_start=experiment_clock.getTime())
 
                 if training_task.is_trial_finished():
                     training_task.next_subtask()
                     break
 
                 training_task.draw(win.getFutureFlipTime(clock="now"))
-                win.flip()
+                frame_telemetry.record_flip(win.flip())
 
                 if quit_keyboard.getKeys(keyList=QUIT_KEYS):
-                    finish_experiment(window=win)
+                    save_probe_blocks()
+                    finish_experiment(window=win, resources=session_resources)
 
     organisation_message.show()
     instruction.show(path=probe_info.instruction)
@@ -290,6 +396,8 @@ for task_info, probe_info in experiment_sequence:
     # часть с экспериментальными заданиями
     data_saver.new_task(task_info.name, stage="experimental")
     data_saver.new_probe()
+    frame_telemetry.new_block(stage="experimental", task=task_info.name, probe=probe_info.name)
+    instruction.warm(experiment_sequence.instructions_of(combination_idx + 1))
 
     task = experimental_tasks[task_info.name]
     task_finished = False
@@ -301,13 +409,13 @@ for task_info, probe_info in experiment_sequence:
     # Подготовить позицию с зондами для задачи
     probe.position = EXPERIMENTAL_PROBE_POSITION[task_info.name]
 
-    previous_buttons_state = mouse.getPressed()
-    win.callOnFlip(function=mouse.clickReset)  # TODO: попробовать сделать решения задачи ближе к реальному
+    task_clicks.sync()  # клики между заданиями не считаются решением
+    win.callOnFlip(function=task_clicks.reset)  # TODO: попробовать сделать решения задачи ближе к реальному
     _timeToFirstFrame = win.getFutureFlipTime(clock="now")
-    task_solution_clock.reset(-_timeToFirstFrame)
     task.new_task()
     while not task_finished:
         probe_started = False
+        frame_telemetry.new_trial()
 
         trial_clock.reset(-_timeToFirstFrame)
         while True:
@@ -315,11 +423,10 @@ for task_info, probe_info in experiment_sequence:
 
             # probe code
             if probe_started:
-                keys = single_keyboard.getKeys(keyList=["right", "left"],
-                                               waitRelease=False)
-                if keys:
-                    button = keys[0]
-                    key_name, key_rt = button.name, button.rt
+                key_events = probe_keys.drain()
+                if key_events:
+                    key_event = key_events[0]
+                    key_name, key_rt = key_event.name, probe_keys.reaction_time(key_event)
                     is_correct = probe.get_press_correctness(key_name)
 
                     data_saver.save_experimental_probe_data(probe_name=probe_info.name,
@@ -331,24 +438,17 @@ for task_info, probe_info in experiment_sequence:
 
             if not probe_started and tThisFlip >= PROBE_START - FRAME_TOLERANCE:
                 probe_started = True
-                win.callOnFlip(single_keyboard.clock.reset)  # t=0 on next screen flip
-                win.callOnFlip(single_keyboard.clearEvents,
-                               eventType='keyboard')  # clear events on next screen flip
+                win.callOnFlip(probe_keys.mark_onset)  # t=0 on next screen flip
 
             probe.draw(tThisFlip + FRAME_TOLERANCE)
 
             # task code
-            buttons_pressed, times = mouse.getPressed(getTime=True)
-
-            if buttons_pressed != previous_buttons_state:
-                previous_buttons_state = buttons_pressed
-
-                if buttons_pressed[0]:
-                    if task.is_valid_click():  # only first mouse press is used
-                        task.finish_trial()
-                        press_time = times[0]
-                        data_saver.save_experimental_task_data(solution_time=task_solution_clock.getTime(),
-                                                               time_from_experiment_start=experiment_clock.getTime())
+            for click in task_clicks.poll():
+                if click.is_press and task.is_valid_click(click):  # only first mouse press is used
+                    task.finish_trial()
+                    data_saver.save_experimental_task_data(solution_time=click.time,
+                                                           polled_solution_time=click.polled_time,
+                                                           time_from_experiment_start=experiment_clock.getTime())
 
             if task.is_trial_finished():
                 task.next_subtask()
@@ -358,11 +458,24 @@ for task_info, probe_info in experiment_sequence:
                 break
 
             task.draw(win.getFutureFlipTime(clock="now"))
-            win.flip()
+            frame_telemetry.record_flip(win.flip())
 
             if quit_keyboard.getKeys(keyList=QUIT_KEYS):
-                finish_experiment(window=win)
+                save_probe_blocks()
+                finish_experiment(window=win, resources=session_resources)
+
+    session_checkpoint.save(dict(checkpoint.collect_state(checkpoint_components),
+                                 participant_info=session_participant_info,
+                                 next_combination=combination_idx + 1,
+                                 experiment_time=experiment_clock.getTime()))
+    save_probe_blocks()
 
 experiment_organization_stimuli.EndMessage(win, "audio/final_message_for_part_one.wav").show(5, experiment_clock)
 data_saver.close()
-finish_experiment(window=win)
+session_checkpoint.remove()
+save_probe_blocks()
+# карты Висконсинского теста сохраняются, чтобы сессию можно было повторить и проверить
+experimental_tasks["Переключение"].deck.save(f"{data_saver.file_name}_wisconsin_deck.npz")
+frame_telemetry.close()
+probe_keys.stop()
+finish_experiment(window=win, resources=session_resources)
@@ -5,7 +5,8 @@ import itertools
 from psychopy import core, event, visual
 from psychopy.hardware import keyboard
 
-from base import data_save, experiment_organization_logic, experiment_organization_stimuli, probe_views, task_views
+from base import data_save, experiment_organization_logic, experiment_organization_stimuli, input_events, probe_views, \
+    task_views
 
 MODE = "TEST"
 
@@ -295,7 +296,9 @@ for task_info, probe_info in experiment_sequence:
                     previous_buttons_state = buttons_pressed
 
                     if buttons_pressed[0]:
-                        if training_task.is_valid_click():  # only first mouse press is used
+                        click = input_events.ClickEvent(button=0, is_press=True, time=times[0], polled_time=times[0],
+                                                        pos=tuple(mouse.getPos()))
+                        if training_task.is_valid_click(click):  # only first mouse press is used
                             print("training: is_valid_click")
                             training_task.finish_trial()
                             press_time = times[0]
@@ -386,7 +389,9 @@ for task_info, probe_info in experiment_sequence:
                 previous_buttons_state = buttons_pressed
 
                 if buttons_pressed[0]:
-                    if task.is_valid_click():  # only first mouse press is used
+                    click = input_events.ClickEvent(button=0, is_press=True, time=times[0], polled_time=times[0],
+                                                    pos=tuple(mouse.getPos()))
+                    if task.is_valid_click(click):  # only first mouse press is used
                         print("experiment: is_valid_click")
                         task.finish_trial()
                         press_time = times[0]
@@ -1,11 +1,12 @@
 import collections
 import configparser
 import itertools
+from typing import Iterable
 
-from psychopy import core, event, visual
-from psychopy.hardware import keyboard
-
-from base import data_save, experiment_organization_logic, experiment_organization_stimuli, probe_views, task_views
+from base import checkpoint, condition_history, data_save, experiment_organization_logic, \
+    experiment_organization_stimuli, frame_timing, input_events, insight_planner, probe_presenters, probe_views, \
+    session_designs, session_rng, task_views, texture_cache
+from base.backend import core, event, keyboard, visual
 
 MODE = "EXPERIMENT"
 
@@ -15,43 +16,84 @@ SETTINGS_PARSER.read(SETTINGS_FP, encoding="UTF-8")
 SETTINGS = SETTINGS_PARSER[MODE]
 
 FULL_SCREEN = SETTINGS.getboolean("full_screen")
+# путь к контрольной точке прерванной сессии, пустой для новой сессии
+RESUME_CHECKPOINT_FP = SETTINGS.get("resume_checkpoint", fallback="")
+# зерно сессии для её воспроизведения, пустое для нового зерна
+SESSION_SEED = SETTINGS.get("session_seed", fallback="")
 
 FRAME_TOLERANCE = 0.001  # how close to onset before 'same' frame TODO: проверить что используется правильно
 PROBE_START = 0.1
+# одинаковые и разные зонды обновления показываются поровну и не больше четырёх ответов подряд,
+# те же настройки проверяет validate_probe_design.py
+UPDATE_PROBE_ANSWERS = probe_presenters.UPDATE_ANSWERS
 # EXPERIMENTAL_PROBE_POSITION = dict(Торможение=(0, -300), Обновление=(0, -209), Переключение=(0, -275))
 EXPERIMENTAL_PROBE_POSITION = (0, -300)
 PROBES_TRAINING_POSITION = (0, 0)
 INSIGHT_TASK_POSITION = (0, 100)
 
 QUIT_KEYS = ["escape"]
+PROBE_KEYS = ["right", "left"]
+# пропуск зонда во время инсайтной задачи
+SKIP_PROBE_KEY = "w"
 
 
-def finish_experiment(window: visual.Window):
+def finish_experiment(window: visual.Window, resources: Iterable = ()):
     """
     PsychoPy выдаёт ошибки при завершении скрипта, которые никак не мешают исполнению, но мешают отладке.
     Данный код попытка их игнорировать
+
+    :param resources: объекты с методом close, например кэши изображений с рабочими потоками
     """
     from contextlib import suppress
 
+    for resource in resources:
+        with suppress(Exception):
+            resource.close()
+
     with suppress(Exception):
         window.close()
         core.quit()
 
 
-info_dialog = experiment_organization_stimuli.ParticipantInfoLinker(
-    participants_info_fp='data/participants info.csv')
-if info_dialog.is_canceled:
-    core.quit()
-participant_info = info_dialog.filled_info
+if RESUME_CHECKPOINT_FP:
+    resumed_state = checkpoint.SessionCheckpoint(RESUME_CHECKPOINT_FP).load()
+    participant_info = dict(resumed_state["participant_info"])
+    resume_file_name = resumed_state["data_saver"]["file_name"]
+    session_seed = participant_info["session_seed"]
+else:
+    resumed_state = None
+    info_dialog = experiment_organization_stimuli.ParticipantInfoLinker(
+        participants_info_fp='data/participants info.csv')
+    if info_dialog.is_canceled:
+        core.quit()
+    participant_info = info_dialog.filled_info
+    resume_file_name = None
+    session_seed = SESSION_SEED
+# у каждого компонента свой поток случайных чисел из зерна сессии, зерно сохраняется в данных
+session_random = session_rng.SessionRNG(seed=int(session_seed) if session_seed else None)
+participant_info["session_seed"] = str(session_random.seed)
+# DataSaver изменяет информацию, а в контрольную точку сохраняется введённая
+session_participant_info = dict(participant_info)
 
 win = visual.Window(size=(1200, 800), color="white", units="pix", fullscr=FULL_SCREEN)
 data_saver = data_save.DataSaver(save_fp=f"data/insight/{participant_info['ФИО']}",
                                  experiment_part=data_save.ExperimentPart.INSIGHT,
-                                 participant_info=participant_info)
-instruction = experiment_organization_stimuli.InstructionImage(window=win, skip=False)
+                                 participant_info=participant_info,
+                                 streaming=True,
+                                 asynchronous=True,
+                                 save_columns=True,
+                                 resume_file_name=resume_file_name)
+session_checkpoint = checkpoint.SessionCheckpoint(f"{data_saver.file_name}_checkpoint.pickle")
+frame_telemetry = frame_timing.FrameTelemetry(save_fp=f"{data_saver.file_name}_frames.csv",
+                                              frame_period=win.monitorFramePeriod)
+instruction_textures = texture_cache.InstructionTextureCache()
+# закрываются при любом завершении эксперимента, в том числе по клавише выхода
+session_resources = [instruction_textures]
+instruction = experiment_organization_stimuli.InstructionImage(window=win, skip=False, textures=instruction_textures)
 organisation_message = experiment_organization_stimuli.GeneralInstructions(fp="images/Инструкции/Общие/Insight",
                                                                            window=win,
-                                                                           skip=False)
+                                                                           skip=False,
+                                                                           textures=instruction_textures)
 
 # Подготовка зондов для эксперимента
 probe_two_alternatives = probe_views.ProbeView(window=win,
@@ -60,7 +102,8 @@ probe_two_alternatives = probe_views.ProbeView(window=win,
                                                probe_type="TwoAlternatives",
                                                start_time=PROBE_START,
                                                image_path_dir="images/Выбор из 2 альтернатив/",
-                                               position=PROBES_TRAINING_POSITION)
+                                               position=PROBES_TRAINING_POSITION,
+                                               rng=session_random.stream("probe Выбор из 2 альтернатив"))
 
 probes_update = probe_views.ProbeView(window=win,
                                       probes=["1", "2", "3"],
@@ -68,7 +111,9 @@ probes_update = probe_views.ProbeView(window=win,
                                       probe_type="Update",
                                       start_time=PROBE_START,
                                       image_path_dir="images/Обновление/",
-                                      position=PROBES_TRAINING_POSITION)
+                                      position=PROBES_TRAINING_POSITION,
+                                      rng=session_random.stream("probe Обновление"),
+                                      **UPDATE_PROBE_ANSWERS)
 
 probe_switch = probe_views.ProbeView(window=win,
                                      probes=list("12345678"),
@@ -76,7 +121,8 @@ probe_switch = probe_views.ProbeView(window=win,
                                      probe_type="Switch",
                                      start_time=PROBE_START,
                                      image_path_dir="images/Переключение/",
-                                     position=PROBES_TRAINING_POSITION)
+                                     position=PROBES_TRAINING_POSITION,
+                                     rng=session_random.stream("probe Переключение"))
 
 inhibition_probes = ["".join(colorful_word) for colorful_word in itertools.product("RGBY", repeat=2)]
 inhibition_right_answers = dict(R="right", Y="right", G="left", B="left")
@@ -88,7 +134,8 @@ probe_inhibition = probe_views.ProbeView(window=win,
                                          probe_type="Inhibition",
                                          start_time=PROBE_START,
                                          image_path_dir="images/Торможение/",
-                                         position=PROBES_TRAINING_POSITION)
+                                         position=PROBES_TRAINING_POSITION,
+                                         rng=session_random.stream("probe Торможение"))
 
 all_probes = collections.OrderedDict((
     ("Выбор из 2 альтернатив", probe_two_alternatives),
@@ -104,7 +151,9 @@ experimental_probes = collections.OrderedDict((
 ))
 
 # Подготовка устройств ввода
-single_keyboard = keyboard.Keyboard()
+# ответы на зонды и пропуск зонда собираются в отдельном потоке, клавиатуру больше никто не опрашивает
+probe_keys = input_events.KeyboardEventQueue(key_list=PROBE_KEYS + [SKIP_PROBE_KEY])
+probe_keys.start()
 quit_keyboard = keyboard.Keyboard()
 mouse = event.Mouse(visible=False, win=win)
 
@@ -121,60 +170,117 @@ insight_task = task_views.InsightTask(window=win,
 training_probe_sequence = experiment_organization_logic.TrainingSequence(probes_sequence=tuple(all_probes),
                                                                          trials=50,
                                                                          )
-experiment_sequence = experiment_organization_logic.ExperimentInsightTaskSequence(id_column="ID",
-                                                                                  tasks_fp="text/insight tasks.csv",
-                                                                                  probes=tuple(experimental_probes),
-                                                                                  )
+# условия задач выбираются так, чтобы выровнять их количество у предыдущих испытуемых
+# при запуске читаются только итоги, файл сессии добавляется к ним в конце
+insight_condition_history = condition_history.ConditionHistory()
+# план зависит от предыдущих сессий, поэтому сохраняется с зерном, и воспроизведение зерна идёт по нему же
+insight_designs = session_designs.SessionDesigns(part=data_save.ExperimentPart.INSIGHT.value)
+try:
+    insight_design = insight_designs.find(session_random.seed)
+    if resumed_state is not None:
+        session_plan = insight_planner.SessionPlan(*resumed_state["sequence"]["plan"])
+    elif insight_design is not None:
+        session_plan = insight_planner.SessionPlan(**{name: tuple(value) for name, value in insight_design.items()})
+    else:
+        session_plan = None
+    # порядок зондов, задач и их условий составляется заранее и сохраняется рядом с данными,
+    # продолженная сессия идёт по плану из контрольной точки
+    experiment_sequence = experiment_organization_logic.ExperimentInsightTaskSequence(
+        id_column="ID",
+        tasks_fp="text/insight tasks.csv",
+        probes=tuple(experimental_probes),
+        plan=session_plan,
+        plan_fp=f"{data_saver.file_name}_plan.json",
+        history=insight_condition_history,
+        rng=session_random.generator("sequence"),
+    )
+    if insight_design is None:
+        insight_designs.record(session_random.seed, experiment_sequence.plan._asdict())
+finally:
+    insight_designs.close()
 
 trial_clock = core.Clock()
-task_solution_clock = core.Clock()
+# время нажатия берётся от мыши, а не от кадра, на котором нажатие было замечено
+task_clicks = input_events.MouseClickQueue(mouse=mouse)
 experiment_clock = core.Clock()
-# тренировка с зондами
-for probe_name, instruction_text, number_of_trials in training_probe_sequence:
-    data_saver.new_probe()
-    probe = all_probes[probe_name]
-
-    instruction.show(path=instruction_text)
-
-    for trial in number_of_trials:
-        # сейчас RT - от времени отрисовки зонда
-        probe_started = False
-
-        _timeToFirstFrame = win.getFutureFlipTime(clock="now")
-        trial_clock.reset(-_timeToFirstFrame)
-        while True:
-            tThisFlip = win.getFutureFlipTime(clock=trial_clock)
 
-            if probe_started:
-                keys = single_keyboard.getKeys(keyList=["right", "left"],
-                                               waitRelease=False)
-                if keys:
-                    button = keys[0]
-                    key_name, key_rt = button.name, button.rt
-                    is_correct = probe.get_press_correctness(key_name)
-
-                    data_saver.save_probe_practice(probe_name=probe_name,
-                                                   is_correct=is_correct,
-                                                   rt=key_rt,
-                                                   time_from_experiment_start=experiment_clock.getTime())
-                    probe.next_probe()
-                    break
+# состояние, которое сохраняется после каждой комбинации задачи и зонда
+checkpoint_components = dict(sequence=experiment_sequence,
+                             data_saver=data_saver,
+                             **{f"probe {name}": probe for name, probe in all_probes.items()})
 
-            if not probe_started and tThisFlip >= PROBE_START - FRAME_TOLERANCE:
-                probe_started = True
-                win.callOnFlip(single_keyboard.clock.reset)  # t=0 on next screen flip
-                win.callOnFlip(single_keyboard.clearEvents,
-                               eventType='keyboard')  # clear events on next screen flip
-
-            probe.draw(tThisFlip + FRAME_TOLERANCE)
-
-            win.flip()
 
-            if quit_keyboard.getKeys(keyList=QUIT_KEYS):
-                finish_experiment(window=win)
+def save_probe_blocks():
+    """
+    Блоки зондов сохраняются, чтобы была известна точная последовательность показанных стимулов.
+    Лог переписывается с каждой контрольной точкой и при выходе, поэтому он есть и у прерванной сессии
+    """
+    probe_presenters.save_block_log(f"{data_saver.file_name}_probe_blocks.csv", all_probes)
+
+
+first_combination = 0
+if resumed_state is not None:
+    # сессия продолжается со следующей после последней завершённой комбинации, тренировка не повторяется
+    checkpoint.restore_state(checkpoint_components, resumed_state)
+    first_combination = resumed_state["next_combination"]
+    experiment_clock.reset(-resumed_state["experiment_time"])
+    instruction.warm(experiment_sequence.instructions_of(first_combination))
+    organisation_message.warm()
+else:
+    # тренировка с зондами
+    instruction.warm([training_probe_sequence[0].instruction])
+    for probe_idx, (probe_name, instruction_text, number_of_trials) in enumerate(training_probe_sequence):
+        data_saver.new_probe()
+        frame_telemetry.new_block(stage="probe training", probe=probe_name)
+        probe = all_probes[probe_name]
+
+        instruction.show(path=instruction_text)
+        # следующая инструкция готовится, пока идёт тренировка
+        if probe_idx + 1 < len(training_probe_sequence):
+            instruction.warm([training_probe_sequence[probe_idx + 1].instruction])
+        else:
+            instruction.warm(experiment_sequence.instructions_of(0))
+            organisation_message.warm()
+
+        for trial in number_of_trials:
+            # сейчас RT - от времени отрисовки зонда
+            probe_started = False
+            frame_telemetry.new_trial()
+
+            _timeToFirstFrame = win.getFutureFlipTime(clock="now")
+            trial_clock.reset(-_timeToFirstFrame)
+            while True:
+                tThisFlip = win.getFutureFlipTime(clock=trial_clock)
+
+                if probe_started:
+                    key_events = [key_event for key_event in probe_keys.drain() if key_event.name in PROBE_KEYS]
+                    if key_events:
+                        key_event = key_events[0]
+                        key_name, key_rt = key_event.name, probe_keys.reaction_time(key_event)
+                        is_correct = probe.get_press_correctness(key_name)
+
+                        data_saver.save_probe_practice(probe_name=probe_name,
+                                                       is_correct=is_correct,
+                                                       rt=key_rt,
+                                                       time_from_experiment_start=experiment_clock.getTime())
+                        probe.next_probe()
+                        break
+
+                if not probe_started and tThisFlip >= PROBE_START - FRAME_TOLERANCE:
+                    probe_started = True
+                    win.callOnFlip(probe_keys.mark_onset)  # t=0 on next screen flip
+
+                probe.draw(tThisFlip + FRAME_TOLERANCE)
+
+                frame_telemetry.record_flip(win.flip())
+
+                if quit_keyboard.getKeys(keyList=QUIT_KEYS):
+                    save_probe_blocks()
+                    finish_experiment(window=win, resources=session_resources)
 
 # ЭКСПЕРИМЕНТАЛЬНАЯ ЧАСТЬ
-for task_info, probe_info in experiment_sequence:
+for combination_idx in range(first_combination, len(experiment_sequence)):
+    task_info, probe_info = experiment_sequence[combination_idx]
     # Часть с инструкциями
     instruction.show(path=probe_info.instruction)
     organisation_message.show()
@@ -182,6 +288,8 @@ for task_info, probe_info in experiment_sequence:
     # часть с экспериментальными заданиями
     data_saver.new_task(task_info.name, stage="experimental", task_type=task_info.type)
     data_saver.new_probe()
+    frame_telemetry.new_block(stage="experimental", task=task_info.name, probe=probe_info.name)
+    instruction.warm(experiment_sequence.instructions_of(combination_idx + 1))
 
     probe = experimental_probes[probe_info.name]
     probe.prepare_for_new_task()
@@ -189,68 +297,74 @@ for task_info, probe_info in experiment_sequence:
     # probe.position = EXPERIMENTAL_PROBE_POSITION[task_info.name]
     probe.position = EXPERIMENTAL_PROBE_POSITION
 
-    previous_buttons_state = mouse.getPressed()
-    win.callOnFlip(function=mouse.clickReset)  # TODO: попробовать сделать решения задачи ближе к реальному
+    task_clicks.sync()  # клики между заданиями не считаются решением
+    win.callOnFlip(function=task_clicks.reset)  # TODO: попробовать сделать решения задачи ближе к реальному
     _timeToFirstFrame = win.getFutureFlipTime(clock="now")
-    task_solution_clock.reset(-_timeToFirstFrame)
     insight_task.new_task(text=task_info.content)
     while not insight_task.is_task_finished():
         probe_started = False
+        frame_telemetry.new_trial()
 
         trial_clock.reset(-_timeToFirstFrame)
         while True:
             tThisFlip = win.getFutureFlipTime(clock=trial_clock)
 
             # probe code
-            if probe_started:
-                keys = single_keyboard.getKeys(keyList=["right", "left"],
-                                               waitRelease=False)
-                if keys:
-                    button = keys[0]
-                    key_name, key_rt = button.name, button.rt
-                    is_correct = probe.get_press_correctness(key_name)
-
-                    data_saver.save_experimental_probe_data(probe_name=probe_info.name,
-                                                            is_correct=is_correct,
-                                                            rt=key_rt,
-                                                            time_from_experiment_start=experiment_clock.getTime())
-                    probe.next_probe()
-                    break
+            # клавиша пропуска действует и до появления зонда, поэтому очередь разбирается на каждом кадре
+            key_events = probe_keys.drain()
+            probe_events = [key_event for key_event in key_events if key_event.name in PROBE_KEYS]
+            if probe_started and probe_events:
+                key_event = probe_events[0]
+                key_name, key_rt = key_event.name, probe_keys.reaction_time(key_event)
+                is_correct = probe.get_press_correctness(key_name)
+
+                data_saver.save_experimental_probe_data(probe_name=probe_info.name,
+                                                        is_correct=is_correct,
+                                                        rt=key_rt,
+                                                        time_from_experiment_start=experiment_clock.getTime())
+                probe.next_probe()
+                break
 
             if not probe_started and tThisFlip >= PROBE_START - FRAME_TOLERANCE:
                 probe_started = True
-                win.callOnFlip(single_keyboard.clock.reset)  # t=0 on next screen flip
-                win.callOnFlip(single_keyboard.clearEvents,
-                               eventType='keyboard')  # clear events on next screen flip
+                win.callOnFlip(probe_keys.mark_onset)  # t=0 on next screen flip
 
             probe.draw(tThisFlip + FRAME_TOLERANCE)
 
             # task code
-            buttons_pressed, times = mouse.getPressed(getTime=True)
-
-            if buttons_pressed != previous_buttons_state:
-                previous_buttons_state = buttons_pressed
-
-                if buttons_pressed[0]:
+            for click in task_clicks.poll():
+                if click.is_press and not insight_task.is_task_finished():
                     insight_task.finish_task()
-                    press_time = times[0]
-                    data_saver.save_experimental_task_data(solution_time=task_solution_clock.getTime(),
+                    data_saver.save_experimental_task_data(solution_time=click.time,
+                                                           polled_solution_time=click.polled_time,
                                                            time_from_experiment_start=experiment_clock.getTime())
 
             if insight_task.is_task_finished():
                 break
 
             insight_task.draw()
-            win.flip()
+            frame_telemetry.record_flip(win.flip())
 
             if quit_keyboard.getKeys(keyList=QUIT_KEYS):
-                finish_experiment(window=win)
+                save_probe_blocks()
+                finish_experiment(window=win, resources=session_resources)
 
-            keys = single_keyboard.getKeys(keyList=["w"])
-            if keys and keys[0] == "w":
+            if any(key_event.name == SKIP_PROBE_KEY for key_event in key_events):
                 task_finished = True
                 break
 
+    session_checkpoint.save(dict(checkpoint.collect_state(checkpoint_components),
+                                 participant_info=session_participant_info,
+                                 next_combination=combination_idx + 1,
+                                 experiment_time=experiment_clock.getTime()))
+    save_probe_blocks()
+
 experiment_organization_stimuli.EndMessage(win, "audio/final_message_for_part_two.wav").show(5, experiment_clock)
 data_saver.close()
-finish_experiment(window=win)
+insight_condition_history.add_session(f"{data_saver.file_name}.csv")
+insight_condition_history.save()
+session_checkpoint.remove()
+save_probe_blocks()
+frame_telemetry.close()
+probe_keys.stop()
+finish_experiment(window=win, resources=session_resources)
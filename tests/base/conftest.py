@@ -0,0 +1,37 @@
+import importlib
+import sys
+from types import ModuleType
+from typing import Callable
+
+import pytest
+
+import base
+
+
+@pytest.fixture
+def headless_backend(monkeypatch) -> Callable[[str], ModuleType]:
+    """
+    Backend is chosen on import, so module of base is imported again with headless backend.
+    Environment, imported modules and attributes of base package are restored after the test
+
+    :return: function importing module of base by its name
+    """
+    monkeypatch.setenv("PROBS_BACKEND", "headless")
+    modules = dict(sys.modules)
+    attributes = dict(vars(base))
+
+    def import_module(name: str) -> ModuleType:
+        for module_name in ("backend", name):
+            sys.modules.pop(f"base.{module_name}", None)
+            vars(base).pop(module_name, None)
+
+        return importlib.import_module(f"base.{name}")
+
+    yield import_module
+
+    for module_name in set(sys.modules) - set(modules):
+        del sys.modules[module_name]
+    sys.modules.update(modules)
+    for name in set(vars(base)) - set(attributes):
+        delattr(base, name)
+    vars(base).update(attributes)
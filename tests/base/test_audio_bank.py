@@ -0,0 +1,69 @@
+import wave
+
+import numpy as np
+import pytest
+
+from base import audio_bank
+
+
+class TestAudioBank:
+    SAMPLE_RATE = 44100
+
+    @staticmethod
+    def _write_wav(fp: str, samples: np.ndarray, sample_width: int, sample_rate: int, channels: int = 1) -> None:
+        with wave.open(fp, mode="wb") as wav_file:
+            wav_file.setnchannels(channels)
+            wav_file.setsampwidth(sample_width)
+            wav_file.setframerate(sample_rate)
+            wav_file.writeframes(samples.tobytes())
+
+    @pytest.fixture
+    def sounds_fp(self, tmpdir):
+        words = ("книга", "смысл", "фирма")
+        for frames, word in enumerate(words, start=1):
+            samples = np.full(frames * 100, 255, dtype=np.uint8)
+            self._write_wav(str(tmpdir.join(f"{word}.wav")), samples, sample_width=1, sample_rate=self.SAMPLE_RATE)
+
+        return tmpdir, words
+
+    def test_all_sounds_are_loaded(self, sounds_fp):
+        tmpdir, words = sounds_fp
+        bank = audio_bank.AudioBank(tmpdir.strpath)
+
+        assert all(word in bank for word in words), "AudioBank did not load all sounds"
+        assert bank.sample_rate == self.SAMPLE_RATE, f"AudioBank has wrong sample rate {bank.sample_rate}"
+        assert bank.resident_bytes == 4 * 100 * (1 + 2 + 3), f"AudioBank takes {bank.resident_bytes} bytes"
+
+    def test_samples_are_contiguous_floats(self, sounds_fp):
+        tmpdir, words = sounds_fp
+        bank = audio_bank.AudioBank(tmpdir.strpath)
+        samples = bank[words[0]]
+
+        assert samples.dtype == np.float32 and samples.flags["C_CONTIGUOUS"], "Samples are not contiguous float32"
+        assert np.all((samples >= -1) & (samples <= 1)), "Samples are not in range [-1, 1]"
+
+    def test_sixteen_bit_stereo_is_decoded(self, tmpdir):
+        fp = str(tmpdir.join("stereo.wav"))
+        samples = np.array([[-32768, 16384]] * 10, dtype=np.int16)
+        self._write_wav(fp, samples, sample_width=2, sample_rate=self.SAMPLE_RATE, channels=2)
+
+        decoded, _ = audio_bank.decode_wav(fp)
+
+        assert decoded.shape == (10, 2), f"Decoded stereo has wrong shape {decoded.shape}"
+        assert decoded[0].tolist() == [-1.0, 0.5], f"Samples decoded incorrectly {decoded[0]}"
+
+    def test_error_on_empty_directory(self, tmpdir):
+        with pytest.raises(ValueError, match="AudioBank did not find files"):
+            audio_bank.AudioBank(tmpdir.strpath)
+
+    def test_error_on_different_sample_rates(self, sounds_fp):
+        tmpdir, _ = sounds_fp
+        self._write_wav(str(tmpdir.join("другой.wav")), np.zeros(10, dtype=np.uint8),
+                        sample_width=1, sample_rate=self.SAMPLE_RATE // 2)
+
+        with pytest.raises(ValueError, match="must have the same sample rate"):
+            audio_bank.AudioBank(tmpdir.strpath)
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,233 @@
+import copy
+from pathlib import Path
+import pickle
+import random
+
+import numpy as np
+import pytest
+
+from base import checkpoint, columnar, data_records, data_writers, experiment_organization_logic, \
+    probe_presenters, task_presenters
+
+
+def finish_update_task(task: task_presenters.UpdateTask) -> list:
+    shown = []
+    task.new_task()
+    while True:
+        task.next_subtask()
+        if task.is_task_finished():
+            return shown
+        shown.append((task.example, task.word, task.is_answer_time()))
+
+
+def finish_wisconsin_test(test: task_presenters.WisconsinTest, deck: task_presenters.WisconsinDeck,
+                          deck_trial: int) -> list:
+    shown = []
+    test.new_task()
+    while not test.is_task_finished():
+        if test.is_first_trial_after_rule_change():
+            cards = deck.trial(deck_trial, previous_rule=test.previous_rule, current_rule=test.rule)
+        else:
+            cards = deck.trial(deck_trial)
+        deck_trial += 1
+
+        chosen_card = task_presenters.WisconsinCard(cards[random.randrange(4)].tolist())
+        shown.append((cards.tolist(), test.rule, test.is_correct(chosen_card, task_presenters.WisconsinCard(
+            cards[-1].tolist()))))
+        test.next_subtask()
+
+    return shown
+
+
+class TestSessionCheckpoint:
+    @pytest.fixture
+    def session_checkpoint(self, tmpdir) -> checkpoint.SessionCheckpoint:
+        return checkpoint.SessionCheckpoint(str(tmpdir.join("session_checkpoint.pickle")))
+
+    def test_state_is_loaded(self, session_checkpoint):
+        state = dict(next_combination=3, data=np.arange(5))
+        session_checkpoint.save(state)
+
+        loaded = session_checkpoint.load()
+        assert loaded["next_combination"] == 3, "Position of the session was not loaded"
+        np.testing.assert_array_equal(loaded["data"], state["data"], err_msg="Arrays were not loaded")
+        assert not Path(f"{session_checkpoint.fp}.tmp").exists(), "Temporary file was left"
+
+    def test_error_on_other_version(self, session_checkpoint):
+        with open(session_checkpoint.fp, mode="wb") as checkpoint_file:
+            pickle.dump(dict(version=checkpoint.CHECKPOINT_VERSION + 1, state={}), checkpoint_file)
+
+        with pytest.raises(ValueError):
+            session_checkpoint.load()
+
+    def test_removed_after_session(self, session_checkpoint):
+        session_checkpoint.save({})
+        session_checkpoint.remove()
+
+        assert not session_checkpoint.exists(), "Checkpoint of finished session was not removed"
+
+    def test_error_on_missing_component(self):
+        with pytest.raises(ValueError):
+            checkpoint.restore_state(dict(sequence=probe_presenters.Probe(["1", "2"], probe_type="Update")), {})
+
+
+class TestResumedComponents:
+    """
+    Component restored from the state must continue exactly as the component which state was taken
+    """
+
+    UPDATE_STIMULI_FP = "test_files/tables/test_tasks.csv"
+
+    def resume(self, component, components_factory):
+        components = dict(component=component)
+        state = copy.deepcopy(checkpoint.collect_state(components))
+
+        restored = dict(component=components_factory())
+        checkpoint.restore_state(restored, state)
+        return restored["component"]
+
+    def test_update_task(self):
+        def create():
+            return task_presenters.UpdateTask(stimuli_fp=self.UPDATE_STIMULI_FP, possible_sequences=(3, 4),
+                                              blocks_before_task_finished=2)
+
+        task = create()
+        finish_update_task(task)
+        restored = self.resume(task, create)
+
+        continued = finish_update_task(restored)
+        assert continued == finish_update_task(task), "Restored task shows other stimuli"
+        assert len(restored) == len(task), "Restored task has other number of stimuli"
+
+    def test_inhibition_task(self, tmpdir):
+        for number in range(20):
+            Path(tmpdir / f"file_{number}.png").touch()
+
+        def create():
+            return task_presenters.InhibitionTask(fp=tmpdir.strpath, trials_before_task_finished=3)
+
+        task = create()
+        task.new_task()
+        while not task.is_task_finished():
+            task.next_subtask()
+        restored = self.resume(task, create)
+
+        for created_task in (task, restored):
+            created_task.new_task()
+        shown = [(task.next_subtask(), restored.next_subtask()) for _ in range(3)]
+        assert all(original == continued for original, continued in shown), "Restored task shows other stimuli"
+
+    def test_wisconsin_test_and_deck(self):
+        def create():
+            return task_presenters.WisconsinTest(max_streak=2, max_trials=20, max_rules_changed=None), \
+                task_presenters.WisconsinDeck(trials=8)
+
+        test, deck = create()
+        finish_wisconsin_test(test, deck, deck_trial=0)
+        state = copy.deepcopy(dict(random=random.getstate(), test=test.get_state(), deck=deck.get_state()))
+
+        restored_test, restored_deck = create()
+        random.setstate(state["random"])
+        restored_test.set_state(state["test"])
+        restored_deck.set_state(state["deck"])
+        continued = finish_wisconsin_test(restored_test, restored_deck, deck_trial=20)
+
+        random.setstate(state["random"])
+        assert continued == finish_wisconsin_test(test, deck, deck_trial=20), \
+            "Restored test shows other cards or rules"
+
+    @pytest.mark.parametrize("probe_type, answers, settings", [("Update", None, {}),
+                                                               ("Update", None, dict(same_ratio=0.5, max_run=3)),
+                                                               ("Switch", ["right", "left"] * 4, {}),
+                                                               ("Inhibition", ["right"] * 4, {})])
+    def test_probe(self, probe_type, answers, settings):
+        probes = {"Update": ["1", "2", "3"], "Switch": list("12345678"), "Inhibition": ["RR", "RG", "GR", "GG"]}
+
+        def create():
+            return probe_presenters.Probe(probes[probe_type], answers, probe_type, block_size=8, **settings)
+
+        probe = create()
+        for _ in range(5):
+            probe.next_probe()
+        restored = self.resume(probe, create)
+
+        original, continued = [], []
+        for shown, shown_probe in ((original, probe), (continued, restored)):
+            for _ in range(20):
+                shown_probe.next_probe()
+                shown.append((shown_probe.get_probe_number(), shown_probe.get_press_correctness("right")))
+
+        assert continued == original, f"Restored {probe_type} probe shows other probes"
+
+    def test_wm_sequence(self):
+        def create():
+            return experiment_organization_logic.ExperimentWMSequence(
+                tasks=("Обновление", "Переключение", "Торможение"),
+                probes=("Обновление", "Переключение", "Торможение"),
+                task_instructions_path="../../text/task instructions.csv",
+                probe_instructions_path="../../text/probe instructions one.csv")
+
+        sequence = create()
+        for idx in range(4):
+            sequence[idx]
+        restored = self.resume(sequence, create)
+
+        def combinations(wm_sequence):
+            return [(task, probe.name) for task, probe in (wm_sequence[idx] for idx in range(4, len(wm_sequence)))]
+
+        assert combinations(restored) == combinations(sequence), "Restored sequence has other combinations"
+
+
+class TestResumedWriters:
+    SCHEMA = data_records.compile_schema("WM")
+
+    def write_rows(self, writer: data_writers.DataWriter, first: int, last: int) -> None:
+        for trial in range(first, last):
+            record = self.SCHEMA.new_record()
+            record.experiment_part = "WM"
+            record.probe = f"probe {trial}"
+            record.probe_trial = trial
+            writer.write_entry(record)
+
+    def test_csv_is_continued_from_the_state(self, tmpdir):
+        fp = str(tmpdir.join("session.csv"))
+        writer = data_writers.AsyncDataWriter(data_writers.StreamingCsvWriter(fp=fp, schema=self.SCHEMA,
+                                                                              extra_info={"ФИО": "Иванов"}))
+        self.write_rows(writer, 0, 10)
+        state = writer.get_state()
+        # rows of the combination interrupted by crash
+        self.write_rows(writer, 10, 15)
+        writer.close()
+
+        resumed = data_writers.StreamingCsvWriter(fp=fp, schema=self.SCHEMA, extra_info={"ФИО": "Иванов"},
+                                                  append=True)
+        resumed.set_state(state)
+        self.write_rows(resumed, 10, 20)
+        resumed.close()
+
+        with open(fp, mode="r", encoding="utf-8-sig") as csv_file:
+            lines = csv_file.read().splitlines()
+        assert len(lines) == 21, "Rows of interrupted combination were not dropped or header was repeated"
+        assert [line.split(",")[self.SCHEMA.names.index("probe_trial")] for line in lines[1:]] == \
+            [str(trial) for trial in range(20)], "Rows are not continued in order"
+
+    def test_columns_are_continued_from_the_state(self, tmpdir):
+        writer = columnar.ColumnarWriter(directory=str(tmpdir.join("columns")), schema=self.SCHEMA,
+                                         extra_info={}, chunk_size=4)
+        self.write_rows(writer, 0, 10)
+        state = writer.get_state()
+
+        resumed = columnar.ColumnarWriter(directory=str(tmpdir.join("columns")), schema=self.SCHEMA,
+                                          extra_info={}, chunk_size=4)
+        resumed.set_state(state)
+        self.write_rows(resumed, 10, 20)
+        resumed.close()
+
+        data = columnar.ColumnarData(str(tmpdir.join("columns")))
+        np.testing.assert_array_equal(data["probe_trial"], np.arange(20), err_msg="Columns are not continued")
+        assert list(data.decoded("probe")) == [f"probe {trial}" for trial in range(20)], \
+            "Categories are not continued"
+
+
+if __name__ == '__main__':
+    pytest.main()
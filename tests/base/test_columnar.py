@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from base import columnar, data_records
+
+
+class TestColumnarData:
+    SCHEMA = data_records.compile_schema("WM")
+    TRIALS = 2500
+    PROBES = ("Обновление", "Переключение", "Торможение")
+
+    @pytest.fixture
+    def columns_dir(self, tmpdir) -> str:
+        directory = str(tmpdir.join("test_columns"))
+        writer = columnar.ColumnarWriter(directory=directory, schema=self.SCHEMA, extra_info={"ФИО": "Иванов"},
+                                         chunk_size=1000)
+
+        for trial in range(self.TRIALS):
+            record = self.SCHEMA.new_record()
+            record.experiment_part = "WM"
+            record.stage = "experimental"
+            record.probe_trial = trial + 1
+            record.probe = self.PROBES[trial % len(self.PROBES)]
+            record.RT = trial / 1000
+            record.is_correct = trial % 2
+            writer.write_entry(record)
+        writer.close()
+
+        return directory
+
+    def test_columns_are_typed(self, columns_dir):
+        data = columnar.ColumnarData(columns_dir)
+
+        assert len(data) == self.TRIALS, f"Saved {len(data)} rows instead of {self.TRIALS}"
+        assert data["RT"].dtype == np.float64, f"RT saved as {data['RT'].dtype}"
+        assert data["is_correct"].dtype == np.int8, f"is_correct saved as {data['is_correct'].dtype}"
+        assert data["probe"].dtype == np.int16, f"probe is not dictionary encoded {data['probe'].dtype}"
+
+    def test_columns_are_memory_mapped(self, columns_dir):
+        assert isinstance(columnar.ColumnarData(columns_dir)["RT"], np.memmap), "Column is not memory mapped"
+
+    def test_values_are_restored(self, columns_dir):
+        data = columnar.ColumnarData(columns_dir)
+
+        assert np.array_equal(data["RT"], np.arange(self.TRIALS) / 1000), "RT values changed"
+        assert list(data.decoded("probe")[:3]) == list(self.PROBES), "Probe names changed"
+        assert data.extra_info == {"ФИО": "Иванов"}, "Participant info was not saved"
+
+        switch_rows = data["probe"] == data.code_of("probe", "Переключение")
+        assert switch_rows.sum() == self.TRIALS // 3, "Rows are not selected by code of the string"
+
+    def test_missing_values(self, columns_dir):
+        data = columnar.ColumnarData(columns_dir)
+
+        assert np.isnan(data["task_solution_time"]).all(), "Missing float is not NaN"
+        assert (data["task_trial"] == columnar.MISSING_CODE).all(), "Missing integer has wrong code"
+        assert (data.decoded("task") == "").all(), "Missing string is not empty"
+
+
+if __name__ == '__main__':
+    pytest.main()
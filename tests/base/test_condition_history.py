@@ -0,0 +1,127 @@
+import csv
+import os
+
+import numpy as np
+import pytest
+
+from base import condition_history, insight_planner
+
+
+def write_session(fp: str, conditions: dict) -> None:
+    with open(fp, mode="w", encoding="utf-8-sig", newline="") as csv_file:
+        csv_writer = csv.writer(csv_file)
+        csv_writer.writerow(["experiment_part", "stage", "task", "task_type", "probe"])
+        for task, condition in conditions.items():
+            # task is in rows of the task and of every probe trial, but it is given once
+            for probe_trial in range(3):
+                csv_writer.writerow(["Insight", "experimental", task, condition, "Обновление"])
+        csv_writer.writerow(["Insight", "probe training", "", "", "Обновление"])
+
+
+class TestConditionHistory:
+    @pytest.fixture
+    def data_dir(self, tmpdir) -> str:
+        data_dir = str(tmpdir.mkdir("insight"))
+        write_session(os.path.join(data_dir, "first.csv"), {"1": "Many", "2": "Few"})
+        write_session(os.path.join(data_dir, "second.csv"), {"1": "Many", "2": "Many"})
+        # frames are not participant data
+        write_session(os.path.join(data_dir, "second_frames.csv"), {"1": "Few"})
+        write_session(os.path.join(data_dir, "second_probe_blocks.csv"), {"1": "Few"})
+        return data_dir
+
+    def create(self, data_dir: str) -> condition_history.ConditionHistory:
+        return condition_history.ConditionHistory(fp=os.path.join(data_dir, "history.json"), data_dir=data_dir)
+
+    def test_conditions_are_counted(self, data_dir):
+        history = self.create(data_dir)
+        history.update()
+
+        assert history.counts("1") == {"Many": 2}, f"Wrong counts of task 1: {history.counts('1')}"
+        assert history.counts("2") == {"Many": 1, "Few": 1}, f"Wrong counts of task 2: {history.counts('2')}"
+
+    def test_only_new_and_changed_files_are_parsed(self, data_dir):
+        history = self.create(data_dir)
+        history.update()
+        history.save()
+
+        history = self.create(data_dir)
+        assert history.counts("1") == {"Many": 2}, "Counts were not loaded from the index"
+
+        write_session(os.path.join(data_dir, "third.csv"), {"1": "Few"})
+        write_session(os.path.join(data_dir, "second.csv"), {"1": "Few", "2": "Many"})
+        os.remove(os.path.join(data_dir, "first.csv"))
+        history.update()
+
+        assert history.parsed_files == 2, f"Parsed {history.parsed_files} files instead of new and changed ones"
+        assert history.counts("1") == {"Many": 0, "Few": 2}, f"Wrong counts of task 1: {history.counts('1')}"
+        assert history.counts("2") == {"Many": 1, "Few": 0}, f"Wrong counts of task 2: {history.counts('2')}"
+
+    def test_startup_reads_only_totals(self, data_dir):
+        history = self.create(data_dir)
+        history.update()
+        history.save()
+
+        with open(os.path.join(data_dir, "history_files.json"), mode="w", encoding="UTF-8") as index_file:
+            index_file.write("not read on startup")
+
+        assert self.create(data_dir).counts("2") == {"Many": 1, "Few": 1}, "Totals were not loaded"
+
+    def test_missing_index_counts_files_again(self, data_dir):
+        history = self.create(data_dir)
+        history.update()
+        history.save()
+        os.remove(os.path.join(data_dir, "history_files.json"))
+
+        history = self.create(data_dir)
+        history.update()
+
+        assert history.counts("1") == {"Many": 2}, f"Files were counted twice: {history.counts('1')}"
+
+    def test_session_adds_only_its_file(self, data_dir):
+        history = self.create(data_dir)
+        history.update()
+        history.save()
+
+        history = self.create(data_dir)
+        write_session(os.path.join(data_dir, "third.csv"), {"1": "Few"})
+        write_session(os.path.join(data_dir, "other_station.csv"), {"1": "Few"})
+        history.add_session(os.path.join(data_dir, "third.csv"))
+
+        assert history.parsed_files == 1, f"Parsed {history.parsed_files} files instead of the file of the session"
+        assert history.counts("1") == {"Many": 2, "Few": 1}, f"Wrong counts of task 1: {history.counts('1')}"
+
+        history.add_session(os.path.join(data_dir, "third.csv"))
+        assert history.parsed_files == 1, "Unchanged file of the session was parsed again"
+
+    def test_session_without_index_counts_all_files(self, data_dir):
+        history = self.create(data_dir)
+        write_session(os.path.join(data_dir, "third.csv"), {"1": "Few"})
+        history.add_session(os.path.join(data_dir, "third.csv"))
+
+        assert history.counts("1") == {"Many": 2, "Few": 1}, f"Wrong counts of task 1: {history.counts('1')}"
+
+    def test_weights_even_out_conditions(self, data_dir):
+        history = self.create(data_dir)
+        history.update()
+
+        weights = history.weights(tasks=("1", "2", "3"), conditions=("Many", "Few"))
+        assert weights[0, 1] > weights[0, 0], "Condition given less often must have larger weight"
+        np.testing.assert_allclose(weights[1:], 0.5, err_msg="Equal counts must give equal weights")
+
+    def test_plans_follow_weights(self):
+        tasks = tuple(str(task) for task in range(12))
+        planner = insight_planner.InsightSessionPlanner(tasks=tasks, conditions=("Many", "Few"),
+                                                        probes=("Обновление", "Переключение", "Торможение"))
+        weights = np.tile([0.5, 0.5], (len(tasks), 1))
+        weights[0] = [0.9, 0.1]
+
+        rng = np.random.default_rng(0)
+        plans = [planner.plan(rng=rng, condition_weights=weights, candidates=500) for _ in range(200)]
+
+        assert all(planner.validate(plan) == [] for plan in plans), "Weighted plans are not balanced"
+        many = sum(plan.conditions[plan.tasks.index("0")] == "Many" for plan in plans) / len(plans)
+        assert many > 0.8, f"Task with large weight of Many was given in Many in {many:.0%} of plans"
+
+
+if __name__ == '__main__':
+    pytest.main()
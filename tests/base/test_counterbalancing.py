@@ -0,0 +1,90 @@
+from collections import Counter
+import threading
+
+import pytest
+
+from base import counterbalancing, experiment_organization_logic
+
+TASKS = ("Обновление", "Переключение", "Торможение")
+PROBES = ("Обновление", "Переключение", "Торможение")
+
+
+class TestWilliamsDesign:
+    @pytest.mark.parametrize("items", list(range(1, 11)))
+    def test_design_is_balanced(self, items):
+        rows = counterbalancing.williams_design(items)
+
+        expected_rows = items if items % 2 == 0 else 2 * items
+        assert rows.shape == (expected_rows, items), f"Wrong shape of design {rows.shape}"
+        assert counterbalancing.is_balanced(rows), f"Design of {items} items is not balanced:\n{rows}"
+
+    def test_unbalanced_design_is_found(self):
+        assert not counterbalancing.is_balanced(counterbalancing.williams_design(9)[:9]), \
+            "Half of design for odd number of items can not be balanced"
+
+
+class TestCounterbalancingAllocator:
+    @pytest.fixture
+    def allocator_settings(self, tmpdir) -> dict:
+        combinations = experiment_organization_logic.ExperimentWMSequence.combinations(TASKS, PROBES)
+        return dict(design_key=counterbalancing.design_key(combinations),
+                    rows=counterbalancing.williams_design(len(combinations)),
+                    fp=str(tmpdir.join("participants.sqlite3")))
+
+    def test_rows_are_given_in_turn(self, allocator_settings):
+        allocator = counterbalancing.CounterbalancingAllocator(**allocator_settings)
+        orders = [allocator.allocate(session=f"Участник {idx}") for idx in range(36)]
+
+        assert Counter(allocator.allocations()) == {row: 2 for row in range(18)}, \
+            "Rows of design are not used equally often"
+        assert orders[:18] == allocator.rows.tolist(), "Rows are not given in order"
+
+    def test_restarted_session_gets_the_same_row(self, allocator_settings):
+        allocator = counterbalancing.CounterbalancingAllocator(**allocator_settings)
+        order = allocator.allocate(session="Участник")
+        allocator.allocate(session="Другой участник")
+        allocator.close()
+
+        allocator = counterbalancing.CounterbalancingAllocator(**allocator_settings)
+        assert allocator.allocate(session="Участник") == order, "Restarted session got other row"
+        assert len(allocator.allocations()) == 2, "Restarted session was allocated twice"
+
+    def test_several_stations_allocate_at_once(self, allocator_settings):
+        def station(station_idx: int):
+            allocator = counterbalancing.CounterbalancingAllocator(**allocator_settings)
+            for idx in range(9):
+                allocator.allocate(session=f"Станция {station_idx} участник {idx}")
+            allocator.close()
+
+        stations = [threading.Thread(target=station, args=(station_idx,)) for station_idx in range(4)]
+        for thread in stations:
+            thread.start()
+        for thread in stations:
+            thread.join()
+
+        allocator = counterbalancing.CounterbalancingAllocator(**allocator_settings)
+        assert Counter(allocator.allocations()) == {row: 2 for row in range(18)}, \
+            "Stations allocated the same rows"
+
+    def test_sequence_follows_allocated_order(self, allocator_settings):
+        allocator = counterbalancing.CounterbalancingAllocator(**allocator_settings)
+        order = allocator.allocate(session="Участник")
+        sequence = experiment_organization_logic.ExperimentWMSequence(
+            tasks=TASKS, probes=PROBES, order=order,
+            task_instructions_path="../../text/task instructions.csv",
+            probe_instructions_path="../../text/probe instructions one.csv")
+
+        combinations = experiment_organization_logic.ExperimentWMSequence.combinations(TASKS, PROBES)
+        assert [(task.name, probe.name) for task, probe in sequence] == [combinations[idx] for idx in order], \
+            "Sequence does not follow the order"
+
+    def test_error_on_wrong_order(self):
+        with pytest.raises(ValueError):
+            experiment_organization_logic.ExperimentWMSequence(
+                tasks=TASKS, probes=PROBES, order=[0] * 9,
+                task_instructions_path="../../text/task instructions.csv",
+                probe_instructions_path="../../text/probe instructions one.csv")
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,89 @@
+import csv
+import os
+
+import pytest
+
+from base import data_aggregation, participant_registry
+
+
+def write_session(fp: str, rows: int, experiment_part: str) -> None:
+    with open(fp, mode="w", encoding="utf-8-sig", newline="") as csv_file:
+        csv_writer = csv.writer(csv_file)
+        csv_writer.writerow(["experiment_part", "RT", "is_correct"])
+        for idx in range(rows):
+            csv_writer.writerow([experiment_part, 0.5 + idx, idx % 2])
+
+
+class TestDatasetAggregator:
+    @pytest.fixture
+    def data_dir(self, tmpdir) -> str:
+        data_dir = str(tmpdir.mkdir("data"))
+        os.makedirs(os.path.join(data_dir, "WM"))
+        os.makedirs(os.path.join(data_dir, "insight"))
+
+        legacy_csv_fp = os.path.join(data_dir, "participants info.csv")
+        with open(legacy_csv_fp, mode="w", encoding="UTF-8", newline="") as csv_file:
+            csv_writer = csv.writer(csv_file)
+            csv_writer.writerow(participant_registry.CSV_HEADER)
+            for idx in range(4):
+                insight_name = f"Участник {idx}_insight.csv" if idx % 2 else ""
+                csv_writer.writerow([f"Участник {idx} 20 Ж", f"Участник {idx}_wm.csv", insight_name])
+                write_session(os.path.join(data_dir, "WM", f"Участник {idx}_wm.csv"), rows=3, experiment_part="WM")
+                if insight_name:
+                    write_session(os.path.join(data_dir, "insight", insight_name), rows=2, experiment_part="Insight")
+
+        return data_dir
+
+    def make_aggregator(self, data_dir: str) -> data_aggregation.DatasetAggregator:
+        return data_aggregation.DatasetAggregator(
+            data_dir=data_dir,
+            output_dir=os.path.join(data_dir, "aggregated"),
+            registry_fp=os.path.join(data_dir, "participants.sqlite3"),
+            legacy_csv_fp=os.path.join(data_dir, "participants info.csv"),
+            workers=2)
+
+    def read_combined(self, data_dir: str):
+        combined_fp = os.path.join(data_dir, "aggregated", data_aggregation.COMBINED_FILE)
+        with open(combined_fp, mode="r", encoding="utf-8-sig", newline="") as csv_file:
+            return list(csv.DictReader(csv_file))
+
+    def test_sessions_are_linked(self, data_dir):
+        report = self.make_aggregator(data_dir).run()
+
+        assert report.parsed == 6, "Not all session files were parsed"
+        assert report.rows == 4 * 3 + 2 * 2, "Combined dataset does not have all rows"
+
+        rows = self.read_combined(data_dir)
+        insight_rows = [row for row in rows if row["experiment_part"] == "Insight"]
+        assert {row["participant"] for row in insight_rows} == {"Участник 1 20 Ж", "Участник 3 20 Ж"}, \
+            "Insight rows are linked to wrong participants"
+        assert all(row["WM_name"] == row["participant"].replace(" 20 Ж", "_wm.csv") for row in rows), \
+            "WM file is not linked to participant"
+
+    def test_only_changed_sessions_are_parsed_again(self, data_dir):
+        self.make_aggregator(data_dir).run()
+
+        report = self.make_aggregator(data_dir).run()
+        assert (report.parsed, report.reused) == (0, 6), "Unchanged sessions were parsed again"
+
+        changed_fp = os.path.join(data_dir, "WM", "Участник 0_wm.csv")
+        write_session(changed_fp, rows=5, experiment_part="WM")
+        touched_fp = os.path.join(data_dir, "WM", "Участник 2_wm.csv")
+        os.utime(touched_fp, (1, 1))
+
+        report = self.make_aggregator(data_dir).run()
+        assert (report.parsed, report.reused) == (1, 5), "Only the changed session must be parsed, not touched one"
+        assert report.rows == 5 + 3 * 3 + 2 * 2, "Changed session rows were not updated"
+        assert len(self.read_combined(data_dir)) == report.rows, "Combined file does not match the report"
+
+    def test_missing_session_is_reported(self, data_dir):
+        os.remove(os.path.join(data_dir, "insight", "Участник 3_insight.csv"))
+
+        report = self.make_aggregator(data_dir).run()
+
+        assert report.missing == [os.path.join("insight", "Участник 3_insight.csv")], "Missing file is not reported"
+        assert report.rows == 4 * 3 + 2, "Rows of present files were not combined"
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,45 @@
+import pytest
+
+from base import data_records
+
+
+class TestRecordSchema:
+    WM_COLUMNS = ("experiment_part", "stage", "combination_number", "task", "task_trial", "task_solution_time",
+                  "task_solution_polled_time", "probe_trial", "probe", "RT", "is_correct",
+                  "time_from_experiment_start")
+    INSIGHT_COLUMNS = ("experiment_part", "stage", "task", "task_type", "task_solution_time",
+                       "task_solution_polled_time", "probe_trial", "probe", "RT", "is_correct",
+                       "time_from_experiment_start")
+
+    @pytest.mark.parametrize("experiment_part, columns", [("WM", WM_COLUMNS), ("Insight", INSIGHT_COLUMNS)])
+    def test_columns_of_experiment_part(self, experiment_part, columns):
+        schema = data_records.compile_schema(experiment_part)
+
+        assert schema.names == columns, f"{experiment_part} has wrong columns {schema.names}"
+
+    def test_schema_is_compiled_once(self):
+        assert data_records.compile_schema("WM") is data_records.compile_schema("WM"), "Schema was compiled again"
+
+    def test_record_values_are_in_column_order(self):
+        schema = data_records.compile_schema("Insight")
+        record = schema.new_record()
+        record.RT = 0.5
+        record.task_type = "Many"
+
+        values = dict(zip(schema.names, record))
+        assert values["RT"] == 0.5 and values["task_type"] == "Many", f"Record has wrong values {values}"
+        assert sum(value is not None for value in record) == 2, "Not set fields are not None"
+
+    def test_record_has_only_schema_fields(self):
+        record = data_records.compile_schema("Insight").new_record()
+
+        with pytest.raises(AttributeError):
+            record.task_trial = 1
+
+    def test_error_on_unknown_experiment_part(self):
+        with pytest.raises(ValueError, match="experiment_part must be one of"):
+            data_records.compile_schema("Memory")
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,126 @@
+import csv
+import threading
+
+import pytest
+
+from base import data_records, data_writers
+
+
+class TestStreamingCsvWriter:
+    SCHEMA = data_records.compile_schema("WM")
+    EXTRA_INFO = {"ФИО": "Иванов", "filename_info": "data/WM/Иванов"}
+
+    @pytest.fixture
+    def data_fp(self, tmpdir) -> str:
+        return str(tmpdir.join("test.csv"))
+
+    @staticmethod
+    def _read_rows(fp):
+        with open(fp, mode="r", encoding="utf-8-sig") as fin:
+            return list(csv.DictReader(fin))
+
+    def _entry(self, trial):
+        record = self.SCHEMA.new_record()
+        record.stage = "probe training"
+        record.probe = "Update"
+        record.RT = trial / 10
+        record.is_correct = trial % 2
+        return record
+
+    def test_rows_are_on_disk_before_close(self, data_fp):
+        flush_every = 5
+        writer = data_writers.StreamingCsvWriter(fp=data_fp, schema=self.SCHEMA, extra_info=self.EXTRA_INFO,
+                                                 flush_every=flush_every, flush_interval=60)
+
+        for trial in range(flush_every * 2 + 1):
+            writer.write_entry(self._entry(trial))
+
+        rows = self._read_rows(data_fp)
+        assert len(rows) == flush_every * 2, f"{len(rows)} rows were flushed instead of {flush_every * 2}"
+
+        writer.close()
+        assert len(self._read_rows(data_fp)) == flush_every * 2 + 1, "Not all rows were saved on close"
+
+    def test_rows_have_psychopy_layout(self, data_fp):
+        writer = data_writers.StreamingCsvWriter(fp=data_fp, schema=self.SCHEMA, extra_info=self.EXTRA_INFO)
+        record = self.SCHEMA.new_record()
+        record.stage = "experimental"
+        record.probe = "Switch"
+        writer.write_entry(record)
+        writer.close()
+
+        rows = self._read_rows(data_fp)
+        assert list(rows[0]) == list(self.SCHEMA.names) + list(self.EXTRA_INFO), f"Wrong header {list(rows[0])}"
+        assert rows[0]["RT"] == "" and rows[0]["is_correct"] == "", "Missing values were not saved as empty"
+        assert rows[0]["ФИО"] == "Иванов", "Participant info was not saved in the row"
+
+    def test_close_twice(self, data_fp):
+        writer = data_writers.StreamingCsvWriter(fp=data_fp, schema=self.SCHEMA, extra_info=self.EXTRA_INFO)
+        writer.close()
+        writer.close()
+
+    def test_error_on_not_positive_flush(self, data_fp):
+        with pytest.raises(ValueError, match="flush_every must be positive"):
+            data_writers.StreamingCsvWriter(fp=data_fp, schema=self.SCHEMA, extra_info=self.EXTRA_INFO,
+                                            flush_every=0)
+
+
+
+class ListWriter(data_writers.DataWriter):
+    def __init__(self, gate: threading.Event = None, error_on: int = None):
+        self.entries = []
+        self.closed = False
+        self._gate = gate
+        self._error_on = error_on
+
+    def write_entry(self, entry):
+        if self._gate is not None:
+            self._gate.wait()
+        if self._error_on is not None and len(self.entries) == self._error_on:
+            raise OSError("disk is full")
+        self.entries.append(entry)
+
+    def close(self):
+        self.closed = True
+
+
+class TestAsyncDataWriter:
+    def test_all_entries_are_written_in_order_on_close(self):
+        writer = ListWriter()
+        async_writer = data_writers.AsyncDataWriter(writer, max_queue_size=4)
+
+        for trial in range(100):
+            async_writer.write_entry({"probe_trial": trial})
+        async_writer.close()
+
+        assert [entry["probe_trial"] for entry in writer.entries] == list(range(100)), "Entries were lost or mixed"
+        assert writer.closed, "Wrapped writer was not closed"
+        assert async_writer.written == 100 and async_writer.queue_depth == 0, "Queue was not drained"
+
+    def test_full_queue_waits_for_writer(self):
+        gate = threading.Event()
+        writer = ListWriter(gate=gate)
+        async_writer = data_writers.AsyncDataWriter(writer, max_queue_size=2)
+
+        threading.Timer(0.05, gate.set).start()
+        for trial in range(5):
+            async_writer.write_entry({"probe_trial": trial})
+        async_writer.close()
+
+        assert async_writer.backpressure_waits > 0, "Full queue did not wait for writer"
+        assert async_writer.max_queue_depth <= 2, f"Queue grew to {async_writer.max_queue_depth}"
+        assert len(writer.entries) == 5, "Entries were dropped on full queue"
+
+    def test_writer_error_is_raised(self):
+        async_writer = data_writers.AsyncDataWriter(ListWriter(error_on=1), max_queue_size=1)
+
+        with pytest.raises(RuntimeError, match="failed to write data"):
+            for trial in range(10):
+                async_writer.write_entry({"probe_trial": trial})
+
+        with pytest.raises(RuntimeError, match="failed to write data"):
+            async_writer.close()
+
+
+if __name__ == '__main__':
+    pytest.main()
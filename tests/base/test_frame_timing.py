@@ -0,0 +1,92 @@
+import csv
+from pathlib import Path
+import subprocess
+import sys
+
+import pytest
+
+from base import frame_timing
+
+
+class TestFrameTelemetry:
+    FRAME_PERIOD = 1 / 60
+
+    @pytest.fixture
+    def telemetry_fp(self, tmpdir) -> str:
+        return str(tmpdir.join("test_frames.csv"))
+
+    @staticmethod
+    def _read_rows(fp):
+        with open(fp, mode="r", encoding="UTF-8") as fin:
+            return list(csv.DictReader(fin))
+
+    def test_every_flip_is_saved_after_buffer_wraps(self, telemetry_fp):
+        capacity = 8
+        flips = capacity * 3 + 5
+        telemetry = frame_timing.FrameTelemetry(save_fp=telemetry_fp, frame_period=self.FRAME_PERIOD,
+                                                capacity=capacity)
+        telemetry.new_block(stage="probe training", probe="Обновление")
+
+        for frame in range(flips):
+            telemetry.record_flip(frame * self.FRAME_PERIOD)
+        telemetry.close()
+
+        rows = self._read_rows(telemetry_fp)
+        assert len(rows) == flips, f"FrameTelemetry saved {len(rows)} flips instead of {flips}"
+
+        saved_times = [float(row["flip_time"]) for row in rows]
+        assert saved_times == sorted(saved_times), "FrameTelemetry saved flips in wrong order"
+
+    def test_flips_of_aborted_session_are_saved_on_exit(self, telemetry_fp):
+        # session ended by escape quits interpreter without close
+        code = ("import sys; from base import frame_timing\n"
+                f"telemetry = frame_timing.FrameTelemetry(save_fp={telemetry_fp!r}, frame_period=1 / 60)\n"
+                "telemetry.new_block(stage='experimental')\n"
+                "for frame in range(10): telemetry.record_flip(frame / 60)\n"
+                "sys.exit(0)")
+        subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).resolve().parents[2], check=True)
+
+        assert len(self._read_rows(telemetry_fp)) == 10, "Flips of aborted session were lost"
+
+    def test_dropped_frames_are_counted(self, telemetry_fp):
+        telemetry = frame_timing.FrameTelemetry(save_fp=telemetry_fp, frame_period=self.FRAME_PERIOD)
+        telemetry.new_block(stage="experimental", task="Торможение", probe="Переключение")
+
+        flip_time = 0
+        for frames_to_next_flip in (1, 1, 3, 1, 2):
+            flip_time += frames_to_next_flip * self.FRAME_PERIOD
+            telemetry.record_flip(flip_time)
+
+        assert telemetry.dropped_frames == 3, f"Expected 3 dropped frames, but got {telemetry.dropped_frames}"
+
+    def test_rows_are_keyed_by_block_and_trial(self, telemetry_fp):
+        telemetry = frame_timing.FrameTelemetry(save_fp=telemetry_fp, frame_period=self.FRAME_PERIOD)
+        telemetry.new_block(stage="experimental", task="Обновление", probe="Торможение")
+
+        flip_time = 0
+        for _ in range(2):
+            telemetry.new_trial()
+            for _ in range(3):
+                telemetry.record_flip(flip_time)
+                flip_time += self.FRAME_PERIOD
+        telemetry.close()
+
+        rows = self._read_rows(telemetry_fp)
+        trials = [int(row["probe_trial"]) for row in rows]
+        assert trials == [1, 1, 1, 2, 2, 2], f"Flips has wrong probe trials {trials}"
+        assert all(row["stage"] == "experimental" and row["task"] == "Обновление" and row["probe"] == "Торможение"
+                   for row in rows), "Flips has wrong block info"
+
+    def test_first_flip_of_block_is_not_dropped(self, telemetry_fp):
+        telemetry = frame_timing.FrameTelemetry(save_fp=telemetry_fp, frame_period=self.FRAME_PERIOD)
+        telemetry.new_block(stage="probe training")
+        telemetry.record_flip(0)
+        # instruction was shown between blocks
+        telemetry.new_block(stage="experimental")
+        telemetry.record_flip(60)
+
+        assert telemetry.dropped_frames == 0, "Time between blocks was considered as dropped frames"
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,130 @@
+import os
+from pathlib import Path
+import subprocess
+import sys
+import time
+
+import pytest
+
+from base.headless import core, data, event, keyboard, sound, visual
+
+
+class TestHeadlessWindow:
+    @pytest.fixture
+    def window(self) -> visual.Window:
+        return visual.Window(size=(1200, 800), frame_rate=60)
+
+    def test_flip_advances_virtual_time_by_frame(self, window):
+        frames = 30
+        start = core.getTime()
+
+        for _ in range(frames):
+            window.flip()
+
+        passed = core.getTime() - start
+        assert passed == pytest.approx(frames / 60), f"{frames} flips took {passed} of virtual time"
+
+    def test_call_on_flip_is_called_once_at_flip_time(self, window):
+        calls = []
+        window.callOnFlip(lambda: calls.append(core.getTime()))
+
+        assert not calls, "Function was called before flip"
+
+        flip_time = window.flip()
+        window.flip()
+
+        assert calls == [flip_time], f"Function must be called once on flip at {flip_time}, but was {calls}"
+
+    def test_future_flip_time_on_clock(self, window):
+        window.flip()
+        clock = core.Clock()
+
+        future_flip_time = window.getFutureFlipTime(clock=clock)
+        window.flip()
+
+        assert clock.getTime() == pytest.approx(future_flip_time), "Flip happened not at predicted time"
+
+    def test_countdown_timer_ends_after_its_time(self, window):
+        timer = core.CountdownTimer(start=0.5)
+
+        flips = 0
+        while timer.getTime() > 0:
+            window.flip()
+            flips += 1
+
+        assert flips == 30, f"Half second countdown ended after {flips} flips"
+
+
+class TestHeadlessParticipant:
+    @pytest.fixture
+    def window(self) -> visual.Window:
+        return visual.Window(size=(1200, 800), frame_rate=60)
+
+    def test_keyboard_presses_only_response_keys(self, window):
+        participant_keyboard = keyboard.Keyboard()
+
+        for _ in range(120):
+            window.flip()
+            assert not participant_keyboard.getKeys(keyList=["escape"]), "Simulated participant quited experiment"
+
+    def test_keyboard_rt_is_measured_from_clock_reset(self, window):
+        participant_keyboard = keyboard.Keyboard()
+        window.callOnFlip(participant_keyboard.clock.reset)
+        window.callOnFlip(participant_keyboard.clearEvents)
+        window.flip()
+
+        keys = []
+        while not keys:
+            window.flip()
+            keys = participant_keyboard.getKeys(keyList=["right", "left"])
+
+        rt = keys[0].rt
+        low, high = keyboard.Keyboard.response_time
+        assert low <= rt <= high, f"RT {rt} is out of simulated response time [{low}, {high}]"
+        assert keys[0] in ("right", "left"), f"Wrong key was pressed {keys[0]}"
+
+    def test_mouse_clicks_drawn_shape(self, window):
+        card = visual.Rect(window, width=100, height=150, pos=(200, -100))
+        mouse = event.Mouse(win=window)
+
+        is_pressed_in = False
+        for _ in range(60 * 10):
+            card.draw()
+            window.flip()
+            if mouse.isPressedIn(card, buttons=[0]):
+                is_pressed_in = True
+                break
+
+        assert is_pressed_in, "Simulated participant did not click on the only card"
+
+    def test_sound_finishes_after_its_duration(self, window):
+        end_phrase = sound.Sound(value="A", secs=0.25)
+        end_phrase.play()
+
+        flips = 0
+        while end_phrase.status != sound.FINISHED:
+            window.flip()
+            flips += 1
+
+        assert flips in (15, 16), f"Sound with duration 0.25 finished after {flips} flips"
+
+
+class TestHeadlessBackend:
+    @pytest.mark.parametrize("module", ["data_save", "task_views", "probe_views"])
+    def test_module_is_imported_without_psychopy(self, module):
+        # new interpreter, so backend chosen by other tests does not matter
+        code = f"import sys; sys.modules['psychopy'] = None; import base.{module}"
+        result = subprocess.run([sys.executable, "-c", code],
+                                cwd=Path(__file__).resolve().parents[2],
+                                env={**os.environ, "PROBS_BACKEND": "headless"},
+                                capture_output=True,
+                                text=True)
+
+        assert result.returncode == 0, f"base.{module} needs psychopy with headless backend:\n{result.stderr}"
+
+    def test_date_str_for_file_name(self):
+        assert data.getDateStr(format="%Y") == time.strftime("%Y"), "Date is not formatted like psychopy one"
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,50 @@
+from types import ModuleType
+
+import numpy as np
+import pytest
+
+from base.headless import visual
+
+
+@pytest.fixture
+def hit_testing(headless_backend) -> ModuleType:
+    # rectangles of headless backend have the same geometry as psychopy ones
+    return headless_backend("hit_testing")
+
+
+class TestRectHitIndex:
+    @pytest.fixture
+    def cards(self):
+        window = visual.Window(size=(1200, 800))
+        return [visual.Rect(window, width=80, height=120, pos=((idx - 1.5) * 160, -50)) for idx in range(4)]
+
+    def test_same_card_as_containment_test(self, hit_testing, cards):
+        hit_index = hit_testing.RectHitIndex(cards)
+        points = np.random.default_rng(0).uniform(low=(-400, -150), high=(400, 50), size=(1000, 2))
+
+        for point in points:
+            expected = next((idx for idx, card in enumerate(cards) if card.contains(point)), None)
+            found = hit_index.find(point)
+            assert found == expected, f"For point {point} found card {found} instead of {expected}"
+
+    def test_index_follows_rebuild(self, hit_testing, cards):
+        hit_index = hit_testing.RectHitIndex(cards)
+        card_center = tuple(cards[2].pos)
+
+        for card in cards:
+            card.pos += (0, 300)
+
+        assert hit_index.find(card_center) == 2, "Index changed before rebuild"
+
+        hit_index.rebuild(cards)
+        assert hit_index.find(card_center) is None, "Index was not rebuilt for moved cards"
+        assert hit_index.find(tuple(cards[2].pos)) == 2, "Moved card was not found"
+
+    def test_empty_index(self, hit_testing):
+        hit_index = hit_testing.RectHitIndex()
+
+        assert len(hit_index) == 0 and hit_index.find((0, 0)) is None, "Empty index found rectangle"
+
+
+if __name__ == '__main__':
+    pytest.main()
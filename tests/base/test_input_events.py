@@ -0,0 +1,178 @@
+import time
+from types import ModuleType
+
+import pytest
+
+from base.headless import core, event, keyboard, visual
+
+
+@pytest.fixture
+def input_events(headless_backend) -> ModuleType:
+    # input events are collected from keyboard of simulated participant
+    return headless_backend("input_events")
+
+
+class TestKeyboardEventQueue:
+    @pytest.fixture
+    def window(self) -> visual.Window:
+        return visual.Window(size=(1200, 800), frame_rate=60)
+
+    @pytest.fixture
+    def key_queue(self, input_events):
+        queue = input_events.KeyboardEventQueue(key_list=["right", "left"], device=keyboard.Keyboard())
+        queue.start()
+        yield queue
+        queue.stop()
+
+    @staticmethod
+    def _wait_for_events(window, key_queue):
+        for _ in range(60 * 5):
+            window.flip()
+            # consumer does not outrun collecting thread in virtual time
+            time.sleep(0.002)
+            events = key_queue.drain()
+            if events:
+                return events
+
+        return []
+
+    def test_rt_is_measured_from_onset_flip(self, window, key_queue):
+        window.callOnFlip(key_queue.mark_onset)
+        onset = window.flip()
+
+        events = self._wait_for_events(window, key_queue)
+
+        assert events, "KeyboardEventQueue did not collect any key press"
+        rt = key_queue.reaction_time(events[0])
+        low, high = keyboard.Keyboard.response_time
+        assert low <= rt <= high, f"RT {rt} is out of simulated response time [{low}, {high}]"
+        assert core.getTime() - onset >= rt, "RT is longer than time passed since onset"
+        assert events[0].name in ("right", "left"), f"Wrong key was collected {events[0].name}"
+
+    def test_events_before_onset_are_forgotten(self, window, key_queue):
+        self._wait_for_events(window, key_queue)
+        # key presses which were not consumed before onset
+        for _ in range(120):
+            window.flip()
+
+        window.callOnFlip(key_queue.mark_onset)
+        window.flip()
+
+        assert key_queue.drain() == [], "Events before onset were kept"
+
+    def test_error_on_rt_without_onset(self, input_events, key_queue):
+        with pytest.raises(RuntimeError, match="Onset of stimulus was not marked"):
+            key_queue.reaction_time(input_events.KeyEvent(name="right", time=0.5))
+
+
+class PsychopyMouse:
+    """
+    Mouse which keeps time of the last press until click reset like psychopy.event.Mouse
+    """
+
+    def __init__(self):
+        self.is_pressed = 0
+        self.press_time = 0.0
+        self.pos = (0.0, 0.0)
+        self._reset_time = core.getTime()
+
+    def press(self) -> None:
+        self.is_pressed = 1
+        self.press_time = core.getTime() - self._reset_time
+
+    def release(self) -> None:
+        self.is_pressed = 0
+
+    def clickReset(self, buttons=(0, 1, 2)) -> None:
+        self._reset_time = core.getTime()
+        self.press_time = 0.0
+
+    def getPressed(self, getTime=False):
+        buttons = [self.is_pressed, 0, 0]
+        return (buttons, [self.press_time, 0.0, 0.0]) if getTime else buttons
+
+    def getPos(self):
+        return self.pos
+
+
+class TestMouseClickQueue:
+    @pytest.fixture
+    def window(self) -> visual.Window:
+        return visual.Window(size=(1200, 800), frame_rate=60)
+
+    @staticmethod
+    def _collect_clicks(window, click_queue, frames):
+        clicks = []
+        for _ in range(frames):
+            window.flip()
+            clicks.extend(click_queue.poll())
+
+        return clicks
+
+    def test_press_time_is_taken_from_mouse(self, input_events, window):
+        mouse = event.Mouse(win=window)
+        click_queue = input_events.MouseClickQueue(mouse=mouse)
+        window.callOnFlip(click_queue.reset)
+
+        presses = [click for click in self._collect_clicks(window, click_queue, frames=60 * 10) if click.is_press]
+
+        assert presses, "MouseClickQueue did not notice any press"
+        frame_period = window.monitorFramePeriod
+        assert all(0 <= click.polled_time - click.time < frame_period for click in presses), \
+            f"Press times differ from polled times more than one frame {presses}"
+        assert any(click.polled_time != click.time for click in presses), "Press times are quantized to frames"
+
+    def test_every_press_is_released(self, input_events, window):
+        mouse = event.Mouse(win=window)
+        click_queue = input_events.MouseClickQueue(mouse=mouse)
+
+        clicks = self._collect_clicks(window, click_queue, frames=60 * 10)
+        is_press = [click.is_press for click in clicks]
+        # last press may be not released yet
+        expected = [True, False] * (len(is_press) // 2) + [True] * (len(is_press) % 2)
+
+        assert is_press, "MouseClickQueue did not notice any click"
+        assert is_press == expected, f"Presses and releases are not paired {is_press}"
+
+    def test_click_between_tasks_is_not_response(self, input_events, window):
+        mouse = PsychopyMouse()
+        click_queue = input_events.MouseClickQueue(mouse=mouse)
+        window.callOnFlip(click_queue.reset)
+        window.flip()
+
+        # click on instruction screen after the first task
+        window.flip()
+        mouse.press()
+        window.flip()
+        mouse.release()
+
+        # the next task polls before the flip with its reset
+        click_queue.sync()
+        window.callOnFlip(click_queue.reset)
+        clicks = click_queue.poll()
+        window.flip()
+        clicks += self._collect_clicks(window, click_queue, frames=30)
+
+        assert clicks == [], f"Click between tasks was returned as response {clicks}"
+
+        mouse.press()
+        clicks = self._collect_clicks(window, click_queue, frames=1)
+        assert [click.is_press for click in clicks] == [True], "Click after reset was not noticed"
+        assert clicks[0].time == pytest.approx(30 / 60), "Press time is not measured from reset of the next task"
+
+    def test_click_keeps_position_of_poll(self, input_events, window):
+        mouse = PsychopyMouse()
+        click_queue = input_events.MouseClickQueue(mouse=mouse)
+        window.callOnFlip(click_queue.reset)
+        window.flip()
+
+        mouse.pos = (120.0, -40.0)
+        mouse.press()
+        press = click_queue.poll()[0]
+        mouse.pos = (0.0, 0.0)
+
+        assert press.pos == (120.0, -40.0), f"Click has position {press.pos} instead of position of the press"
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,97 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from base import experiment_organization_logic, insight_planner
+
+
+class TestInsightSessionPlanner:
+    TASKS = tuple(str(task) for task in range(1, 13))
+    CONDITIONS = ("Many", "Few")
+    PROBES = ("Обновление", "Переключение", "Торможение")
+
+    @pytest.fixture
+    def planner(self) -> insight_planner.InsightSessionPlanner:
+        return insight_planner.InsightSessionPlanner(tasks=self.TASKS, conditions=self.CONDITIONS, probes=self.PROBES)
+
+    def test_generated_plans_are_balanced(self, planner):
+        batch = planner.generate(5000, rng=np.random.default_rng(0))
+
+        assert batch.probes.shape == (5000, len(self.TASKS)), f"Wrong shape of plans {batch.probes.shape}"
+        assert planner.is_valid(batch).all(), "Some generated plans are not balanced"
+
+        plan = planner.plan_of(batch, 0)
+        assert planner.validate(plan) == [], "Plan is not balanced"
+        assert Counter(zip(plan.probes, plan.conditions)) == {(probe, condition): 2
+                                                              for probe in self.PROBES
+                                                              for condition in self.CONDITIONS}, \
+            "Every condition must be used twice with every probe"
+
+    def test_broken_plan_is_found(self, planner):
+        batch = planner.generate(10, rng=np.random.default_rng(1))
+        batch.tasks[3, 0] = batch.tasks[3, 1]
+        batch.conditions[7, :] = 0
+
+        assert list(np.flatnonzero(~planner.is_valid(batch))) == [3, 7], "Broken plans were not found"
+
+        plan = planner.plan_of(batch, 7)
+        assert planner.validate(plan), "Unbalanced conditions were not reported"
+
+    def test_plans_are_spread_over_positions(self, planner):
+        plans = 20000
+        counts = planner.position_counts(planner.generate(plans, rng=np.random.default_rng(2)))
+
+        assert counts["probes"].sum(axis=1).tolist() == [plans] * len(self.TASKS), "Not every position is counted"
+        np.testing.assert_allclose(counts["conditions"] / plans, 0.5, atol=0.02,
+                                   err_msg="Conditions are not balanced over positions")
+        np.testing.assert_allclose(counts["probes"] / plans, 1 / 3, atol=0.02,
+                                   err_msg="Probes are not balanced over positions")
+
+    def test_plan_file(self, planner, tmpdir):
+        plan = planner.plan(rng=np.random.default_rng(3))
+        fp = str(tmpdir.join("plan.json"))
+        plan.save(fp)
+
+        assert insight_planner.SessionPlan.load(fp) == plan, "Loaded plan differs from saved one"
+
+    def test_error_on_unbalanced_settings(self):
+        with pytest.raises(ValueError):
+            insight_planner.InsightSessionPlanner(tasks=self.TASKS[:-1], conditions=self.CONDITIONS,
+                                                  probes=self.PROBES)
+
+        with pytest.raises(ValueError):
+            insight_planner.InsightSessionPlanner(tasks=self.TASKS, conditions=self.CONDITIONS, probes=self.PROBES,
+                                                  tasks_conditions_per_probe=3)
+
+
+class TestPlannedInsightSequence:
+    TASKS_FP = "../../text/insight tasks.csv"
+    PROBE_INSTRUCTIONS_FP = "../../text/probe instructions two.csv"
+    PROBES = ("Обновление", "Переключение", "Торможение")
+
+    def create(self, **kwargs) -> experiment_organization_logic.ExperimentInsightTaskSequence:
+        return experiment_organization_logic.ExperimentInsightTaskSequence(
+            id_column="ID", tasks_fp=self.TASKS_FP, probes=self.PROBES,
+            probe_instructions_path=self.PROBE_INSTRUCTIONS_FP, **kwargs)
+
+    def test_sequence_follows_saved_plan(self, tmpdir):
+        plan_fp = str(tmpdir.join("plan.json"))
+        sequence = self.create(plan_fp=plan_fp)
+        replayed = self.create(plan=insight_planner.SessionPlan.load(plan_fp))
+
+        combinations = [(task.name, task.type, task.content, probe.name) for task, probe in sequence]
+        assert len(combinations) == 12, "Not all tasks are in the sequence"
+        assert combinations == [(task.name, task.type, task.content, probe.name) for task, probe in replayed], \
+            "Sequence differs from its plan"
+
+    def test_error_on_unbalanced_plan(self):
+        plan = self.create().plan
+        unbalanced = plan._replace(conditions=("Many",) * len(plan.conditions))
+
+        with pytest.raises(ValueError):
+            self.create(plan=unbalanced)
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,112 @@
+import csv
+import threading
+
+import pytest
+
+from base import participant_registry
+
+
+class TestParticipantRegistry:
+    @pytest.fixture
+    def registry_fp(self, tmpdir) -> str:
+        return str(tmpdir.join("participants.sqlite3"))
+
+    @pytest.fixture
+    def legacy_csv_fp(self, tmpdir) -> str:
+        fp = str(tmpdir.join("participants info.csv"))
+        with open(fp, mode="w", encoding="UTF-8", newline="") as csv_file:
+            csv_writer = csv.writer(csv_file)
+            csv_writer.writerow(participant_registry.CSV_HEADER)
+            for idx in range(1000):
+                insight_name = f"Участник {idx}_insight.csv" if idx % 2 else ""
+                csv_writer.writerow([f"Участник {idx} 20 Ж", f"Участник {idx}_wm.csv", insight_name])
+
+        return fp
+
+    def test_first_and_second_part_are_linked(self, registry_fp):
+        registry = participant_registry.ParticipantRegistry(fp=registry_fp, legacy_csv_fp=None)
+        registry.add_first_part(participant="Иванов Иван 20 М", wm_name="Иванов_wm.csv")
+
+        assert [entry.wm_name for entry in registry.without_second_part()] == ["Иванов_wm.csv"], \
+            "Participant is not waiting for the second part"
+
+        registry.add_second_part(wm_name="Иванов_wm.csv", insight_name="Иванов_insight.csv")
+
+        assert registry.without_second_part() == [], "Participant is still waiting for the second part"
+        assert registry.find_by_wm_name("Иванов_wm.csv").insight_name == "Иванов_insight.csv", \
+            "Second part was not saved"
+        assert len(registry.find_by_participant("Иванов Иван 20 М")) == 1, "Participant was not found by ID"
+
+    def test_error_on_second_part_of_unknown_participant(self, registry_fp):
+        registry = participant_registry.ParticipantRegistry(fp=registry_fp, legacy_csv_fp=None)
+
+        with pytest.raises(ValueError, match="is not registered"):
+            registry.add_second_part(wm_name="Иванов_wm.csv", insight_name="Иванов_insight.csv")
+
+    def test_csv_is_migrated_once(self, registry_fp, legacy_csv_fp):
+        registry = participant_registry.ParticipantRegistry(fp=registry_fp, legacy_csv_fp=legacy_csv_fp)
+
+        assert len(registry.without_second_part()) == 500, "Not all participants were migrated"
+        assert registry.migrate_from_csv(legacy_csv_fp) == 0, "CSV was migrated twice"
+
+    def test_migrated_csv_is_not_read(self, registry_fp, legacy_csv_fp, monkeypatch):
+        participant_registry.ParticipantRegistry(fp=registry_fp, legacy_csv_fp=legacy_csv_fp).close()
+
+        def fail_on_read(*args, **kwargs):
+            raise AssertionError("Migrated csv was read")
+
+        monkeypatch.setattr(participant_registry.csv, "DictReader", fail_on_read)
+        registry = participant_registry.ParticipantRegistry(fp=registry_fp, legacy_csv_fp=legacy_csv_fp)
+
+        assert len(registry.all()) == 1000, "Participants were lost after migration"
+
+    def test_changed_csv_is_migrated_again(self, registry_fp, legacy_csv_fp):
+        participant_registry.ParticipantRegistry(fp=registry_fp, legacy_csv_fp=legacy_csv_fp).close()
+        with open(legacy_csv_fp, mode="a", encoding="UTF-8", newline="") as csv_file:
+            csv.writer(csv_file).writerow(["Новый 20 М", "Новый_wm.csv", ""])
+
+        registry = participant_registry.ParticipantRegistry(fp=registry_fp, legacy_csv_fp=None)
+
+        assert registry.migrate_from_csv(legacy_csv_fp) == 1, "Only new row of changed csv must be added"
+        assert registry.find_by_wm_name("Новый_wm.csv") is not None, "Row added to csv was not migrated"
+
+    def test_registry_without_file_stats_is_upgraded(self, registry_fp, legacy_csv_fp):
+        connection = participant_registry.sqlite3.connect(registry_fp)
+        connection.execute("CREATE TABLE migrations (source TEXT PRIMARY KEY, rows INTEGER NOT NULL)")
+        connection.commit()
+        connection.close()
+
+        registry = participant_registry.ParticipantRegistry(fp=registry_fp, legacy_csv_fp=legacy_csv_fp)
+
+        assert len(registry.all()) == 1000, "Registry of the old format was not migrated"
+        assert registry.migrate_from_csv(legacy_csv_fp) == 0, "CSV was migrated twice"
+
+    def test_export_has_csv_format(self, registry_fp, legacy_csv_fp, tmpdir):
+        registry = participant_registry.ParticipantRegistry(fp=registry_fp, legacy_csv_fp=legacy_csv_fp)
+        exported_fp = str(tmpdir.join("exported.csv"))
+        registry.export_csv(exported_fp)
+
+        with open(legacy_csv_fp, encoding="UTF-8") as legacy, open(exported_fp, encoding="UTF-8") as exported:
+            assert list(csv.reader(legacy)) == list(csv.reader(exported)), "Exported csv differs from migrated one"
+
+    def test_stations_write_concurrently(self, registry_fp):
+        participant_registry.ParticipantRegistry(fp=registry_fp, legacy_csv_fp=None).close()
+
+        def station(station_idx):
+            registry = participant_registry.ParticipantRegistry(fp=registry_fp, legacy_csv_fp=None)
+            for idx in range(20):
+                registry.add_first_part(participant=f"Станция {station_idx}", wm_name=f"{station_idx}_{idx}.csv")
+            registry.close()
+
+        stations = [threading.Thread(target=station, args=(station_idx,)) for station_idx in range(4)]
+        for thread in stations:
+            thread.start()
+        for thread in stations:
+            thread.join()
+
+        registry = participant_registry.ParticipantRegistry(fp=registry_fp, legacy_csv_fp=None)
+        assert len(registry.without_second_part()) == 80, "Rows of some stations were lost"
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,106 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from base import probe_design, probe_presenters
+
+INHIBITION_PROBES = ["".join(colorful_word) for colorful_word in itertools.product("RGBY", repeat=2)]
+PROBES = {
+    "TwoAlternatives": (["green", "red"], ["right", "left"]),
+    "Update": (["1", "2", "3"], None),
+    "Switch": (list("12345678"), ["right", "right", "left", "right", "left", "left", "left", "right"]),
+    "Inhibition": (INHIBITION_PROBES, [dict(R="right", Y="right", G="left", B="left")[probe[1]]
+                                       for probe in INHIBITION_PROBES]),
+}
+
+
+def create_probe(probe_type: str) -> probe_presenters.Probe:
+    probes, answers = PROBES[probe_type]
+    return probe_presenters.Probe(probes, answers, probe_type)
+
+
+class TestSampledSequences:
+    def test_switch_groups_follow_each_other(self):
+        probe = create_probe("Switch")
+        probe.next_probe()
+        indices = probe.sample_sequences(1000, 12, np.random.default_rng(0))
+
+        # the first probe was chosen on creation and the second one by next_probe
+        black = np.isin(indices, (0, 1, 4, 5))
+        expected_black = np.array([step % 4 < 2 for step in range(2, 14)])
+        assert (black == expected_black).all(), "Sampled probes do not follow groups of Switch probe"
+
+    def test_inhibition_congruency(self):
+        indices = create_probe("Inhibition").sample_sequences(20000, 30, np.random.default_rng(0))
+        congruent = np.array([probe[0] == probe[1] for probe in INHIBITION_PROBES])
+
+        assert abs(congruent[indices].mean() - 1 / 6) < 0.01, "Congruent probes are not shown in 1/6 of trials"
+        assert len(np.unique(indices)) == len(INHIBITION_PROBES), "Some probes are never sampled"
+
+    def test_handler_is_not_changed(self):
+        probe = create_probe("Switch")
+        state = probe.get_state()
+        probe.sample_sequences(10, 10)
+
+        changed = [name for name in ("current_probe_idx", "rng", "block_position", "right_sequence_step")
+                   if probe.get_state()[name] != state[name]]
+        assert not changed, f"Sampling changed state {changed} of the probe"
+
+    def test_update_answer_codes(self):
+        codes, keys = create_probe("Update").answer_codes(np.array([[0, 0, 1, 2, 2]]))
+
+        assert codes.tolist() == [[probe_presenters.NO_KEY, keys.index("right"), keys.index("left"),
+                                   keys.index("left"), keys.index("right")]], "Wrong keys of Update probe"
+
+
+class TestDesignValidation:
+    @pytest.mark.parametrize("probe_type", ["TwoAlternatives", "Switch", "Inhibition"])
+    def test_design_meets_targets(self, probe_type):
+        report = probe_design.simulate(create_probe(probe_type), sequences=20000, trials=30,
+                                       rng=np.random.default_rng(0), chunk=3000)
+
+        assert probe_design.validate(report) == [], f"{probe_type} probe does not meet targets"
+        assert report.run_lengths.sum() * report.mean_run == pytest.approx(20000 * 30), \
+            "Runs do not cover every trial"
+
+    def test_unbalanced_update_is_found(self):
+        report = probe_design.simulate(create_probe("Update"), sequences=20000, trials=30,
+                                       rng=np.random.default_rng(0))
+
+        errors = probe_design.validate(report)
+        assert report.same_ratio == pytest.approx(1 / 3, abs=0.01), "Update probe with 3 probes must repeat in 1/3"
+        assert any("same_ratio" in error for error in errors), "Unbalanced same and different answers were not found"
+
+    def test_update_of_experiments_meets_targets(self):
+        probes, answers = PROBES["Update"]
+        probe = probe_presenters.Probe(probes, answers, "Update", **probe_presenters.UPDATE_ANSWERS)
+        report = probe_design.simulate(probe, sequences=2000, trials=30, rng=np.random.default_rng(0))
+
+        assert probe_design.TARGETS["Update"].max_run == probe_presenters.UPDATE_ANSWERS["max_run"], \
+            "Run cap of Update probe is not checked"
+        assert probe_design.validate(report) == [], "Update probe of experiments does not meet targets"
+
+    def test_update_without_run_cap_is_found(self):
+        probes, answers = PROBES["Update"]
+        probe = probe_presenters.Probe(probes, answers, "Update", same_ratio=0.5)
+        report = probe_design.simulate(probe, sequences=2000, trials=30, rng=np.random.default_rng(0))
+
+        assert [error for error in probe_design.validate(report) if "longer than" in error], \
+            "Regression of run cap of Update probe was not found"
+
+    def test_long_runs_are_found(self):
+        report = probe_design.simulate(create_probe("TwoAlternatives"), sequences=1000, trials=30,
+                                       rng=np.random.default_rng(0))
+        targets = probe_design.DesignTargets(max_run=3)
+
+        assert report.max_run > 3, "Random sequences of two answers must have runs longer than three"
+        assert probe_design.validate(report, targets), "Run longer than maximum was not found"
+
+    def test_error_on_short_sequences(self):
+        with pytest.raises(ValueError):
+            probe_design.simulate(create_probe("TwoAlternatives"), sequences=10, trials=1)
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -2,6 +2,7 @@ import itertools
 import logging
 from typing import Dict, List, Tuple
 
+import numpy as np
 import pytest
 
 from base import probe_presenters
@@ -350,5 +351,120 @@ class TestInhibitionProbe:
         assert congruent_percent == pytest.approx(1 / 6, abs=percent_tolerance), message
 
 
+class TestProbeBlocks:
+    def test_block_log_records_shown_probes(self, tmpdir):
+        current_probe = probe_presenters.Probe(probes=["green", "red"], answers=["right", "left"], block_size=4)
+
+        shown = [current_probe.probes[current_probe.get_probe_number()]]
+        for trial in range(9):
+            current_probe.next_probe()
+            shown.append(current_probe.probes[current_probe.get_probe_number()])
+
+        log = current_probe.block_log()
+        assert len(log) == 12, "Every generated probe must be in the log"
+        assert [stimulus for _, _, stimulus, is_shown in log if is_shown] == shown, "Log has other shown probes"
+        assert [block for block, _, _, _ in log] == [0] * 4 + [1] * 4 + [2] * 4, "Probes are logged in other blocks"
+
+        log_fp = str(tmpdir.join("probe_blocks.csv"))
+        probe_presenters.save_block_log(log_fp, {"Выбор из 2 альтернатив": current_probe})
+        with open(log_fp, mode="r", encoding="UTF-8") as log_file:
+            assert len(log_file.readlines()) == 13, "Log file must have header and every generated probe"
+
+    @pytest.mark.parametrize("probe_type, probes, answers", [
+        ("TwoAlternatives", ["green", "red"], ["right", "left"]),
+        ("Switch", list("12345678"), ["right", "right", "left", "right", "left", "left", "left", "right"]),
+    ])
+    def test_maximum_run_of_the_same_answer(self, probe_type, probes, answers):
+        max_run = 2
+        current_probe = probe_presenters.Probe(probes=probes, answers=answers, probe_type=probe_type,
+                                               block_size=8, max_run=max_run)
+
+        keys = []
+        for trial in range(200):
+            keys.append(answers[current_probe.get_probe_number()])
+            current_probe.next_probe()
+
+        runs = [len(list(run)) for _, run in itertools.groupby(keys)]
+        assert max(runs) <= max_run, f"{probe_type} has run of {max(runs)} trials with the same answer"
+
+    def test_blocks_alternate_answers_with_run_of_one(self):
+        current_probe = probe_presenters.Probe(probes=["1", "2", "3", "4"], answers=["right", "right", "left", "left"],
+                                               block_size=32, max_run=1)
+
+        keys = []
+        for trial in range(200):
+            keys.append(current_probe.get_press_correctness("right"))
+            current_probe.next_probe()
+
+        assert all(key != next_key for key, next_key in zip(keys, keys[1:])), "Answers do not alternate"
+
+    @pytest.mark.parametrize("probe_type, probes, answers", [
+        ("TwoAlternatives", ["green", "red"], ["right", "right"]),
+        ("Switch", list("12345678"), ["right", "right", "left", "left", "right", "right", "left", "left"]),
+        ("Update", ["1"], None),
+    ])
+    def test_error_on_impossible_maximum_run(self, probe_type, probes, answers):
+        with pytest.raises(ValueError, match="can not be kept"):
+            probe_presenters.Probe(probes=probes, answers=answers, probe_type=probe_type, max_run=2)
+
+    def test_update_run_of_the_same_answer(self):
+        current_probe = probe_presenters.Probe(probes=["1", "2", "3"], probe_type="Update", block_size=8, max_run=2)
+
+        answers = []
+        for trial in range(200):
+            current_probe.next_probe()
+            answers.append(current_probe.get_press_correctness("right"))
+
+        runs = [len(list(run)) for _, run in itertools.groupby(answers)]
+        assert max(runs) <= 2, f"Update probe has run of {max(runs)} trials with the same answer"
+
+    def test_update_share_of_same_probes(self):
+        current_probe = probe_presenters.Probe(probes=["1", "2", "3"], probe_type="Update", block_size=16,
+                                               same_ratio=0.5, max_run=3)
+
+        answers = []
+        for trial in range(2000):
+            current_probe.next_probe()
+            answers.append(current_probe.get_press_correctness("right"))
+
+        runs = [len(list(run)) for _, run in itertools.groupby(answers)]
+        assert sum(answers) / len(answers) == pytest.approx(0.5, abs=0.01), "Same and different probes are not equal"
+        assert max(runs) <= 3, f"Update probe has run of {max(runs)} trials with the same answer"
+
+    def test_share_of_same_probes_only_for_update(self):
+        with pytest.raises(ValueError):
+            probe_presenters.Probe(probes=["green", "red"], answers=["right", "left"], same_ratio=0.5)
+
+    def test_error_on_empty_block(self):
+        with pytest.raises(ValueError):
+            probe_presenters.Probe(probes=["green", "red"], answers=["right", "left"], block_size=0)
+
+
+class TestSameDifferentGenerator:
+    @pytest.mark.parametrize("same_ratio, max_run", [(0.5, 4), (1 / 3, 2), (0.5, None)])
+    def test_answers_meet_constraints(self, same_ratio, max_run):
+        generator = probe_presenters.SameDifferentGenerator(same_ratio=same_ratio, max_run=max_run)
+        is_same, state = generator.generate(100, np.random.default_rng(0), generator.initial_state(500))
+
+        assert np.abs(is_same.mean(axis=1) - same_ratio).max() < 0.05, "Share of same answers is far from target"
+        if max_run is not None:
+            assert state.run.max() <= max_run and all(len(list(run)) <= max_run for sequence in is_same
+                                                      for _, run in itertools.groupby(sequence)), \
+                "Run of the same answers is longer than maximum"
+
+    def test_lazy_chunks_continue_each_other(self):
+        generator = probe_presenters.SameDifferentGenerator(same_ratio=0.5, max_run=3)
+        chunks = generator.chunks(chunk=10, rng=np.random.default_rng(1))
+        lazy = np.concatenate([next(chunks) for _ in range(5)])
+
+        whole, _ = generator.generate(50, np.random.default_rng(1), generator.initial_state())
+        assert (lazy == whole[0]).all(), "Chunks differ from sequence generated at once"
+
+    @pytest.mark.parametrize("same_ratio, max_run", [(1.5, 3), (0.5, 0)])
+    def test_error_on_wrong_constraints(self, same_ratio, max_run):
+        with pytest.raises(ValueError):
+            probe_presenters.SameDifferentGenerator(same_ratio=same_ratio, max_run=max_run)
+
+
 if __name__ == '__main__':
     pytest.main()
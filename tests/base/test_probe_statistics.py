@@ -0,0 +1,107 @@
+import os
+
+import numpy as np
+import pytest
+
+from base import columnar, data_records, data_writers, probe_statistics
+
+# probe, combination, correctness and RT of trials in order of presentation
+PROBES = [
+    ("Обновление", 1, [(1, 0.5), (0, 0.9), (1, 0.7), (1, 0.6)]),
+    ("Торможение", 1, [(1, 0.4), (1, 0.4)]),
+    ("Обновление", 2, [(0, 1.0), (1, 0.8), (1, 0.5)]),
+]
+
+
+def write_session(writer: data_writers.DataWriter, schema: data_records.RecordSchema) -> None:
+    for probe, combination, trials in PROBES:
+        # task rows between probes do not have RT
+        task_record = schema.new_record()
+        task_record.experiment_part = "WM"
+        task_record.stage = "experimental"
+        task_record.combination_number = combination
+        task_record.task = "Переключение"
+        task_record.task_solution_time = 3.0
+        writer.write_entry(task_record)
+
+        for probe_trial, (is_correct, rt) in enumerate(trials, start=1):
+            record = schema.new_record()
+            record.experiment_part = "WM"
+            record.stage = "experimental"
+            record.combination_number = combination
+            record.task = "Переключение"
+            record.probe_trial = probe_trial
+            record.probe = probe
+            record.RT = rt
+            record.is_correct = is_correct
+            writer.write_entry(record)
+    writer.close()
+
+
+class TestProbeStatistics:
+    SCHEMA = data_records.compile_schema("WM")
+
+    @pytest.fixture
+    def csv_fp(self, tmpdir) -> str:
+        fp = str(tmpdir.join("Иванов.csv"))
+        write_session(data_writers.StreamingCsvWriter(fp=fp, schema=self.SCHEMA, extra_info={"ФИО": "Иванов"}),
+                      self.SCHEMA)
+        return fp
+
+    @pytest.fixture
+    def columns_dir(self, tmpdir) -> str:
+        directory = str(tmpdir.join("Иванов_columns"))
+        write_session(columnar.ColumnarWriter(directory=directory, schema=self.SCHEMA, extra_info={}), self.SCHEMA)
+        return directory
+
+    def test_statistics_of_probes(self, csv_fp):
+        statistics = probe_statistics.summarize(probe_statistics.load_probe_trials(csv_fp), by=("probe",))
+
+        update = list(statistics.keys["probe"]).index("Обновление")
+        assert statistics.trials[update] == 7, "Task rows were counted as probe trials"
+        assert statistics.accuracy[update] == pytest.approx(5 / 7), "Wrong accuracy"
+        assert statistics.mean_rt[update] == pytest.approx(np.mean([0.5, 0.7, 0.6, 0.8, 0.5])), \
+            "Mean RT is not computed on correct trials"
+        assert statistics.median_rt[update] == pytest.approx(0.6), "Wrong median RT"
+        assert statistics.inverse_efficiency[update] == pytest.approx(statistics.mean_rt[update] / (5 / 7)), \
+            "Wrong inverse efficiency"
+        # after error: 0.7, 0.8; after correct: 0.6, 0.5
+        assert statistics.post_error_slowing[update] == pytest.approx(0.75 - 0.55), "Wrong post-error slowing"
+        np.testing.assert_allclose(statistics.rt_by_position[update], [0.5, 0.8, 0.6, 0.6],
+                                   err_msg="Wrong RT by position in the probe")
+
+    def test_groups_of_experiment_part(self, csv_fp):
+        statistics = probe_statistics.summarize(probe_statistics.load_probe_trials(csv_fp))
+
+        assert statistics.by == probe_statistics.PART_GROUP_COLUMNS["WM"], "Part columns are not used by default"
+        assert sorted(zip(statistics.keys["combination_number"], statistics.keys["probe"])) == \
+            [("1", "Обновление"), ("1", "Торможение"), ("2", "Обновление")], "Wrong groups of combinations"
+
+    def test_csv_and_columns_give_the_same_statistics(self, csv_fp, columns_dir):
+        from_csv = probe_statistics.summarize(probe_statistics.load_probe_trials(csv_fp))
+        from_columns = probe_statistics.summarize(probe_statistics.load_probe_trials(columns_dir))
+
+        for name in from_csv.by:
+            np.testing.assert_array_equal(from_csv.keys[name], from_columns.keys[name], err_msg=f"Keys {name} differ")
+        np.testing.assert_allclose(from_csv.mean_rt, from_columns.mean_rt, err_msg="Mean RT differs")
+        np.testing.assert_allclose(from_csv.rt_by_position, from_columns.rt_by_position,
+                                   err_msg="RT by position differs")
+
+    def test_error_on_unknown_group_column(self, csv_fp):
+        with pytest.raises(ValueError):
+            probe_statistics.summarize(probe_statistics.load_probe_trials(csv_fp), by=("task_type",))
+
+    def test_unchanged_files_are_not_computed_again(self, tmpdir, csv_fp, columns_dir):
+        cache = probe_statistics.ProbeStatisticsCache(cache_dir=str(tmpdir.join("cache")))
+        cache.summarize_cohort([csv_fp, columns_dir])
+        assert (cache.computed, cache.reused) == (2, 0), "Statistics were not computed"
+
+        cache = probe_statistics.ProbeStatisticsCache(cache_dir=str(tmpdir.join("cache")))
+        os.utime(csv_fp, (1, 1))
+        cohort = cache.summarize_cohort([csv_fp, columns_dir])
+        assert (cache.computed, cache.reused) == (1, 1), "Only the changed file must be computed again"
+        assert set(cohort) == {csv_fp, columns_dir}, "Not all files are in the cohort statistics"
+
+
+if __name__ == '__main__':
+    pytest.main()
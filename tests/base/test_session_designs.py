@@ -0,0 +1,66 @@
+import pytest
+
+from base import counterbalancing, insight_planner, session_designs, session_rng
+
+
+class TestSessionDesigns:
+    @pytest.fixture
+    def designs_fp(self, tmpdir) -> str:
+        return str(tmpdir.join("participants.sqlite3"))
+
+    def test_design_is_found_by_seed(self, designs_fp):
+        seed = session_rng.SessionRNG().seed
+        designs = session_designs.SessionDesigns(part="WM", fp=designs_fp)
+
+        assert designs.find(seed) is None, "New seed has recorded design"
+
+        designs.record(seed, dict(order=[2, 0, 1]))
+        designs.close()
+
+        replay_designs = session_designs.SessionDesigns(part="WM", fp=designs_fp)
+        assert replay_designs.find(seed) == dict(order=[2, 0, 1]), "Design of the seed was not recorded"
+
+    def test_recorded_design_is_kept(self, designs_fp):
+        designs = session_designs.SessionDesigns(part="WM", fp=designs_fp)
+        designs.record(7, dict(order=[0, 1]))
+
+        assert designs.record(7, dict(order=[1, 0])) == dict(order=[0, 1]), "Design of the seed was replaced"
+
+    def test_parts_are_independent(self, designs_fp):
+        session_designs.SessionDesigns(part="WM", fp=designs_fp).record(7, dict(order=[0, 1]))
+
+        assert session_designs.SessionDesigns(part="Insight", fp=designs_fp).find(7) is None, \
+            "Seed of WM session has design of Insight session"
+
+    def test_replay_does_not_depend_on_later_allocations(self, designs_fp):
+        rows = counterbalancing.williams_design(4)
+
+        def replay_order(seed: int, session: str) -> list:
+            designs = session_designs.SessionDesigns(part="WM", fp=designs_fp)
+            design = designs.find(seed)
+            if design is None:
+                allocator = counterbalancing.CounterbalancingAllocator(design_key="test", rows=rows, fp=designs_fp)
+                design = designs.record(seed, dict(order=allocator.allocate(session=session)))
+                allocator.close()
+            designs.close()
+            return design["order"]
+
+        original = replay_order(seed=1, session="first")
+        replay_order(seed=2, session="second")
+
+        assert replay_order(seed=1, session="replay") == original, "Replay got the next row of the design"
+        assert replay_order(seed=3, session="third") == rows[2].tolist(), "Replay changed counterbalancing"
+
+    def test_plan_is_replayed(self, designs_fp):
+        plan = insight_planner.SessionPlan(probes=("Обновление", "Торможение"),
+                                           tasks=("1", "2"),
+                                           conditions=("Many", "Few"))
+        session_designs.SessionDesigns(part="Insight", fp=designs_fp).record(5, plan._asdict())
+
+        design = session_designs.SessionDesigns(part="Insight", fp=designs_fp).find(5)
+        assert insight_planner.SessionPlan(**{name: tuple(value) for name, value in design.items()}) == plan, \
+            "Plan differs after replay"
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,102 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from base import experiment_organization_logic, probe_presenters, session_rng, task_presenters
+
+UPDATE_STIMULI_FP = "test_files/tables/test_tasks.csv"
+
+
+def run_session(seed: int) -> list:
+    """
+    :return: stimuli and probes shown by presenters of the session
+    """
+    rng = session_rng.SessionRNG(seed)
+    update_task = task_presenters.UpdateTask(stimuli_fp=UPDATE_STIMULI_FP, possible_sequences=(3, 4),
+                                             blocks_before_task_finished=2, rng=rng.stream("task Обновление"))
+    wisconsin_test = task_presenters.WisconsinTest(max_streak=2, max_trials=10, max_rules_changed=None,
+                                                   rng=rng.stream("task Переключение"))
+    deck = task_presenters.WisconsinDeck(trials=10, rng=rng.generator("task Переключение"))
+    probe = probe_presenters.Probe(list("12345678"), ["right", "left"] * 4, "Switch",
+                                   rng=rng.stream("probe Переключение"))
+
+    shown = []
+    update_task.new_task()
+    while not update_task.is_task_finished():
+        update_task.next_subtask()
+        shown.append((update_task.example, update_task.word))
+
+    wisconsin_test.new_task()
+    shown.append((wisconsin_test.rule, deck.trial(0).tolist()))
+
+    for _ in range(20):
+        probe.next_probe()
+        shown.append(probe.get_probe_number())
+
+    return shown
+
+
+class TestSessionRNG:
+    def test_session_is_replayed_from_seed(self):
+        assert run_session(seed=42) == run_session(seed=42), "Session with the same seed shows other stimuli"
+        assert run_session(seed=42) != run_session(seed=43), "Sessions with other seeds show the same stimuli"
+
+    def test_new_seed_is_recorded(self):
+        rng = session_rng.SessionRNG()
+        replayed = session_rng.SessionRNG(rng.seed)
+
+        assert rng.stream("probe").random() == replayed.stream("probe").random(), \
+            "Session is not replayed from recorded seed"
+
+    def test_streams_do_not_depend_on_order(self):
+        first, second = session_rng.SessionRNG(7), session_rng.SessionRNG(7)
+
+        first_values = [first.stream("task").random(), first.stream("probe").random()]
+        second_values = [second.stream("probe").random(), second.stream("task").random()]
+        assert first_values == second_values[::-1], "Stream depends on the order streams were requested"
+
+    def test_streams_are_independent(self):
+        rng = session_rng.SessionRNG(7)
+        task_values = [rng.stream("task").random() for _ in range(5)]
+
+        assert task_values != [rng.stream("probe").random() for _ in range(5)], "Streams of components are the same"
+        assert rng.stream("task") is rng.stream("task"), "Component got new stream"
+        assert rng.generator("task").random() not in task_values, "Generator repeats stream of the same component"
+
+    def test_parallel_sessions(self):
+        seeds = list(range(8))
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            parallel = list(executor.map(run_session, seeds))
+
+        assert parallel == [run_session(seed) for seed in seeds], "Sessions run in parallel share random state"
+
+    def test_error_on_negative_seed(self):
+        with pytest.raises(ValueError):
+            session_rng.SessionRNG(-1)
+
+    def test_wm_sequence_is_shuffled_by_stream(self):
+        def combinations(seed: int) -> list:
+            sequence = experiment_organization_logic.ExperimentWMSequence(
+                tasks=("Обновление", "Переключение", "Торможение"),
+                probes=("Обновление", "Переключение", "Торможение"),
+                task_instructions_path="../../text/task instructions.csv",
+                probe_instructions_path="../../text/probe instructions one.csv",
+                rng=session_rng.SessionRNG(seed).stream("sequence"))
+            return [(task.name, probe.name) for task, probe in (sequence[idx] for idx in range(len(sequence)))]
+
+        assert combinations(3) == combinations(3), "Sequence with the same seed has other order"
+
+    def test_insight_plan_is_generated_by_stream(self):
+        def plan(seed: int):
+            return experiment_organization_logic.ExperimentInsightTaskSequence(
+                id_column="ID",
+                tasks_fp="../../text/insight tasks.csv",
+                probes=("Обновление", "Переключение", "Торможение"),
+                probe_instructions_path="../../text/probe instructions two.csv",
+                rng=session_rng.SessionRNG(seed).generator("sequence")).plan
+
+        assert plan(5) == plan(5), "Plan with the same seed is other"
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -4,6 +4,7 @@ from random import choice, choices, randrange
 from pathlib import Path
 from typing import Dict, Iterator, Tuple, Union, Optional
 
+import numpy as np
 import pytest
 
 from base import task_presenters
@@ -577,6 +578,18 @@ class TestInhibitionTask:
         partial_usage_message = f"InhibitionTask did not used all stimuli {unused_stimulus}"
         assert not unused_stimulus, partial_usage_message
 
+    def test_upcoming_stimuli_are_returned_next(self, create_files_for_fp, task_settings):
+        tmpdir, _ = create_files_for_fp
+        look_ahead = 3
+        task = task_presenters.InhibitionTask(fp=tmpdir.strpath, **task_settings)
+
+        task.new_task()
+        upcoming = task.upcoming_stimuli(look_ahead)
+        returned = [task.next_subtask() for _ in range(look_ahead)]
+
+        wrong_upcoming_message = f"InhibitionTask said that {upcoming} are next, but returned {returned}"
+        assert upcoming == returned, wrong_upcoming_message
+
     @pytest.mark.parametrize("trials_to_finish", [1, 2, 5, 7])
     def test_is_task_finished_correctly(self, trials_to_finish, create_files_for_fp, task_settings):
         tmpdir, _ = create_files_for_fp
@@ -917,5 +930,65 @@ class TestSwitchTask:  # WisconsinTest
         assert all(finished_trials), wrong_trial_message
 
 
+class TestWisconsinDeck:
+    TRIALS = 500
+    RULE_PAIRS = [(previous, current) for previous in range(3) for current in range(3) if previous != current]
+
+    @pytest.fixture
+    def deck(self) -> task_presenters.WisconsinDeck:
+        return task_presenters.WisconsinDeck(trials=self.TRIALS, rng=np.random.default_rng(0))
+
+    @staticmethod
+    def _features(cards) -> np.ndarray:
+        return np.stack([cards[name] for name in task_presenters.WisconsinDeck.CARD_FEATURES.names], axis=-1)
+
+    def test_choice_cards_have_unique_features(self, deck):
+        for trial in range(self.TRIALS):
+            features = self._features(deck.trial(trial))
+            assert all(sorted(feature) == [0, 1, 2, 3] for feature in features[:-1].T), \
+                f"Choice cards of trial {trial} have repeated features {features[:-1]}"
+
+    @pytest.mark.parametrize("previous_rule, current_rule", RULE_PAIRS)
+    def test_no_ambiguity_after_rule_change(self, deck, previous_rule, current_rule):
+        for trial in range(self.TRIALS):
+            features = self._features(deck.trial(trial, previous_rule=previous_rule, current_rule=current_rule))
+            choice_features, target_features = features[:-1], features[-1]
+
+            is_ambiguous = (choice_features[:, previous_rule] == target_features[previous_rule]) \
+                & (choice_features[:, current_rule] == target_features[current_rule])
+            assert not is_ambiguous.any(), f"Trial {trial} is ambiguous for rules {previous_rule, current_rule}"
+            assert sorted(choice_features[:, previous_rule]) == [0, 1, 2, 3], \
+                f"Swap of trial {trial} repeated feature of previous rule"
+
+    def test_deck_grows_after_last_trial(self, deck):
+        deck.trial(self.TRIALS + 10)
+
+        assert len(deck) == self.TRIALS * 2, f"Deck has {len(deck)} trials after growth"
+
+    def test_saved_deck_is_replayed(self, deck, tmpdir):
+        fp = str(tmpdir.join("deck.npz"))
+        given = [deck.trial(trial, *self.RULE_PAIRS[trial % len(self.RULE_PAIRS)]) for trial in range(20)]
+        deck.save(fp)
+
+        replayed_deck = task_presenters.WisconsinDeck.load(fp)
+        replayed = [replayed_deck.trial(trial, *self.RULE_PAIRS[trial % len(self.RULE_PAIRS)]) for trial in range(20)]
+
+        assert all(np.array_equal(a, b) for a, b in zip(given, replayed)), "Loaded deck gives other cards"
+        assert np.load(fp)["given_rules"].shape == (20, 2), "Rules of given trials were not saved"
+
+    def test_loading_does_not_draw_from_rng(self, deck, tmpdir):
+        fp = str(tmpdir.join("deck.npz"))
+        deck.save(fp)
+        rng = np.random.default_rng(1)
+        rng_state = rng.bit_generator.state
+
+        replayed_deck = task_presenters.WisconsinDeck.load(fp, rng=rng)
+
+        assert rng.bit_generator.state == rng_state, "Loading of the deck changed state of the session generator"
+        assert len(replayed_deck) == self.TRIALS, f"Loaded deck has {len(replayed_deck)} trials"
+        replayed_deck.trial(self.TRIALS)
+        assert len(replayed_deck) == self.TRIALS * 2, "Loaded deck did not grow after saved trials"
+
+
 if __name__ == '__main__':
     pytest.main()
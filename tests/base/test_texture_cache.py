@@ -0,0 +1,132 @@
+import os
+import threading
+from typing import List
+
+import pytest
+
+from base import texture_cache
+
+
+class TestTexturePrefetcher:
+    @pytest.fixture
+    def image_fp(self, tmpdir) -> str:
+        from PIL import Image
+
+        fp = str(tmpdir.join("stimulus.png"))
+        Image.new("RGB", (64, 32), color="red").save(fp)
+        return fp
+
+    def test_decoded_image_has_file_size(self, image_fp):
+        image = texture_cache.decode_image(image_fp)
+
+        assert image.size == (64, 32), f"Decoded image has wrong size {image.size}"
+
+    def test_prefetched_image_is_hit(self):
+        decoded_on = []
+
+        def decoder(path):
+            decoded_on.append(threading.current_thread().name)
+            return path.upper()
+
+        prefetcher = texture_cache.TexturePrefetcher(decoder=decoder)
+        prefetcher.prefetch(["one", "two"])
+        prefetcher._prefetched["one"].result()
+
+        assert prefetcher.get("one") == "ONE", "Prefetcher returned wrong image"
+        assert prefetcher.hits == 1 and prefetcher.misses == 0, "Ready image was not counted as hit"
+        assert threading.current_thread().name not in decoded_on, "Prefetched image was decoded on render thread"
+        prefetcher.close()
+
+    def test_not_prefetched_image_is_miss(self):
+        prefetcher = texture_cache.TexturePrefetcher(decoder=str.upper)
+
+        assert prefetcher.get("three") == "THREE", "Prefetcher returned wrong image"
+        assert prefetcher.get(None) is None, "Prefetcher returned image for absent stimulus"
+        assert prefetcher.hits == 0 and prefetcher.misses == 1, "Not prefetched image was not counted as miss"
+        prefetcher.close()
+
+    def test_prefetching_is_stopped_on_exit_of_context(self):
+        with texture_cache.TexturePrefetcher(decoder=str.upper) as prefetcher:
+            prefetcher.prefetch(["one"])
+            prefetcher.get("one")
+
+        with pytest.raises(RuntimeError):
+            prefetcher.prefetch(["two"])
+
+
+class TestInstructionTextureCache:
+    IMAGE_SIZE = (40, 30)
+
+    @pytest.fixture
+    def images_fp(self, tmpdir) -> List[str]:
+        from PIL import Image
+
+        images_fp = []
+        for number in range(3):
+            fp = str(tmpdir.join(f"instruction {number}.png"))
+            Image.new("RGBA", self.IMAGE_SIZE).save(fp)
+            images_fp.append(fp)
+
+        return images_fp
+
+    @property
+    def image_bytes(self) -> int:
+        width, height = self.IMAGE_SIZE
+        return width * height * 4
+
+    def test_repeated_image_is_hit(self, images_fp):
+        cache = texture_cache.InstructionTextureCache()
+
+        first = cache.get(images_fp[0])
+        second = cache.get(images_fp[0])
+
+        assert first is second, "Cached image was decoded again"
+        assert cache.hits == 1 and cache.misses == 1, f"Wrong statistics: {cache.hits} hits, {cache.misses} misses"
+        cache.close()
+
+    def test_least_recently_used_image_is_evicted(self, images_fp):
+        cache = texture_cache.InstructionTextureCache(max_bytes=self.image_bytes * 2)
+
+        first = cache.get(images_fp[0])
+        cache.get(images_fp[1])
+        cache.get(images_fp[0])
+        cache.get(images_fp[2])
+
+        assert cache.size_in_bytes <= self.image_bytes * 2, f"Cache takes {cache.size_in_bytes} bytes"
+        assert cache.get(images_fp[0]) is first, "Recently used image was evicted"
+        hits_before = cache.hits
+        cache.get(images_fp[1])
+        assert cache.hits == hits_before, "Least recently used image was not evicted"
+        cache.close()
+
+    def test_changed_file_is_decoded_again(self, images_fp):
+        cache = texture_cache.InstructionTextureCache()
+        old_image = cache.get(images_fp[0])
+
+        stat = os.stat(images_fp[0])
+        os.utime(images_fp[0], (stat.st_atime, stat.st_mtime + 10))
+
+        assert cache.get(images_fp[0]) is not old_image, "Image of changed file was taken from cache"
+        assert cache.size_in_bytes == self.image_bytes, "Outdated image was kept in cache"
+        cache.close()
+
+    def test_warmed_image_is_hit(self, images_fp):
+        cache = texture_cache.InstructionTextureCache()
+        cache.warm(images_fp)
+        cache._executor.shutdown(wait=True)
+
+        for fp in images_fp:
+            cache.get(fp)
+
+        assert cache.hits == len(images_fp), f"Only {cache.hits} of {len(images_fp)} warmed images were hits"
+
+    def test_warming_is_stopped_on_exit_of_context(self, images_fp):
+        with texture_cache.InstructionTextureCache() as cache:
+            cache.warm(images_fp[:1])
+
+        with pytest.raises(RuntimeError):
+            cache.warm(images_fp[1:])
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,45 @@
+import argparse
+import itertools
+
+import numpy as np
+
+from base import probe_design, probe_presenters
+
+# зонды в том виде, в котором они создаются в эксперименте
+inhibition_probes = ["".join(colorful_word) for colorful_word in itertools.product("RGBY", repeat=2)]
+inhibition_right_answers = dict(R="right", Y="right", G="left", B="left")
+PROBES = dict(
+    TwoAlternatives=(["green", "red"], ["right", "left"], {}),
+    Update=(["1", "2", "3"], None, probe_presenters.UPDATE_ANSWERS),
+    Switch=(list("12345678"), ["right", "right", "left", "right", "left", "left", "left", "right"], {}),
+    Inhibition=(inhibition_probes, [inhibition_right_answers[probe[1]] for probe in inhibition_probes], {}),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка последовательностей зондов моделированием")
+    parser.add_argument("--sequences", type=int, default=1_000_000)
+    parser.add_argument("--trials", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    failed = False
+    for probe_type, (probes, answers, settings) in PROBES.items():
+        report = probe_design.simulate(probe_presenters.Probe(probes, answers, probe_type, **settings),
+                                       sequences=args.sequences,
+                                       trials=args.trials,
+                                       rng=rng)
+        print(f"{probe_type}: right {report.right_answers:.4f}, congruent {report.congruency_rate:.4f}, "
+              f"same {report.same_ratio:.4f}, mean run {report.mean_run:.2f}, max run {report.max_run}")
+
+        for error in probe_design.validate(report):
+            failed = True
+            print(f"    {error}")
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()